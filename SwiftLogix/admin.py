@@ -1,11 +1,25 @@
+from django import forms
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Shipment, TrackingUpdate, QuoteRequest, ContactMessage, UserProfile
+from django.utils import timezone
+from .models import (
+    Shipment, TrackingUpdate, QuoteRequest, ContactMessage, UserProfile, LaneStat,
+    ShipmentDailyRollup, QuoteDailyRollup, Job, DeadJob, WebhookEndpoint, WebhookDelivery,
+)
+from . import jobs, labels, lanes, rollups, sla, tasks, transitions, triage
+
+
+class WebhookEndpointInline(admin.TabularInline):
+    model = WebhookEndpoint
+    extra = 0
+    fields = ['url', 'is_active', 'max_concurrency', 'batch_size', 'secret']
+    readonly_fields = ['secret']
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
+    inlines = [WebhookEndpointInline]
     list_display = ['user', 'phone', 'company_name', 'city', 'country', 'created_at']
     search_fields = ['user__username', 'user__email', 'company_name', 'phone']
     list_filter = ['country', 'city', 'created_at']
@@ -30,8 +44,53 @@ class UserProfileAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+class ShipmentAdminForm(forms.ModelForm):
+    # The version the form was rendered from; the save is refused if the row has moved on since
+    loaded_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = Shipment
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['loaded_version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        loaded_version = cleaned_data.get('loaded_version')
+        if self.instance.pk and loaded_version is not None and loaded_version != self.instance.version:
+            raise forms.ValidationError(
+                "This shipment was updated while you were editing it (it is now %(status)s). "
+                "Reload the page and apply your changes again.",
+                params={'status': self.instance.get_status_display()},
+            )
+        return cleaned_data
+
+
+class SLAExceptionFilter(admin.SimpleListFilter):
+    """The SLA job's own queries, so filtering stays on its partial indexes"""
+    title = 'SLA exception'
+    parameter_name = 'sla'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('overdue', 'Past expected delivery'),
+            ('silent', 'In transit, no recent update'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'overdue':
+            return queryset.filter(pk__in=sla.overdue().values('pk'))
+        if self.value() == 'silent':
+            return queryset.filter(pk__in=sla.silent().values('pk'))
+        return queryset
+
+
 @admin.register(Shipment)
 class ShipmentAdmin(admin.ModelAdmin):
+    form = ShipmentAdminForm
     list_display = [
         'tracking_number',
         'sender_name',
@@ -45,6 +104,7 @@ class ShipmentAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'status',
+        SLAExceptionFilter,
         'shipment_type',
         'sender_country',
         'receiver_country',
@@ -58,12 +118,13 @@ class ShipmentAdmin(admin.ModelAdmin):
         'receiver_email',
         'user__username'  # Added user search
     ]
+    list_select_related = ['user']  # user is nullable, so the changelist won't join it by itself
     ordering = ['-created_at']
     date_hierarchy = 'created_at'
 
     fieldsets = (
         ('Tracking Information', {
-            'fields': ('tracking_number', 'status', 'shipment_type', 'user')  # Added user
+            'fields': ('tracking_number', 'status', 'shipment_type', 'user', 'loaded_version')  # Added user
         }),
         ('Sender Information', {
             'fields': (
@@ -86,13 +147,26 @@ class ShipmentAdmin(admin.ModelAdmin):
         ('Delivery Information', {
             'fields': ('expected_delivery_date', 'actual_delivery_date')
         }),
+        ('Location', {
+            'fields': (
+                'current_latitude', 'current_longitude',
+                'sender_latitude', 'sender_longitude',
+                'receiver_latitude', 'receiver_longitude',
+                'route_progress', 'remaining_distance_km'
+            ),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
 
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = (
+        'created_at', 'updated_at',
+        'sender_latitude', 'sender_longitude', 'receiver_latitude', 'receiver_longitude',
+        'route_progress', 'remaining_distance_km'
+    )
 
     def status_badge(self, obj):
         """Display status with color-coded badge"""
@@ -114,23 +188,47 @@ class ShipmentAdmin(admin.ModelAdmin):
         )
     status_badge.short_description = 'Status'
 
-    actions = ['mark_as_delivered', 'mark_as_in_transit', 'mark_as_cancelled']
+    actions = ['mark_as_delivered', 'mark_as_in_transit', 'mark_as_cancelled', 'print_labels']
+
+    def _set_status(self, request, queryset, status):
+        moved, skipped = transitions.bulk_transition(queryset, status)
+        label = dict(Shipment.SHIPMENT_STATUS_CHOICES)[status].lower()
+        message = f'{moved} shipments marked as {label}.'
+        if skipped:
+            message += f' {skipped} left alone: they are already {label} or cannot move to it.'
+        self.message_user(request, message)
 
     def mark_as_delivered(self, request, queryset):
-        updated = queryset.update(status='delivered')
-        self.message_user(request, f'{updated} shipments marked as delivered.')
+        movable = queryset.filter(status__in=Shipment.statuses_leading_to('delivered'))
+        newly_delivered = list(movable.values_list('pk', flat=True))
+        # bulk_transition sets actual_delivery_date on the shipments it moves
+        self._set_status(request, queryset, 'delivered')
+        # queryset.update() skips post_save, so feed the lane statistics here
+        for shipment in Shipment.objects.filter(pk__in=newly_delivered, status='delivered', lane_recorded=False):
+            lanes.record_delivery(shipment)
     mark_as_delivered.short_description = "Mark selected shipments as delivered"
 
     def mark_as_in_transit(self, request, queryset):
-        updated = queryset.update(status='in_transit')
-        self.message_user(request, f'{updated} shipments marked as in transit.')
+        self._set_status(request, queryset, 'in_transit')
     mark_as_in_transit.short_description = "Mark selected shipments as in transit"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
-        self.message_user(request, f'{updated} shipments marked as cancelled.')
+        self._set_status(request, queryset, 'cancelled')
     mark_as_cancelled.short_description = "Mark selected shipments as cancelled"
 
+    def print_labels(self, request, queryset):
+        # Drawn by the job worker's process pool, never in this request
+        name = labels.new_batch_name()
+        shipment_ids = list(queryset.values_list('pk', flat=True))
+        tasks.print_labels.delay(
+            shipment_ids=shipment_ids, track_url=request.build_absolute_uri(reverse('track')), name=name,
+        )
+        self.message_user(request, format_html(
+            'Printing {} labels in the background. The PDF appears on the <a href="{}">labels page</a> when it is ready.',
+            len(shipment_ids), reverse('labels'),
+        ))
+    print_labels.short_description = "Print shipping labels for selected shipments"
+
 
 class TrackingUpdateInline(admin.TabularInline):
     model = TrackingUpdate
@@ -149,10 +247,12 @@ class QuoteRequestAdmin(admin.ModelAdmin):
         "departure",
         "delivery",
         "status_badge",
+        "claimed_by",
         "created_at",
     )
     list_filter = ("freight_type", "status", "created_at")
     search_fields = ("name", "email", "departure", "delivery", "user__username")  # Added user search
+    list_select_related = ("user", "claimed_by")
     ordering = ("-created_at",)
     date_hierarchy = "created_at"
 
@@ -170,7 +270,7 @@ class QuoteRequestAdmin(admin.ModelAdmin):
             "fields": ("special_note", "message"),
         }),
         ("Quote Status", {
-            "fields": ("quote_amount", "status"),
+            "fields": ("quote_amount", "status", "claimed_by", "lease_expires_at"),
         }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at"),
@@ -178,7 +278,7 @@ class QuoteRequestAdmin(admin.ModelAdmin):
         }),
     )
 
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = ("created_at", "updated_at", "claimed_by", "lease_expires_at")
 
     def status_badge(self, obj):
         status_colors = {
@@ -200,14 +300,60 @@ class QuoteRequestAdmin(admin.ModelAdmin):
     actions = ["mark_as_quoted", "mark_as_processing"]
 
     def mark_as_quoted(self, request, queryset):
-        updated = queryset.update(status="quoted")
+        updated = rollups.quotes_bulk_update(queryset, status="quoted", lease_expires_at=None)
         self.message_user(request, f"{updated} quote requests marked as quoted.")
     mark_as_quoted.short_description = "Mark selected requests as quoted"
 
     def mark_as_processing(self, request, queryset):
-        updated = queryset.update(status="processing")
-        self.message_user(request, f"{updated} quote requests marked as processing.")
-    mark_as_processing.short_description = "Mark selected requests as processing"
+        claimed = triage.claim_selected(request.user, queryset)
+        self.message_user(
+            request,
+            f"You claimed {claimed} quote requests for {int(triage.lease().total_seconds() // 60)} minutes; "
+            f"{queryset.count() - claimed} were already taken or closed.",
+        )
+    mark_as_processing.short_description = "Claim selected requests (mark as processing)"
+
+
+@admin.register(LaneStat)
+class LaneStatAdmin(admin.ModelAdmin):
+    list_display = (
+        "origin_country",
+        "origin_city",
+        "destination_country",
+        "destination_city",
+        "shipment_type",
+        "sample_count",
+        "p50_hours",
+        "p95_hours",
+        "updated_at",
+    )
+    list_filter = ("shipment_type",)
+    search_fields = ("origin_country", "origin_city", "destination_country", "destination_city")
+    readonly_fields = [field.name for field in LaneStat._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ShipmentDailyRollup)
+class ShipmentDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "status", "shipment_type", "origin_country", "destination_country", "count")
+    list_filter = ("status", "shipment_type")
+    readonly_fields = [field.name for field in ShipmentDailyRollup._meta.fields]
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(QuoteDailyRollup)
+class QuoteDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "freight_type", "status", "count")
+    list_filter = ("freight_type", "status")
+    readonly_fields = [field.name for field in QuoteDailyRollup._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(ContactMessage)
@@ -215,4 +361,59 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ('name', 'email', 'subject', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('name', 'email', 'subject', 'message')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "task", "queue", "status", "attempts", "max_attempts", "run_at", "locked_by", "finished_at")
+    list_filter = ("status", "queue", "task")
+    search_fields = ("task", "last_error")
+    ordering = ("-created_at",)
+    readonly_fields = [field.name for field in Job._meta.fields]
+    show_full_result_count = False
+
+    actions = ["retry_jobs"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        updated = jobs.retry(queryset.exclude(status="running"))
+        self.message_user(request, f"{updated} jobs queued for retry.")
+    retry_jobs.short_description = "Retry selected jobs"
+
+
+@admin.register(DeadJob)
+class DeadJobAdmin(JobAdmin):
+    list_display = ("id", "task", "queue", "attempts", "short_error", "finished_at")
+    list_filter = ("queue", "task")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(status="dead")
+
+    def short_error(self, obj):
+        last_line = obj.last_error.strip().splitlines()[-1:] or [""]
+        return last_line[0][:120]
+    short_error.short_description = "Error"
+
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ("id", "endpoint", "event", "status", "attempts", "response_status", "next_attempt_at", "delivered_at")
+    list_filter = ("status", "event")
+    list_select_related = ("endpoint__profile__user",)
+    readonly_fields = [field.name for field in WebhookDelivery._meta.fields]
+    ordering = ("-created_at",)
+    show_full_result_count = False
+
+    actions = ["retry_deliveries"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_deliveries(self, request, queryset):
+        updated = queryset.filter(status="failed").update(status="pending", attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} failed deliveries queued for retry.")
+    retry_deliveries.short_description = "Retry selected failed deliveries"
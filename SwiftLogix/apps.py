@@ -5,6 +5,4 @@ class SwiftLogixConfig(AppConfig):
     name = 'SwiftLogix'
 
     def ready(self):
-        # Import signals here if you add them later
-        # from . import signals
-        pass
+        from . import signals, tasks  # noqa: F401
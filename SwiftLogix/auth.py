@@ -0,0 +1,89 @@
+# SwiftLogix/auth.py
+"""
+Authentication backend that loads the user and their profile together.
+
+``AuthenticationMiddleware`` resolves ``request.user`` through
+``get_user``; this backend answers it from a per-process cache and, on a
+miss, with one query that joins ``UserProfile``. Views read
+``request.user.profile`` without another round-trip.
+
+Users (password hash included) never leave the process. The
+``USER_CACHE_ALIAS`` cache only holds a random token per user, and a local
+copy is served while it was loaded under the current token. Saving or
+deleting the user or profile deletes the token (see signals.py), which
+every worker sees on its next request; ``queryset.update()`` sends no
+signal, so code that changes users in bulk calls ``invalidate_users``, and
+anything else expires with ``USER_CACHE_TIMEOUT``.
+
+Sessions created before this backend was installed name ``ModelBackend``,
+which stays in ``AUTHENTICATION_BACKENDS`` so they remain logged in.
+"""
+import pickle
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+from .cache import LRUCache
+from .models import UserProfile
+
+UserModel = get_user_model()
+
+CACHE_KEY = 'swiftlogix.auth.user:{}'
+LOCAL_MAX_ENTRIES = 1000
+
+# user id -> (token, pickled user); each request unpickles its own copy to change as it likes
+_local = LRUCache(LOCAL_MAX_ENTRIES, float('inf'))
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def invalidate_user(user_id):
+    _cache().delete(CACHE_KEY.format(user_id))
+
+
+def invalidate_users(user_ids):
+    """Drop the cached users after a bulk change, e.g. queryset.update(is_active=False)"""
+    _cache().delete_many([CACHE_KEY.format(user_id) for user_id in user_ids])
+
+
+def get_profile(user):
+    """The user's profile, created on the spot for accounts that predate profiles"""
+    try:
+        return user.profile
+    except UserProfile.DoesNotExist:
+        profile, created = UserProfile.objects.get_or_create(user=user)
+        user.profile = profile
+        invalidate_user(user.pk)
+        return profile
+
+
+def _token(user_id, timeout):
+    """The user's current token, starting a new one if it was invalidated or expired"""
+    key = CACHE_KEY.format(user_id)
+    token = _cache().get(key)
+    if token is None:
+        _cache().add(key, uuid.uuid4().hex, timeout)
+        token = _cache().get(key)
+    return token
+
+
+class ProfileBackend(ModelBackend):
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'USER_CACHE_TIMEOUT', 60)
+        token = _token(user_id, timeout)
+        entry = _local.get(user_id, None)
+        if entry is not None and token is not None and entry[0] == token:
+            user = pickle.loads(entry[1])
+        else:
+            try:
+                user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            if token is not None:
+                _local.set(user_id, (token, pickle.dumps(user, pickle.HIGHEST_PROTOCOL)), timeout)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,307 @@
+# SwiftLogix/cache.py
+"""
+Two-tier cache.
+
+``TieredCache`` is a Django cache backend that fronts a shared cache alias
+(Redis in production, files locally) with a small in-process LRU. The L1
+copy of an entry lives at most ``L1_TIMEOUT`` seconds, which bounds how long
+one gunicorn worker can serve a value another worker has replaced.
+
+``get_or_compute`` adds stampede protection on top of any cache alias:
+single-flight recomputation (a thread lock inside the worker plus an
+``add()``-based lock across workers), probabilistic early expiry so hot keys
+are refreshed before they expire, and per-namespace versions for bulk
+invalidation with ``bump_namespace``.
+"""
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+METRICS_PREFIX = 'swiftlogix.cache.metrics:'
+METRIC_NAMES = ('l1_hits', 'l2_hits', 'misses', 'computes', 'early_recomputes', 'lock_waits', 'stale_served')
+METRICS_FLUSH_EVERY = 100
+
+_missing = object()
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping whose entries expire after a TTL"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_missing):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Metrics:
+    """Per-process counters, periodically folded into shared counters on the L2 cache"""
+
+    def __init__(self):
+        self._unflushed = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def shared_alias(self):
+        return getattr(settings, 'CACHE_METRICS_ALIAS', None)
+
+    def incr(self, name):
+        with self._lock:
+            self._unflushed[name] += 1
+            pending = sum(self._unflushed.values())
+        if pending >= METRICS_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self.shared_alias is None:
+            return
+        with self._lock:
+            pending, self._unflushed = self._unflushed, Counter()
+        shared = caches[self.shared_alias]
+        for name, count in pending.items():
+            key = METRICS_PREFIX + name
+            shared.add(key, 0, timeout=None)
+            try:
+                shared.incr(key, count)
+            except ValueError:
+                shared.set(key, count, timeout=None)
+
+    def snapshot(self):
+        """Counters and hit rates across all workers (shared totals plus this worker's unflushed counts)"""
+        counts = Counter()
+        if self.shared_alias is not None:
+            shared = caches[self.shared_alias].get_many([METRICS_PREFIX + name for name in METRIC_NAMES])
+            counts.update({key[len(METRICS_PREFIX):]: value for key, value in shared.items()})
+        with self._lock:
+            counts.update(self._unflushed)
+        lookups = counts['l1_hits'] + counts['l2_hits'] + counts['misses']
+        report = {name: counts[name] for name in METRIC_NAMES}
+        report['lookups'] = lookups
+        report['l1_hit_rate'] = round(counts['l1_hits'] / lookups, 4) if lookups else 0.0
+        report['hit_rate'] = round((counts['l1_hits'] + counts['l2_hits']) / lookups, 4) if lookups else 0.0
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._unflushed.clear()
+        if self.shared_alias is not None:
+            caches[self.shared_alias].delete_many([METRICS_PREFIX + name for name in METRIC_NAMES])
+
+
+metrics = Metrics()
+
+
+class TieredCache(BaseCache):
+    """
+    In-process LRU (L1) in front of another configured cache alias (L2).
+
+    LOCATION names the L2 alias. OPTIONS: L1_MAX_ENTRIES (default 1000) and
+    L1_TIMEOUT in seconds (default 5).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._l1 = LRUCache(
+            max_entries=int(options.get('L1_MAX_ENTRIES', 1000)),
+            ttl=float(options.get('L1_TIMEOUT', 5)),
+        )
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self._l1.ttl if timeout is None else timeout
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self._l1.get(l1_key)
+        if value is not _missing:
+            metrics.incr('l1_hits')
+            return value
+        value = self.l2.get(key, _missing, version=version)
+        if value is _missing:
+            metrics.incr('misses')
+            return default
+        metrics.incr('l2_hits')
+        self._l1.set(l1_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1.set(l1_key, value, self._l1_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1.set(l1_key, value, self._l1_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self._l1.delete(l1_key)
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        return self._l1.get(l1_key) is not _missing or self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.decr(key, delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+# ============================================
+# STAMPEDE-PROTECTED RECOMPUTATION
+# ============================================
+
+# Striped so the number of locks stays fixed however many keys are computed
+_flight_locks = [threading.Lock() for _ in range(64)]
+
+
+def _flight_lock(key):
+    return _flight_locks[hash(key) % len(_flight_locks)]
+
+
+def namespace_version(namespace, cache_alias='default'):
+    cache = caches[cache_alias]
+    version_key = f'swiftlogix.ns:{namespace}'
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, 1, timeout=None)
+        version = cache.get(version_key) or 1
+    return version
+
+
+def bump_namespace(namespace, cache_alias='default'):
+    """Invalidate every key stored under namespace by moving it to a new version"""
+    cache = caches[cache_alias]
+    version_key = f'swiftlogix.ns:{namespace}'
+    cache.add(version_key, 1, timeout=None)
+    try:
+        return cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, 2, timeout=None)
+        return 2
+
+
+def namespaced_key(namespace, key, cache_alias='default'):
+    return f'{namespace}:v{namespace_version(namespace, cache_alias)}:{key}'
+
+
+def _should_refresh_early(delta, expires_at, beta):
+    """XFetch: refresh with rising probability as expiry nears, scaled by recompute cost"""
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expires_at
+
+
+def get_or_compute(key, compute, timeout, namespace=None, beta=1.0, lock_timeout=30, cache_alias='default'):
+    """
+    Return the cached value for key, computing and storing it at most once at a time.
+
+    While one caller recomputes, others get the previous (still valid) value
+    or, on a cold miss, wait for the lock holder's result up to lock_timeout.
+    """
+    cache = caches[cache_alias]
+    if namespace:
+        key = namespaced_key(namespace, key, cache_alias)
+
+    envelope = cache.get(key)
+    if envelope is not None:
+        value, delta, expires_at = envelope
+        if not _should_refresh_early(delta, expires_at, beta):
+            return value
+        metrics.incr('early_recomputes')
+
+    lock_key = f'swiftlogix.lock:{key}'
+    with _flight_lock(key):
+        # Another thread in this worker may have refreshed it while we waited
+        fresh = cache.get(key)
+        if fresh is not None and (envelope is None or fresh[2] > envelope[2]):
+            return fresh[0]
+
+        deadline = time.monotonic() + lock_timeout
+        locked = cache.add(lock_key, 1, timeout=lock_timeout)
+        while not locked:
+            if envelope is not None:
+                metrics.incr('stale_served')
+                return envelope[0]
+            metrics.incr('lock_waits')
+            if time.monotonic() >= deadline:
+                # The holder is stuck or gone; compute without the lock, which is still theirs
+                break
+            time.sleep(0.05)
+            fresh = cache.get(key)
+            if fresh is not None:
+                return fresh[0]
+            locked = cache.add(lock_key, 1, timeout=lock_timeout)
+
+        try:
+            started = time.time()
+            value = compute()
+            delta = time.time() - started
+            metrics.incr('computes')
+            cache.set(key, (value, delta, time.time() + timeout), timeout)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+    return value
@@ -0,0 +1,156 @@
+# SwiftLogix/compression.py
+"""
+Compression and minification of dynamic responses.
+
+WhiteNoise already serves pre-compressed static files; ``CompressionMiddleware``
+covers what the views render. HTML has its whitespace runs collapsed (never
+removed, so inline layout is unchanged) and its comments dropped, leaving
+``<pre>``, ``<textarea>``, ``<script>`` and ``<style>`` bodies untouched.
+Text bodies of at least ``COMPRESSION_MIN_BYTES`` are then sent as Brotli
+(when the ``brotli`` package is installed) or gzip, whichever the client
+prefers in ``Accept-Encoding``; streaming responses are compressed chunk by
+chunk.
+
+To stay clear of BREACH, responses that carry a secret an attacker could
+recover byte by byte from compressed sizes are sent uncompressed: any page
+that used a CSRF token, and the URL names in ``COMPRESSION_EXCLUDE_VIEWS``.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+)
+
+# Blocks whose whitespace is significant or which are not HTML
+PRESERVED_BLOCK = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Conditional comments (<!--[if IE]>) are markup for old browsers, so they stay
+COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+WHITESPACE_WITH_NEWLINE = re.compile(r'\s*\n\s*')
+WHITESPACE = re.compile(r'[ \t\r\f\v]{2,}')
+CSRF_FIELD = b'name="csrfmiddlewaretoken"'
+
+
+def minify_html(html):
+    parts = PRESERVED_BLOCK.split(html)
+    out = []
+    # split() yields [text, block, tag name, text, block, tag name, ..., text]
+    for index in range(0, len(parts), 3):
+        text = COMMENT.sub('', parts[index])
+        text = WHITESPACE_WITH_NEWLINE.sub('\n', text)
+        out.append(WHITESPACE.sub(' ', text))
+        if index + 1 < len(parts):
+            out.append(parts[index + 1])
+    return ''.join(out)
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header with q > 0, in the client's order of preference"""
+    weighted = []
+    for position, item in enumerate(header.split(',')):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        if name and quality > 0:
+            weighted.append((-quality, position, name.strip().lower()))
+    return [name for _, _, name in sorted(weighted)]
+
+
+def choose_encoding(header):
+    for name in accepted_encodings(header):
+        if name == 'br' and brotli is not None:
+            return 'br'
+        if name in ('gzip', '*'):
+            return 'gzip'
+    return None
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=5)
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _breach_exposed(request, response):
+    if settings.CSRF_COOKIE_NAME in response.cookies:
+        # CsrfViewMiddleware only sets the cookie on responses that called get_token()
+        return True
+    if not response.streaming and CSRF_FIELD in response.content:
+        return True
+    match = getattr(request, 'resolver_match', None)
+    return bool(match and match.url_name in getattr(settings, 'COMPRESSION_EXCLUDE_VIEWS', ()))
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.minify = getattr(settings, 'HTML_MINIFY', True)
+        self.min_bytes = getattr(settings, 'COMPRESSION_MIN_BYTES', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        if self.minify and not response.streaming and content_type.startswith('text/html'):
+            charset = response.charset or 'utf-8'
+            try:
+                response.content = minify_html(response.content.decode(charset)).encode(charset)
+            except UnicodeDecodeError:
+                pass
+            else:
+                if response.has_header('Content-Length'):
+                    response['Content-Length'] = str(len(response.content))
+
+        if not response.streaming and len(response.content) < self.min_bytes:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if _breach_exposed(request, response):
+            return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                # Async streams (ASGI only) are left to the server
+                return response
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=5)
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,119 @@
+# SwiftLogix/gazetteer.py
+"""
+Offline city gazetteer.
+
+Resolves free-text city/country pairs to coordinates from the bundled
+``data/cities.csv``. The dataset is loaded once per process into parallel
+arrays (coordinates in ``array('d')``) with dict indexes over normalized
+names, so lookups never touch the network or the database.
+"""
+import csv
+import difflib
+import re
+import threading
+import unicodedata
+from array import array
+from functools import lru_cache
+from pathlib import Path
+
+DATASET = Path(__file__).resolve().parent / 'data' / 'cities.csv'
+
+COUNTRY_ALIASES = {
+    'usa': 'US', 'us': 'US', 'united states of america': 'US', 'america': 'US',
+    'uk': 'GB', 'great britain': 'GB', 'britain': 'GB', 'england': 'GB', 'scotland': 'GB', 'wales': 'GB',
+    'ivory coast': 'CI', 'drc': 'CD', 'dr congo': 'CD', 'congo kinshasa': 'CD', 'republic of the congo': 'CG',
+    'uae': 'AE', 'emirates': 'AE', 'holland': 'NL', 'the netherlands': 'NL',
+    'korea': 'KR', 'republic of korea': 'KR', 'czechia': 'CZ', 'russian federation': 'RU',
+    'turkiye': 'TR', 'viet nam': 'VN', 'swaziland': 'SZ', 'cabo verde': 'CV', 'the gambia': 'GM',
+    'ksa': 'SA', 'burma': 'MM',
+}
+
+FUZZY_CUTOFF = 0.8
+
+
+def normalize(value):
+    """Casefolded, accent-free, punctuation-free form used for every index key"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    value = re.sub(r"[^\w\s]", ' ', value.casefold())
+    return ' '.join(value.split())
+
+
+class Gazetteer:
+    def __init__(self, path=DATASET):
+        self.names = []
+        self.countries = []
+        self.lats = array('d')
+        self.lngs = array('d')
+        self.exact = {}           # (iso2, normalized name) -> row
+        self.by_country = {}      # iso2 -> [normalized names], for fuzzy matching
+        self.by_name = {}         # normalized name -> [rows], when the country is unknown
+        self.country_codes = dict(COUNTRY_ALIASES)
+
+        with open(path, newline='', encoding='utf-8') as handle:
+            for record in csv.DictReader(handle):
+                row = len(self.names)
+                iso2 = record['iso2'].upper()
+                self.names.append(record['city'])
+                self.countries.append(iso2)
+                self.lats.append(float(record['lat']))
+                self.lngs.append(float(record['lng']))
+                self.country_codes[normalize(record['country'])] = iso2
+                self.country_codes[iso2.casefold()] = iso2
+
+                aliases = [record['city']] + [a for a in record['alternate_names'].split('|') if a]
+                for alias in aliases:
+                    key = normalize(alias)
+                    self.exact.setdefault((iso2, key), row)
+                    self.by_country.setdefault(iso2, []).append(key)
+                    self.by_name.setdefault(key, []).append(row)
+
+    def country_code(self, country):
+        key = normalize(country)
+        if not key:
+            return None
+        if key in self.country_codes:
+            return self.country_codes[key]
+        match = difflib.get_close_matches(key, self.country_codes.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        return self.country_codes[match[0]] if match else None
+
+    def find(self, city, country):
+        """Row index for a city/country pair, or None"""
+        key = normalize(city)
+        if not key:
+            return None
+        iso2 = self.country_code(country)
+        if iso2 is None:
+            rows = self.by_name.get(key, [])
+            return rows[0] if len(rows) == 1 else None
+        if (iso2, key) in self.exact:
+            return self.exact[(iso2, key)]
+        match = difflib.get_close_matches(key, self.by_country.get(iso2, []), n=1, cutoff=FUZZY_CUTOFF)
+        return self.exact[(iso2, match[0])] if match else None
+
+
+_gazetteer = None
+_load_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        with _load_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+@lru_cache(maxsize=4096)
+def _resolve(city_key, country_key):
+    gazetteer = get_gazetteer()
+    row = gazetteer.find(city_key, country_key)
+    if row is None:
+        return None
+    return gazetteer.lats[row], gazetteer.lngs[row]
+
+
+def resolve(city, country):
+    """(lat, lng) for a free-text city and country, or None if it cannot be placed"""
+    return _resolve(normalize(city), normalize(country))
@@ -0,0 +1,256 @@
+# SwiftLogix/geo.py
+"""
+Distance-based progress for shipments on the move.
+
+``refresh_progress`` walks active shipments that have a live position in
+primary-key chunks, computes great-circle distances origin->destination and
+current->destination for the whole chunk at once with NumPy (a plain loop
+gives the same figures if it is missing, only slower), and writes ``route_progress`` and
+``remaining_distance_km`` back in bulk. On PostgreSQL a chunk is written with
+a single ``UPDATE ... FROM unnest(...)``; elsewhere ``bulk_update`` is used.
+
+The live fleet map reads XYZ tiles from ``fleet_tile``: shipments carry a
+geohash of their current position, and at low zoom a tile is answered with
+counts grouped by geohash prefix instead of one marker per shipment.
+"""
+import logging
+import math
+import time
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+from django.db.models.functions import Substr
+
+from .models import Shipment
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+ACTIVE_STATUSES = ('picked_up', 'in_transit', 'out_for_delivery', 'on_hold')
+
+# Origin and destination closer than this: distance progress is meaningless
+MIN_ROUTE_KM = 1.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km between two points"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _haversine_np(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = (np.radians(column) for column in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def route_metrics(rows):
+    """(progress %, remaining km) per (origin lat, lng, destination lat, lng, current lat, lng) row"""
+    if not rows:
+        return []
+    if np is not None:
+        o_lat, o_lng, d_lat, d_lng, c_lat, c_lng = np.asarray(rows, dtype=np.float64).T
+        total = _haversine_np(o_lat, o_lng, d_lat, d_lng)
+        remaining = _haversine_np(c_lat, c_lng, d_lat, d_lng)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            progress = np.clip(np.rint(100 * (1 - remaining / total)), 0, 100)
+        progress = np.where(total < MIN_ROUTE_KM, np.nan, progress)
+        return [
+            (None if math.isnan(p) else int(p), round(float(r), 1))
+            for p, r in zip(progress.tolist(), remaining.tolist())
+        ]
+
+    metrics = []
+    for o_lat, o_lng, d_lat, d_lng, c_lat, c_lng in rows:
+        total = haversine_km(o_lat, o_lng, d_lat, d_lng)
+        remaining = haversine_km(c_lat, c_lng, d_lat, d_lng)
+        progress = None if total < MIN_ROUTE_KM else int(min(100, max(0, round(100 * (1 - remaining / total)))))
+        metrics.append((progress, round(remaining, 1)))
+    return metrics
+
+
+def _write(ids, metrics):
+    if connection.vendor == 'postgresql':
+        table = connection.ops.quote_name(Shipment._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS s SET route_progress = v.progress, remaining_distance_km = v.remaining "
+                f"FROM unnest(%s::bigint[], %s::smallint[], %s::double precision[]) AS v(id, progress, remaining) "
+                f"WHERE s.id = v.id",
+                [ids, [m[0] for m in metrics], [m[1] for m in metrics]],
+            )
+        return
+    shipments = [
+        Shipment(pk=pk, route_progress=progress, remaining_distance_km=remaining)
+        for pk, (progress, remaining) in zip(ids, metrics)
+    ]
+    Shipment.objects.bulk_update(shipments, ['route_progress', 'remaining_distance_km'], batch_size=500)
+
+
+def refresh_progress(chunk_size=50000):
+    """Recompute distance progress for every active shipment with a position; returns rows written"""
+    started = time.monotonic()
+    located = Shipment.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        current_latitude__isnull=False, current_longitude__isnull=False,
+        sender_latitude__isnull=False, receiver_latitude__isnull=False,
+    ).order_by('pk')
+    columns = (
+        'pk', 'sender_latitude', 'sender_longitude', 'receiver_latitude', 'receiver_longitude',
+        'current_latitude', 'current_longitude',
+    )
+    written = 0
+    last_pk = 0
+    while True:
+        chunk = list(located.filter(pk__gt=last_pk).values_list(*columns)[:chunk_size])
+        if not chunk:
+            break
+        ids = [row[0] for row in chunk]
+        with transaction.atomic():
+            _write(ids, route_metrics([row[1:] for row in chunk]))
+        written += len(ids)
+        last_pk = ids[-1]
+
+    logger.info(
+        "Refreshed route progress for %s shipments in %.2fs (%s)",
+        written, time.monotonic() - started, 'numpy' if np is not None else 'pure python',
+    )
+    return written
+
+
+def clear_inactive():
+    """Drop stale distance progress from shipments that have stopped moving"""
+    return (
+        Shipment.objects.exclude(status__in=ACTIVE_STATUSES)
+        .filter(route_progress__isnull=False)
+        .update(route_progress=None, remaining_distance_km=None)
+    )
+
+
+# ============================================
+# GEOHASH AND MAP TILES
+# ============================================
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def geohash(lat, lng, precision=GEOHASH_PRECISION):
+    """Base32 geohash of a point; shared prefixes mean nearby points"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def tile_bounds(z, x, y):
+    """(west, south, east, north) of an XYZ web-mercator tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_ranges(west, south, east, north, z):
+    """Column and row ranges of the XYZ tiles at zoom z that intersect a bounding box
+
+    A box with west > east crosses the antimeridian and gets two column ranges.
+    Raises ValueError for non-finite coordinates or south > north.
+    """
+    if not all(math.isfinite(value) for value in (west, south, east, north)):
+        raise ValueError("Bounding box coordinates must be finite")
+    if south > north:
+        raise ValueError("Bounding box south is above its north")
+    n = 2 ** z
+
+    def column(lng):
+        return min(n - 1, max(0, int((lng + 180) / 360 * n)))
+
+    def row(lat):
+        lat = math.radians(max(-85.0511, min(85.0511, lat)))
+        return min(n - 1, max(0, int((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n)))
+
+    rows = range(row(north), row(south) + 1)
+    if west <= east:
+        return [(range(column(west), column(east) + 1), rows)]
+    if column(east) >= column(west):
+        # The two halves meet: every column
+        return [(range(n), rows)]
+    return [(range(column(west), n), rows), (range(column(east) + 1), rows)]
+
+
+def tile_count(ranges):
+    """How many tiles tile_ranges() covers, without listing them"""
+    return sum(len(columns) * len(rows) for columns, rows in ranges)
+
+
+def tiles_in(ranges, z):
+    return [(z, x, y) for columns, rows in ranges for x in columns for y in rows]
+
+
+def tiles_covering(west, south, east, north, z):
+    """XYZ tiles at zoom z that intersect a bounding box"""
+    return tiles_in(tile_ranges(west, south, east, north, z), z)
+
+
+def cluster_precision(z):
+    """Geohash length whose cells split a zoom-z tile into roughly 8x8 clusters"""
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        if math.ceil(5 * precision / 2) >= z + 3:
+            return precision
+    return GEOHASH_PRECISION
+
+
+def fleet_tile(z, x, y, detail_zoom=13, max_markers=500):
+    """Clustered counts per geohash cell for a tile, or individual shipments once zoomed in"""
+    west, south, east, north = tile_bounds(z, x, y)
+    moving = Shipment.objects.filter(
+        status__in=ACTIVE_STATUSES,
+        current_latitude__gte=south, current_latitude__lt=north,
+        current_longitude__gte=west, current_longitude__lt=east,
+    )
+    if z >= detail_zoom:
+        return {
+            'clusters': [],
+            'shipments': [
+                {'tracking_number': tracking_number, 'status': status, 'lat': lat, 'lng': lng}
+                for tracking_number, status, lat, lng in moving.order_by('pk').values_list(
+                    'tracking_number', 'status', 'current_latitude', 'current_longitude',
+                )[:max_markers]
+            ],
+        }
+
+    cells = (
+        moving.annotate(cell=Substr('geohash', 1, cluster_precision(z)))
+        .values('cell')
+        .annotate(count=Count('id'), lat=Avg('current_latitude'), lng=Avg('current_longitude'))
+        .order_by('cell')
+    )
+    return {
+        'clusters': [
+            {'cell': cell['cell'], 'count': cell['count'], 'lat': round(cell['lat'], 5), 'lng': round(cell['lng'], 5)}
+            for cell in cells
+        ],
+        'shipments': [],
+    }
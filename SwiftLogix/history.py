@@ -0,0 +1,152 @@
+# SwiftLogix/history.py
+"""
+Keyset-paginated history of a customer's shipments and quote requests.
+
+Pages are ordered newest first on ``(created_at, id)`` and the cursor is the
+last row's pair, so each page is one index range scan on
+``(user, created_at, id)`` however deep the client has paged; there is no
+OFFSET and no COUNT. ``fields=`` narrows the SELECT to the named columns
+(through ``.values()``), and status, type and creation-date filters are
+applied in the same query.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import QuoteRequest, Shipment
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class HistoryError(ValueError):
+    """A query parameter the history API cannot honour; the message is safe to show"""
+
+
+class Resource:
+    def __init__(self, model, type_field, fields, default_fields):
+        self.model = model
+        self.type_field = type_field
+        self.fields = fields
+        self.default_fields = default_fields
+        self.statuses = {code for code, label in model._meta.get_field('status').choices}
+        self.types = {code for code, label in model._meta.get_field(type_field).choices}
+
+
+SHIPMENTS = Resource(
+    Shipment,
+    type_field='shipment_type',
+    fields=(
+        'id', 'tracking_number', 'status', 'shipment_type',
+        'sender_name', 'sender_city', 'sender_country',
+        'receiver_name', 'receiver_city', 'receiver_country',
+        'package_description', 'weight', 'dimensions', 'declared_value',
+        'pickup_date', 'expected_delivery_date', 'actual_delivery_date',
+        'route_progress', 'remaining_distance_km', 'created_at', 'updated_at',
+    ),
+    default_fields=(
+        'id', 'tracking_number', 'status', 'shipment_type', 'sender_city', 'sender_country',
+        'receiver_city', 'receiver_country', 'expected_delivery_date', 'created_at',
+    ),
+)
+
+QUOTES = Resource(
+    QuoteRequest,
+    type_field='freight_type',
+    fields=(
+        'id', 'freight_type', 'status', 'origin', 'destination', 'weight', 'dimensions',
+        'quote_amount', 'special_note', 'created_at', 'updated_at',
+    ),
+    default_fields=('id', 'freight_type', 'status', 'origin', 'destination', 'quote_amount', 'created_at'),
+)
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        raise HistoryError("Invalid cursor")
+    if created_at is None:
+        raise HistoryError("Invalid cursor")
+    return created_at, pk
+
+
+def _choices(value, allowed, name):
+    codes = [code for code in value.split(',') if code]
+    unknown = set(codes) - allowed
+    if unknown:
+        raise HistoryError(f"Unknown {name}: {', '.join(sorted(unknown))}")
+    return codes
+
+
+def _day_start(value, name):
+    try:
+        # None for a malformed value; ValueError for a well-formed impossible one (2024-02-30)
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise HistoryError(f"{name} must be a date (YYYY-MM-DD)")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def page(resource, user, params):
+    """One page of ``user``'s rows as {'results', 'next_cursor', 'has_more'}
+
+    ``params`` is the request's query dict: status, type (comma-separated
+    codes), created_after / created_before (inclusive dates), fields, limit
+    and cursor.
+    """
+    try:
+        limit = int(params.get('limit') or DEFAULT_LIMIT)
+    except ValueError:
+        raise HistoryError("limit must be a number")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    fields = [field for field in (params.get('fields') or '').split(',') if field] or list(resource.default_fields)
+    unknown = set(fields) - set(resource.fields)
+    if unknown:
+        raise HistoryError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The cursor is built from these, so they are always selected
+    selected = list(dict.fromkeys(fields + ['created_at', 'id']))
+
+    queryset = resource.model.objects.filter(user=user)
+    if params.get('status'):
+        queryset = queryset.filter(status__in=_choices(params['status'], resource.statuses, 'status'))
+    if params.get('type'):
+        queryset = queryset.filter(**{
+            f'{resource.type_field}__in': _choices(params['type'], resource.types, 'type'),
+        })
+    # Whole-day bounds as datetimes so the filter stays a range on the index
+    if params.get('created_after'):
+        queryset = queryset.filter(created_at__gte=_day_start(params['created_after'], 'created_after'))
+    if params.get('created_before'):
+        queryset = queryset.filter(
+            created_at__lt=_day_start(params['created_before'], 'created_before') + timedelta(days=1),
+        )
+    if params.get('cursor'):
+        created_at, pk = decode_cursor(params['cursor'])
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(queryset.order_by('-created_at', '-id').values(*selected)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    return {
+        'results': [{field: row[field] for field in fields} for row in rows],
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+    }
@@ -0,0 +1,145 @@
+# SwiftLogix/jobs.py
+"""
+Database-backed background jobs.
+
+Register a function with ``@task`` and call ``func.delay(**kwargs)`` from a
+view: a ``Job`` row is written in the view's transaction and the request
+returns immediately. ``manage.py run_worker`` claims due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it
+(PostgreSQL) and with a conditional ``UPDATE`` per job elsewhere (SQLite),
+runs them, and retries failures with exponential backoff until they land in
+the dead-letter state.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name=None, queue='default', max_attempts=None):
+    """Register a function as a background task and give it a .delay(**kwargs) helper"""
+
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+
+        def delay(run_at=None, **kwargs):
+            return Job.objects.create(
+                task=task_name,
+                queue=queue,
+                payload=kwargs,
+                max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+                run_at=run_at or timezone.now(),
+            )
+
+        func.task_name = task_name
+        func.delay = delay
+        registry[task_name] = func
+        return func
+
+    return decorator
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts`: exponential with jitter, capped"""
+    base = getattr(settings, 'JOB_BACKOFF_BASE', 10)
+    cap = getattr(settings, 'JOB_BACKOFF_MAX', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _due(queues):
+    jobs = Job.objects.filter(status='queued', run_at__lte=timezone.now())
+    if queues:
+        jobs = jobs.filter(queue__in=queues)
+    return jobs.order_by('run_at')
+
+
+def claim(worker_id, limit=1, queues=None):
+    """Atomically mark up to `limit` due jobs as running for this worker and return them"""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(_due(queues).select_for_update(skip_locked=True)[:limit])
+            if jobs:
+                Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                    status='running', locked_by=worker_id, locked_at=now,
+                )
+    else:
+        # Without SKIP LOCKED, let a conditional UPDATE decide which worker wins each row
+        jobs = []
+        for job in _due(queues)[:limit * 2]:
+            won = Job.objects.filter(pk=job.pk, status='queued').update(
+                status='running', locked_by=worker_id, locked_at=now,
+            )
+            if won:
+                jobs.append(job)
+            if len(jobs) == limit:
+                break
+
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at = 'running', worker_id, now
+    return jobs
+
+
+def run(job):
+    """Execute one claimed job and record its outcome"""
+    func = registry.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.task!r}")
+        func(**job.payload)
+    except Exception:
+        job.attempts += 1
+        job.last_error = traceback.format_exc()
+        job.locked_by, job.locked_at = '', None
+        if job.attempts >= job.max_attempts or func is None:
+            job.status = 'dead'
+            job.finished_at = timezone.now()
+            logger.error("Job %s is dead after %s attempts", job, job.attempts)
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning("Job %s failed, retry %s at %s", job, job.attempts, job.run_at)
+        job.save(update_fields=['attempts', 'last_error', 'locked_by', 'locked_at', 'status', 'finished_at', 'run_at'])
+        return False
+
+    job.attempts += 1
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['attempts', 'status', 'finished_at'])
+    return True
+
+
+def requeue_stale(lease_seconds=None):
+    """Return jobs whose worker died mid-run to the queue
+
+    A lost run counts as a failed attempt, so a job that keeps killing its
+    worker (out of memory, a crash in C code) still ends up dead.
+    """
+    lease_seconds = lease_seconds or getattr(settings, 'JOB_LEASE_SECONDS', 600)
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=lease_seconds))
+    lost = dict(
+        attempts=F('attempts') + 1, locked_by='', locked_at=None,
+        last_error=f"Worker lost: no result within the {lease_seconds}s lease",
+    )
+    dead = stale.filter(attempts__gte=F('max_attempts') - 1).update(status='dead', finished_at=now, **lost)
+    if dead:
+        logger.error("%s jobs are dead after their last attempt lost its worker", dead)
+    return stale.update(status='queued', run_at=now, **lost)
+
+
+def retry(queryset):
+    """Put dead or failed jobs back on the queue with a fresh retry budget"""
+    return queryset.update(status='queued', attempts=0, run_at=timezone.now(), finished_at=None, locked_by='', locked_at=None)
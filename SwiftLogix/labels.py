@@ -0,0 +1,416 @@
+# SwiftLogix/labels.py
+"""
+Printable shipping labels.
+
+Each shipment gets one 4x6 inch page: the tracking number as a Code 128
+barcode, a QR code linking to its tracking page, both addresses and the
+parcel details. Pages are drawn in a process pool, ``LABEL_CHUNK_SIZE``
+shipments per task, and appended to the PDF in order as the chunks come
+back, so memory stays flat however many labels a batch holds. Nothing is
+drawn in a request: the admin action queues a ``print_labels`` job, and
+``manage.py print_labels`` runs a batch in the foreground.
+
+Workers return finished page content streams and the parent only writes
+them out, which is why this module lays out the PDF file itself instead of
+going through a reportlab canvas (one canvas cannot be shared between
+processes). The barcode and QR encoders and the font metrics come from
+reportlab (in requirements.txt); without it only printing labels fails.
+
+Batches land in ``LABELS_DIR`` as ``<name>.pdf`` with a ``<name>.json``
+summary (label count, seconds, labels per second); the oldest are deleted
+beyond ``LABEL_MAX_BATCHES``.
+"""
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    from reportlab.graphics.barcode.code128 import Code128
+    from reportlab.graphics.barcode.qrencoder import QRCode, QRErrorCorrectLevel
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+except ImportError:  # pragma: no cover - optional dependency
+    Code128 = None
+
+BATCH_NAME = re.compile(r'^[\w.-]+$')
+
+# 4x6 inches in points, the usual thermal label
+PAGE_WIDTH, PAGE_HEIGHT = 288, 432
+MARGIN = 14
+FONTS = {'Helvetica': b'F1', 'Helvetica-Bold': b'F2'}
+# Blank modules scanners need around each symbol
+CODE128_QUIET = 10
+QR_QUIET = 4
+
+# Shipment columns a label shows
+LABEL_FIELDS = (
+    'tracking_number', 'shipment_type', 'weight', 'dimensions', 'pickup_date', 'expected_delivery_date',
+    'sender_name', 'sender_phone', 'sender_address', 'sender_city', 'sender_country',
+    'receiver_name', 'receiver_phone', 'receiver_address', 'receiver_city', 'receiver_country',
+)
+
+
+class LabelError(RuntimeError):
+    pass
+
+
+def batch_dir():
+    return Path(getattr(settings, 'LABELS_DIR', settings.BASE_DIR / '.cache' / 'labels'))
+
+
+# ----------------------------------------------------------------------------
+# Page drawing (runs in the worker processes, so it never touches the ORM)
+# ----------------------------------------------------------------------------
+
+def _escape(text):
+    encoded = str(text).encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _fit(text, font, size, width):
+    """text, cut short with an ellipsis if it is wider than width"""
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '...', font, size) > width:
+        text = text[:-1]
+    return text.rstrip() + '...'
+
+
+def _wrap(text, font, size, width, max_lines):
+    lines = []
+    for word in str(text).split():
+        if lines and stringWidth(f'{lines[-1]} {word}', font, size) <= width:
+            lines[-1] = f'{lines[-1]} {word}'
+        else:
+            lines.append(word)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines - 1] + [' '.join(lines[max_lines - 1:])]
+    return [_fit(line, font, size, width) for line in lines]
+
+
+def _text(x, y, text, size=9, font='Helvetica', align='left'):
+    if align == 'right':
+        x -= stringWidth(str(text), font, size)
+    elif align == 'center':
+        x -= stringWidth(str(text), font, size) / 2
+    return b'BT /%s %g Tf %.2f %.2f Td (%s) Tj ET\n' % (FONTS[font], size, x, y, _escape(text))
+
+
+def _rule(y):
+    return b'%.2f w %d %.2f m %d %.2f l S\n' % (0.8, MARGIN, y, PAGE_WIDTH - MARGIN, y)
+
+
+def _barcode(value, x, y, width, height):
+    """Code 128 bars for value, scaled to fill width with its quiet zones"""
+    symbol = Code128(value)
+    symbol.validate()
+    symbol.encode()
+    # Upper-case letters are bars and lower-case letters spaces, 'a'/'A' being one module wide
+    elements = symbol.decompose()
+    module = width / (sum(ord(element.lower()) - ord('a') + 1 for element in elements) + 2 * CODE128_QUIET)
+    x += CODE128_QUIET * module
+    out = []
+    for element in elements:
+        span = (ord(element.lower()) - ord('a') + 1) * module
+        if element.isupper():
+            out.append(b'%.3f %.2f %.3f %.2f re\n' % (x, y, span, height))
+        x += span
+    out.append(b'f\n')
+    return b''.join(out)
+
+
+def _qr(data, x, y, size):
+    code = QRCode(None, QRErrorCorrectLevel.M)
+    code.addData(data)
+    code.make()
+    count = code.getModuleCount()
+    module = size / (count + 2 * QR_QUIET)
+    x, y = x + QR_QUIET * module, y + QR_QUIET * module
+    size -= 2 * QR_QUIET * module
+    out = []
+    for row in range(count):
+        top = y + size - (row + 1) * module
+        col = 0
+        while col < count:
+            if not code.isDark(row, col):
+                col += 1
+                continue
+            # Merge each run of dark modules into one rectangle
+            start = col
+            while col < count and code.isDark(row, col):
+                col += 1
+            out.append(b'%.3f %.3f %.3f %.3f re\n' % (x + start * module, top, (col - start) * module, module))
+    out.append(b'f\n')
+    return b''.join(out)
+
+
+def _party(heading, name, phone, address, city_line, top, name_size):
+    width = PAGE_WIDTH - 2 * MARGIN
+    size = name_size - 3
+    out = [
+        _text(MARGIN, top, heading, 7, 'Helvetica-Bold'),
+        _text(MARGIN, top - name_size - 4, _fit(name, 'Helvetica-Bold', name_size, width), name_size, 'Helvetica-Bold'),
+    ]
+    lines = [(line, 'Helvetica') for line in _wrap(address, 'Helvetica', size, width, 2)]
+    lines.append((_fit(city_line, 'Helvetica-Bold', size, width), 'Helvetica-Bold'))
+    if phone:
+        lines.append((f'Tel. {phone}', 'Helvetica'))
+    y = top - name_size - 4
+    for line, font in lines:
+        y -= size + 3
+        out.append(_text(MARGIN, y, line, size, font))
+    return b''.join(out)
+
+
+def render_page(label, track_url):
+    """One label's page content stream; label is a dict from ``label_row``"""
+    right = PAGE_WIDTH - MARGIN
+    out = [
+        b'%.2f w %d %d %d %d re S\n' % (1.5, MARGIN - 6, MARGIN - 6, PAGE_WIDTH - 2 * MARGIN + 12, PAGE_HEIGHT - 2 * MARGIN + 12),
+        _text(MARGIN, PAGE_HEIGHT - 34, 'SwiftLogix', 18, 'Helvetica-Bold'),
+        _text(right, PAGE_HEIGHT - 34, label['service'].upper(), 12, 'Helvetica-Bold', align='right'),
+        _rule(PAGE_HEIGHT - 44),
+        _party('FROM', label['sender_name'], label['sender_phone'], label['sender_address'],
+               label['sender_city_line'], PAGE_HEIGHT - 56, 10),
+        _rule(PAGE_HEIGHT - 132),
+        _party('SHIP TO', label['receiver_name'], label['receiver_phone'], label['receiver_address'],
+               label['receiver_city_line'], PAGE_HEIGHT - 144, 14),
+        _rule(PAGE_HEIGHT - 244),
+    ]
+
+    # Parcel details beside the QR code
+    details = (
+        ('Weight', label['weight']),
+        ('Dimensions', label['dimensions']),
+        ('Picked up', label['pickup_date']),
+        ('Deliver by', label['expected_delivery']),
+    )
+    y = PAGE_HEIGHT - 262
+    for heading, value in details:
+        out.append(_text(MARGIN, y, heading.upper(), 7, 'Helvetica-Bold'))
+        out.append(_text(MARGIN + 62, y, _fit(value, 'Helvetica', 9, 100), 9))
+        y -= 16
+    qr_size = 104
+    qr_url = f"{track_url}?{urlencode({'tracking_number': label['tracking_number']})}"
+    out.append(_qr(qr_url, right - qr_size, PAGE_HEIGHT - 350, qr_size))
+
+    out.append(_rule(PAGE_HEIGHT - 354))
+    out.append(_barcode(label['tracking_number'], MARGIN, MARGIN + 20, PAGE_WIDTH - 2 * MARGIN, 42))
+    out.append(_text(PAGE_WIDTH / 2, MARGIN + 4, label['tracking_number'], 12, 'Helvetica-Bold', align='center'))
+    return b''.join(out)
+
+
+def render_pages(labels, track_url):
+    """Worker entry point: compressed content streams for a chunk of labels, in order"""
+    return [zlib.compress(render_page(label, track_url)) for label in labels]
+
+
+# ----------------------------------------------------------------------------
+# PDF file
+# ----------------------------------------------------------------------------
+
+class PDFWriter:
+    """Writes a PDF one page at a time; the page tree and cross-reference table go last"""
+
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self, handle, width, height):
+        self.handle = handle
+        self.width = width
+        self.height = height
+        self.position = 0
+        self.offsets = {}
+        self.pages = []
+        self.fonts = {}
+        self.next_id = 3
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for base_font, resource in FONTS.items():
+            number = self._next()
+            self._object(number, b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>'
+                         % base_font.encode())
+            self.fonts[resource] = number
+        self.resources = b'<< /Font << %s >> >>' % b' '.join(
+            b'/%s %d 0 R' % (resource, number) for resource, number in self.fonts.items()
+        )
+
+    def _next(self):
+        number = self.next_id
+        self.next_id += 1
+        return number
+
+    def _write(self, data):
+        self.handle.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def add_page(self, stream):
+        """Append a page whose content is the zlib-compressed stream"""
+        content, page = self._next(), self._next()
+        self._object(content, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+        self._object(page, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>'
+                     % (self.PAGES, self.width, self.height, self.resources, content))
+        self.pages.append(page)
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % page for page in self.pages)
+        self._object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        self._object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        xref = self.position
+        entries = [b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id]
+        entries += [b'%010d 00000 n \n' % self.offsets[number] for number in range(1, self.next_id)]
+        self._write(b''.join(entries))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.next_id, self.CATALOG, xref))
+
+
+# ----------------------------------------------------------------------------
+# Batches
+# ----------------------------------------------------------------------------
+
+def _day(value):
+    return value.strftime('%d %b %Y') if value else '-'
+
+
+def label_row(values, type_labels):
+    """Plain strings for one shipment's label, from a ``.values(*LABEL_FIELDS)`` dict"""
+    return {
+        'tracking_number': values['tracking_number'],
+        'service': type_labels.get(values['shipment_type'], values['shipment_type']),
+        'weight': f"{values['weight']} kg",
+        'dimensions': f"{values['dimensions']} cm" if values['dimensions'] else '-',
+        'pickup_date': _day(values['pickup_date']),
+        'expected_delivery': _day(values['expected_delivery_date']),
+        **{
+            f'{party}_{field}': values[f'{party}_{field}'] or ''
+            for party in ('sender', 'receiver') for field in ('name', 'phone', 'address')
+        },
+        'sender_city_line': f"{values['sender_city']}, {values['sender_country']}",
+        'receiver_city_line': f"{values['receiver_city']}, {values['receiver_country']}",
+    }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def render(labels, path, track_url, workers=None, chunk_size=None):
+    """Write one page per label (an iterable of ``label_row`` dicts) to path; returns the page count
+
+    workers=1 draws in this process. Otherwise chunks go to a pool of fresh
+    ('spawn') processes, which share nothing with this one, database
+    connections included.
+    """
+    if Code128 is None:
+        raise LabelError("Printing labels needs the reportlab package (pip install reportlab)")
+    workers = workers or getattr(settings, 'LABEL_WORKERS', None) or os.cpu_count() or 1
+    chunk_size = chunk_size or getattr(settings, 'LABEL_CHUNK_SIZE', 50)
+
+    count = 0
+    with open(path, 'wb') as handle:
+        writer = PDFWriter(handle, PAGE_WIDTH, PAGE_HEIGHT)
+        if workers == 1:
+            for chunk in _chunks(labels, chunk_size):
+                for stream in render_pages(chunk, track_url):
+                    writer.add_page(stream)
+                    count += 1
+        else:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            with pool:
+                pending = deque()
+                chunks = _chunks(labels, chunk_size)
+                while True:
+                    # Two chunks per worker in flight; pages are written in order as the oldest finishes
+                    while len(pending) < workers * 2 and (chunk := next(chunks, None)) is not None:
+                        pending.append(pool.submit(render_pages, chunk, track_url))
+                    if not pending:
+                        break
+                    for stream in pending.popleft().result():
+                        writer.add_page(stream)
+                        count += 1
+        writer.close()
+    return count
+
+
+def new_batch_name():
+    return f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def print_batch(queryset, track_url, name=None, workers=None, chunk_size=None):
+    """Render a label for every shipment in queryset as batch name; returns its summary"""
+    # Imported here so the pool's worker processes can import this module without loading Django apps
+    from .models import Shipment
+
+    directory = batch_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = name or new_batch_name()
+    path = directory / f'{name}.pdf'
+    partial = directory / f'{name}.pdf.part'
+    type_labels = dict(Shipment.SHIPMENT_TYPE_CHOICES)
+    rows = queryset.order_by('pk').values(*LABEL_FIELDS).iterator(chunk_size=2000)
+
+    started = time.perf_counter()
+    try:
+        count = render((label_row(values, type_labels) for values in rows), partial, track_url, workers, chunk_size)
+    except BaseException:
+        # _prune only knows finished batches, so nothing else would remove the partial file
+        partial.unlink(missing_ok=True)
+        raise
+    seconds = time.perf_counter() - started
+    # Only a complete file ever carries the .pdf name
+    os.replace(partial, path)
+
+    summary = {
+        'name': name,
+        'created_at': timezone.now().isoformat(timespec='seconds'),
+        'labels': count,
+        'seconds': round(seconds, 2),
+        'labels_per_second': round(count / seconds, 1) if seconds else None,
+        'bytes': path.stat().st_size,
+    }
+    with open(directory / f'{name}.json', 'w') as handle:
+        json.dump(summary, handle)
+    _prune(directory)
+    return summary
+
+
+def _prune(directory):
+    keep = getattr(settings, 'LABEL_MAX_BATCHES', 50)
+    for stale in sorted(directory.glob('*.json'), reverse=True)[keep:]:
+        for path in (stale, stale.with_suffix('.pdf')):
+            path.unlink(missing_ok=True)
+
+
+def list_batches(limit=100):
+    """Finished batch summaries, newest first"""
+    batches = []
+    for path in sorted(batch_dir().glob('*.json'), reverse=True)[:limit]:
+        try:
+            with open(path) as handle:
+                batches.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return batches
+
+
+def batch_path(name):
+    """The finished PDF for batch name, or None"""
+    if not BATCH_NAME.match(name):
+        return None
+    path = batch_dir() / f'{name}.pdf'
+    return path if path.exists() else None
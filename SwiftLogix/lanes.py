@@ -0,0 +1,138 @@
+# SwiftLogix/lanes.py
+"""
+Lane transit-time statistics.
+
+Every delivered shipment adds one sample to a histogram of transit hours
+for its city lane and its country lane. Percentiles are derived from the
+histogram on write, so reading a prediction is a single indexed lookup.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import LaneStat, Shipment
+
+# Upper edges (in hours) of the histogram buckets; the last bucket is open-ended.
+BUCKET_EDGES = (
+    6, 12, 18, 24, 36, 48, 60, 72, 96, 120, 144, 168,
+    216, 264, 336, 432, 504, 672, 840, 1008, 1344, 2016,
+)
+
+
+def _normalize(value):
+    return (value or '').strip().casefold()
+
+
+def lane_keys(shipment):
+    """Return the (city lane, country lane) lookup kwargs for a shipment"""
+    country_lane = {
+        'origin_country': _normalize(shipment.sender_country),
+        'origin_city': '',
+        'destination_country': _normalize(shipment.receiver_country),
+        'destination_city': '',
+        'shipment_type': shipment.shipment_type,
+    }
+    city_lane = dict(
+        country_lane,
+        origin_city=_normalize(shipment.sender_city),
+        destination_city=_normalize(shipment.receiver_city),
+    )
+    return city_lane, country_lane
+
+
+def transit_window(shipment):
+    """Return (start, end) of a delivered shipment's transit from its dates and timeline"""
+    timeline = shipment.tracking_updates.aggregate(
+        picked_up=Min('timestamp', filter=Q(status='picked_up')),
+        delivered=Min('timestamp', filter=Q(status='delivered')),
+    )
+    start = shipment.pickup_date or timeline['picked_up'] or shipment.created_at
+    end = shipment.actual_delivery_date or timeline['delivered'] or timezone.now()
+    return start, end
+
+
+def _bucket_index(hours):
+    for index, edge in enumerate(BUCKET_EDGES):
+        if hours <= edge:
+            return index
+    return len(BUCKET_EDGES)
+
+
+def _percentile(histogram, total, fraction, max_hours):
+    """Linearly interpolate a percentile inside the bucket that contains it"""
+    target = fraction * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        if not count:
+            continue
+        if seen + count >= target:
+            lower = BUCKET_EDGES[index - 1] if index else 0
+            upper = BUCKET_EDGES[index] if index < len(BUCKET_EDGES) else max(max_hours, lower)
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+    return max_hours
+
+
+def _add_sample(lane, hours):
+    histogram = list(lane.histogram) or [0] * (len(BUCKET_EDGES) + 1)
+    histogram[_bucket_index(hours)] += 1
+
+    lane.histogram = histogram
+    lane.mean_hours = (lane.mean_hours * lane.sample_count + hours) / (lane.sample_count + 1)
+    lane.sample_count += 1
+    lane.max_hours = max(lane.max_hours, hours)
+    lane.p50_hours = _percentile(histogram, lane.sample_count, 0.50, lane.max_hours)
+    lane.p80_hours = _percentile(histogram, lane.sample_count, 0.80, lane.max_hours)
+    lane.p95_hours = _percentile(histogram, lane.sample_count, 0.95, lane.max_hours)
+    lane.save()
+
+
+def record_delivery(shipment):
+    """Fold a delivered shipment's transit time into its lanes, at most once per shipment"""
+    with transaction.atomic():
+        claimed = Shipment.objects.filter(pk=shipment.pk, lane_recorded=False).update(lane_recorded=True)
+        shipment.lane_recorded = True
+        if not claimed:
+            return False
+
+        start, end = transit_window(shipment)
+        hours = max((end - start).total_seconds() / 3600, 0)
+        city_lane, country_lane = lane_keys(shipment)
+        for keys in (city_lane, country_lane) if city_lane != country_lane else (country_lane,):
+            lane, created = LaneStat.objects.select_for_update().get_or_create(**keys)
+            _add_sample(lane, hours)
+    return True
+
+
+def lane_for(shipment):
+    """Return the most specific lane with enough samples, or None"""
+    city_lane, country_lane = lane_keys(shipment)
+    min_samples = getattr(settings, 'LANE_MIN_SAMPLES', 5)
+    candidates = LaneStat.objects.filter(
+        Q(**city_lane) | Q(**country_lane),
+        sample_count__gte=min_samples,
+    )
+    best = None
+    for lane in candidates:
+        if best is None or lane.origin_city:
+            best = lane
+    return best
+
+
+def predict(shipment, lane=None):
+    """Predicted ETA and time-based progress for a shipment"""
+    lane = lane or lane_for(shipment)
+    prediction = {
+        'predicted_delivery': None,
+        'predicted_delivery_p95': None,
+        'progress': shipment.get_progress_percentage(lane),
+        'lane_samples': lane.sample_count if lane else 0,
+    }
+    if lane is not None and shipment.status not in ('delivered', 'cancelled'):
+        started = shipment.pickup_date or shipment.created_at
+        prediction['predicted_delivery'] = started + timedelta(hours=lane.p50_hours)
+        prediction['predicted_delivery_p95'] = started + timedelta(hours=lane.p95_hours)
+    return prediction
@@ -0,0 +1,311 @@
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from SwiftLogix import rollups
+from SwiftLogix.gazetteer import get_gazetteer
+from SwiftLogix.models import QuoteRequest, Shipment, TrackingUpdate
+
+SEED_PREFIX = 'BEN'
+BENCH_USER = 'bench-customer'
+BENCH_STAFF = 'bench-staff'
+BENCH_PASSWORD = 'bench-password'
+
+FIRST_NAMES = ['Kwame', 'Ama', 'Kofi', 'Efua', 'John', 'Maria', 'Chen', 'Aisha', 'Lucas', 'Priya', 'Olu', 'Sara']
+LAST_NAMES = ['Mensah', 'Owusu', 'Smith', 'Garcia', 'Wang', 'Bello', 'Silva', 'Patel', 'Okafor', 'Nielsen']
+DESCRIPTIONS = ['Electronics', 'Textiles', 'Machine parts', 'Documents', 'Cocoa samples', 'Medical supplies']
+UPDATE_FLOW = [
+    ('picked_up', 'Package picked up from sender'),
+    ('in_transit', 'Departed origin facility'),
+    ('in_transit', 'Arrived at transit hub'),
+    ('out_for_delivery', 'Out for delivery'),
+    ('delivered', 'Delivered to receiver'),
+]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic data and measure throughput and latency of the main views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Shipments to create before benchmarking")
+        parser.add_argument('--updates-per-shipment', type=int, default=4)
+        parser.add_argument('--quotes', type=int, default=None, help="Quote requests to create (default: seed / 2)")
+        parser.add_argument('--purge', action='store_true', help="Delete previously seeded data and exit")
+        parser.add_argument('--scenarios', default='', help="Comma-separated scenarios to run (default: all)")
+        parser.add_argument('--concurrency', type=int, default=4, help="Client threads per scenario")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per scenario")
+        parser.add_argument('--output', help="Write results as JSON to this path")
+        parser.add_argument('--compare', help="Print the change against a previous JSON result")
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            self.purge()
+            return
+        if options['seed']:
+            quotes = options['quotes'] if options['quotes'] is not None else options['seed'] // 2
+            self.seed(options['seed'], options['updates_per_shipment'], quotes)
+
+        tracking_numbers = list(
+            Shipment.objects.filter(tracking_number__startswith=SEED_PREFIX)
+            .order_by('?').values_list('tracking_number', flat=True)[:1000]
+        )
+        if not tracking_numbers:
+            raise CommandError("No seeded shipments found; run with --seed N first.")
+
+        scenarios = self.scenarios(tracking_numbers)
+        wanted = [name for name in options['scenarios'].split(',') if name]
+        unknown = set(wanted) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}. Choose from {', '.join(scenarios)}.")
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False, DEBUG=False):
+            for name, (login, request) in scenarios.items():
+                if wanted and name not in wanted:
+                    continue
+                results[name] = self.run_scenario(name, login, request, options)
+
+        report = {
+            'commit': self.git_commit(),
+            'at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'shipments': Shipment.objects.count(),
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'scenarios': results,
+        }
+        self.print_report(report)
+        if options['compare']:
+            with open(options['compare']) as handle:
+                self.print_comparison(json.load(handle), report)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    # ------------------------------------------------------------------
+    # Seeding
+    # ------------------------------------------------------------------
+
+    def seed(self, count, updates_per_shipment, quotes, batch_size=5000):
+        gazetteer = get_gazetteer()
+        places = list(zip(gazetteer.names, gazetteer.countries, gazetteer.lats, gazetteer.lngs))
+        customer = self.bench_user(BENCH_USER)
+        self.bench_user(BENCH_STAFF, is_staff=True, is_superuser=True)
+
+        offset = Shipment.objects.filter(tracking_number__startswith=SEED_PREFIX).count()
+        now = timezone.now()
+        statuses = [code for code, label in Shipment.SHIPMENT_STATUS_CHOICES]
+        types = [code for code, label in Shipment.SHIPMENT_TYPE_CHOICES]
+        started = time.monotonic()
+
+        for start in range(0, count, batch_size):
+            shipments = []
+            for n in range(offset + start, offset + min(start + batch_size, count)):
+                origin, destination = random.sample(places, 2)
+                status = random.choice(statuses)
+                pickup = now - timedelta(hours=random.randint(1, 24 * 30))
+                moving = status in ('picked_up', 'in_transit', 'out_for_delivery', 'on_hold')
+                shipments.append(Shipment(
+                    tracking_number=f'{SEED_PREFIX}{n:010d}',
+                    status=status,
+                    shipment_type=random.choice(types),
+                    user=customer if n % 50 == 0 else None,
+                    sender_name=f'{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}',
+                    sender_email=f'sender{n}@example.com',
+                    sender_phone='+233200000000',
+                    sender_address=f'{n} Harbour Road',
+                    sender_city=origin[0], sender_country=origin[1],
+                    sender_latitude=origin[2], sender_longitude=origin[3],
+                    receiver_name=f'{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}',
+                    receiver_email=f'receiver{n}@example.com',
+                    receiver_phone='+447700900000',
+                    receiver_address=f'{n} Station Street',
+                    receiver_city=destination[0], receiver_country=destination[1],
+                    receiver_latitude=destination[2], receiver_longitude=destination[3],
+                    current_latitude=(origin[2] + destination[2]) / 2 if moving else None,
+                    current_longitude=(origin[3] + destination[3]) / 2 if moving else None,
+                    package_description=random.choice(DESCRIPTIONS),
+                    weight=Decimal(random.randint(1, 5000)) / 10,
+                    dimensions=f'{random.randint(10, 120)}x{random.randint(10, 80)}x{random.randint(5, 60)}',
+                    declared_value=Decimal(random.randint(100, 500000)) / 100,
+                    pickup_date=pickup,
+                    expected_delivery_date=pickup + timedelta(days=random.randint(2, 30)),
+                    actual_delivery_date=pickup + timedelta(days=random.randint(1, 20)) if status == 'delivered' else None,
+                ))
+            for shipment in shipments:
+                shipment.update_geohash()
+            Shipment.objects.bulk_create(shipments, batch_size=1000)
+
+            # bulk_create only sets primary keys on some backends; read them back by tracking number
+            ids = dict(Shipment.objects.filter(
+                tracking_number__in=[s.tracking_number for s in shipments]
+            ).values_list('tracking_number', 'pk'))
+            updates = []
+            for shipment in shipments:
+                when = shipment.pickup_date
+                for status, description in UPDATE_FLOW[:random.randint(1, updates_per_shipment)]:
+                    when += timedelta(hours=random.randint(2, 48))
+                    updates.append(TrackingUpdate(
+                        shipment_id=ids[shipment.tracking_number], status=status,
+                        location=random.choice((shipment.sender_city, shipment.receiver_city)),
+                        description=description, timestamp=when,
+                    ))
+            TrackingUpdate.objects.bulk_create(updates, batch_size=1000)
+            done = min(start + batch_size, count)
+            self.stdout.write(f"  seeded {done}/{count} shipments ({done / (time.monotonic() - started):.0f}/s)")
+
+        freight = [code for code, label in QuoteRequest.FREIGHT_CHOICES]
+        quote_statuses = [code for code, label in QuoteRequest.STATUS_CHOICES]
+        for start in range(0, quotes, batch_size):
+            QuoteRequest.objects.bulk_create([
+                QuoteRequest(
+                    name=f'{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)}',
+                    email=f'{SEED_PREFIX.lower()}-quote{n}@example.com',
+                    mobile='+233200000000',
+                    freight_type=random.choice(freight),
+                    origin=random.choice(places)[0],
+                    destination=random.choice(places)[0],
+                    weight=str(random.randint(1, 20000)),
+                    status=random.choice(quote_statuses),
+                    user=customer if n % 50 == 0 else None,
+                )
+                for n in range(start, min(start + batch_size, quotes))
+            ], batch_size=1000)
+
+        # bulk_create bypasses the signals that keep the daily rollups current
+        rollups.rebuild(timezone.localdate(), timezone.localdate())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {count} shipments and {quotes} quote requests in {time.monotonic() - started:.1f}s."
+        ))
+
+    @staticmethod
+    def bench_user(username, **flags):
+        user, created = User.objects.get_or_create(username=username, defaults={'email': f'{username}@example.com', **flags})
+        if created:
+            user.set_password(BENCH_PASSWORD)
+            user.save()
+        return user
+
+    def purge(self):
+        shipments, _ = Shipment.objects.filter(tracking_number__startswith=SEED_PREFIX).delete()
+        quotes, _ = QuoteRequest.objects.filter(email__startswith=f'{SEED_PREFIX.lower()}-quote').delete()
+        User.objects.filter(username__in=[BENCH_USER, BENCH_STAFF]).delete()
+        rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {shipments} shipment rows and {quotes} quote rows."))
+
+    # ------------------------------------------------------------------
+    # Scenarios
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def scenarios(tracking_numbers):
+        """name -> (username to log in as or None, callable(client) returning a response)"""
+        pick = random.choice
+        quote_form = {
+            'name': 'Bench Quote', 'email': f'{SEED_PREFIX.lower()}-quote-live@example.com', 'mobile': '+233200000000',
+            'freight': 'air', 'origin': 'Accra', 'destination': 'London', 'weight': '12',
+        }
+        return {
+            'track_shipment': (None, lambda c: c.get('/track/', {'tracking_number': pick(tracking_numbers)})),
+            'track_shipment_api': (None, lambda c: c.get('/track/api/', {'tracking_number': pick(tracking_numbers)})),
+            'quote': (None, lambda c: c.post('/quote/', quote_form)),
+            'dashboard_view': (BENCH_USER, lambda c: c.get('/dashboard/')),
+            'admin_shipment_changelist': (BENCH_STAFF, lambda c: c.get('/admin/SwiftLogix/shipment/')),
+        }
+
+    def run_scenario(self, name, login, request, options):
+        local = threading.local()
+
+        def client():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                if login and not local.client.login(username=login, password=BENCH_PASSWORD):
+                    raise CommandError(f"Could not log in as {login}; seed first.")
+            return local.client
+
+        def timed(_):
+            started = time.perf_counter()
+            response = request(client())
+            return time.perf_counter() - started, response.status_code < 400
+
+        def close(_):
+            connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(timed, range(options['warmup'])))
+            started = time.perf_counter()
+            samples = list(pool.map(timed, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+            list(pool.map(close, range(options['concurrency'])))
+
+        latencies = sorted(latency for latency, ok in samples)
+        errors = sum(not ok for latency, ok in samples)
+        result = {
+            'requests': len(samples),
+            'errors': errors,
+            'throughput_rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(self.percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(self.percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(self.percentile(latencies, 99) * 1000, 2),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        }
+        self.stdout.write(f"  {name}: {result['throughput_rps']} req/s, p95 {result['p95_ms']} ms")
+        return result
+
+    @staticmethod
+    def percentile(ordered, pct):
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\nCommit {report['commit'] or 'unknown'} on {report['database']}, "
+            f"{report['shipments']} shipments, {report['concurrency']} threads\n"
+        )
+        self.stdout.write(f"{'scenario':<28}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, result in report['scenarios'].items():
+            self.stdout.write(
+                f"{name:<28}{result['throughput_rps']:>10}{result['p50_ms']:>10}"
+                f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}"
+            )
+
+    def print_comparison(self, before, after):
+        self.stdout.write(f"\nChange since {before.get('commit') or 'baseline'}:")
+        for name, result in after['scenarios'].items():
+            previous = before.get('scenarios', {}).get(name)
+            if not previous:
+                continue
+            rps = (result['throughput_rps'] / previous['throughput_rps'] - 1) * 100 if previous['throughput_rps'] else 0
+            p95 = (result['p95_ms'] / previous['p95_ms'] - 1) * 100 if previous['p95_ms'] else 0
+            self.stdout.write(f"{name:<28}throughput {rps:+.1f}%   p95 {p95:+.1f}%")
@@ -0,0 +1,109 @@
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from SwiftLogix import lanes, serializers
+from SwiftLogix.models import Shipment, TrackingUpdate
+
+BENCH_TRACKING_NUMBER = 'BENSER{:06d}'
+
+
+class Rollback(Exception):
+    pass
+
+
+def model_payload(tracking_number):
+    """The track API body built the way it was before serializers.py: model instances,
+    get_*_display() and three strftime calls per update, stdlib json (shipment fields abridged)"""
+    shipment = Shipment.objects.get(tracking_number__iexact=tracking_number)
+    prediction = lanes.predict(shipment)
+    updates = [
+        {
+            'status': update.get_status_display(),
+            'location': update.location,
+            'description': update.description,
+            'timestamp': update.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'date': update.timestamp.strftime('%b %d, %Y'),
+            'time': update.timestamp.strftime('%I:%M %p'),
+        }
+        for update in shipment.tracking_updates.all()
+    ]
+    body = {
+        'success': True,
+        'shipment': {
+            'tracking_number': shipment.tracking_number,
+            'status': shipment.get_status_display(),
+            'progress': prediction['progress'],
+            'shipment_type': shipment.get_shipment_type_display(),
+            'expected_delivery': shipment.expected_delivery_date.strftime('%Y-%m-%d'),
+            'weight': str(shipment.weight),
+        },
+        'tracking_updates': updates,
+    }
+    return json.dumps(body).encode()
+
+
+def serializer_payload(tracking_number):
+    return serializers.dumps(serializers.tracking_payload(tracking_number))
+
+
+class Command(BaseCommand):
+    help = "Measure per-response CPU time of the tracking API body for shipments with many updates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', default='10,100,1000', help="Comma-separated update counts")
+        parser.add_argument('--repeat', type=int, default=50, help="Timed responses per case")
+
+    def handle(self, *args, **options):
+        counts = [int(count) for count in options['updates'].split(',') if count]
+        self.stdout.write(f"Encoder: {'orjson' if serializers.orjson else 'stdlib json'}")
+        self.stdout.write(f"{'updates':>8}  {'model ms':>10}  {'serializer ms':>14}  {'speedup':>8}")
+        try:
+            with transaction.atomic():
+                for count in counts:
+                    tracking_number = self.seed(count)
+                    before = self.measure(model_payload, tracking_number, options['repeat'])
+                    after = self.measure(serializer_payload, tracking_number, options['repeat'])
+                    self.stdout.write(
+                        f"{count:>8}  {before:>10.3f}  {after:>14.3f}  {before / after if after else 0:>7.1f}x"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        """A throwaway shipment with ``count`` updates; rolled back when the command ends"""
+        now = timezone.now()
+        shipment = Shipment.objects.create(
+            tracking_number=BENCH_TRACKING_NUMBER.format(count),
+            status='in_transit', shipment_type='air',
+            sender_name='Bench Sender', sender_email='sender@example.com', sender_phone='1',
+            sender_address='1 Harbour Road', sender_city='Accra', sender_country='Ghana',
+            receiver_name='Bench Receiver', receiver_email='receiver@example.com', receiver_phone='2',
+            receiver_address='2 Station Street', receiver_city='London', receiver_country='United Kingdom',
+            package_description='Parts', weight=10, dimensions='10x10x10', declared_value=100,
+            pickup_date=now - timedelta(days=2), expected_delivery_date=now + timedelta(days=3),
+        )
+        TrackingUpdate.objects.bulk_create([
+            TrackingUpdate(
+                shipment=shipment, status='in_transit', location=f'Hub {n}',
+                description='Scanned at hub', timestamp=now - timedelta(minutes=n),
+            )
+            for n in range(count)
+        ])
+        return shipment.tracking_number
+
+    def measure(self, build, tracking_number, repeat):
+        """Median CPU milliseconds per response; includes SQLite's own work, not a remote database's"""
+        build(tracking_number)
+        samples = []
+        for _ in range(repeat):
+            started = time.process_time()
+            build(tracking_number)
+            samples.append((time.process_time() - started) * 1000)
+        return statistics.median(samples)
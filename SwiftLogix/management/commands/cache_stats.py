@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from SwiftLogix.cache import metrics
+
+
+class Command(BaseCommand):
+    help = "Show cache hit rates and stampede-protection counters aggregated across workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the shared counters after printing")
+
+    def handle(self, *args, **options):
+        for name, value in metrics.snapshot().items():
+            self.stdout.write(f"{name:<20}{value}")
+        if options['reset']:
+            metrics.reset()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,56 @@
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from SwiftLogix import webhooks
+
+
+class Command(BaseCommand):
+    help = "Deliver queued shipment webhooks in signed batches over pooled connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=None,
+            help="Concurrent requests across all endpoints (default: WEBHOOK_THREADS)",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when idle")
+        parser.add_argument('--once', action='store_true', help="Deliver what is due now and exit")
+
+    def handle(self, *args, **options):
+        threads = options['threads'] or getattr(settings, 'WEBHOOK_THREADS', 8)
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+        delivered = failed = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            dispatcher = webhooks.Dispatcher(executor)
+            pending = set()
+            while not stopping.is_set():
+                close_old_connections()
+                webhooks.requeue_stale()
+                pending |= set(dispatcher.dispatch())
+                if not pending:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, pending = wait(pending, timeout=options['poll_interval'], return_when='FIRST_COMPLETED')
+                for future in done:
+                    if future.result():
+                        delivered += 1
+                    else:
+                        failed += 1
+            wait(pending)
+            dispatcher.pool.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{delivered} batches delivered, {failed} failed in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from SwiftLogix import sla, tasks
+from SwiftLogix.models import Job
+
+
+class Command(BaseCommand):
+    help = "Put overdue and silent in-transit shipments on hold and write an exceptions report"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only write the report; change no shipments")
+        parser.add_argument('--chunk-size', type=int, help="Shipments held per UPDATE (default: SLA_CHUNK_SIZE)")
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help="Queue the recurring detection job for run_worker instead of running now",
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            task_name = tasks.detect_sla_breaches.task_name
+            if Job.objects.filter(task=task_name, status='queued').exists():
+                self.stdout.write("SLA breach detection is already scheduled.")
+            else:
+                tasks.detect_sla_breaches.delay()
+                self.stdout.write(self.style.SUCCESS("Scheduled recurring SLA breach detection."))
+            return
+
+        summary = sla.detect(hold=False if options['dry_run'] else None, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['overdue']} overdue and {summary['silent']} silent shipments; "
+            f"{summary['held']} put on hold. Report: {summary['report']}"
+        ))
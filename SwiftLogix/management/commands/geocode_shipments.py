@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from SwiftLogix.models import Shipment
+
+COORDINATE_FIELDS = ['sender_latitude', 'sender_longitude', 'receiver_latitude', 'receiver_longitude']
+
+
+class Command(BaseCommand):
+    help = "Backfill sender/receiver coordinates from the offline gazetteer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Re-resolve every shipment, not only those missing coordinates",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        shipments = Shipment.objects.only(
+            'pk', 'sender_city', 'sender_country', 'receiver_city', 'receiver_country', *COORDINATE_FIELDS,
+        ).order_by('pk')
+        if not options['all']:
+            shipments = shipments.filter(Q(sender_latitude__isnull=True) | Q(receiver_latitude__isnull=True))
+
+        resolved = unresolved = 0
+        last_pk = 0
+        while True:
+            batch = list(shipments.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for shipment in batch:
+                if options['all']:
+                    shipment.sender_latitude = shipment.receiver_latitude = None
+                shipment.geocode()
+                if shipment.sender_latitude is None or shipment.receiver_latitude is None:
+                    unresolved += 1
+                else:
+                    resolved += 1
+            # bulk_update skips save(), so rollups and notification receivers stay quiet
+            Shipment.objects.bulk_update(batch, COORDINATE_FIELDS)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Geocoded {resolved} shipments; {unresolved} have a city the gazetteer could not place."
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from SwiftLogix import labels
+from SwiftLogix.models import Shipment
+
+
+class Command(BaseCommand):
+    help = "Print shipping labels (barcode and QR code) for shipments as one multi-page PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tracking_numbers', nargs='*', help="Shipments to print (default: all matching --status)")
+        parser.add_argument('--status', help="Only shipments in this status, e.g. pending")
+        parser.add_argument('--workers', type=int, help="Processes drawing pages (default: LABEL_WORKERS or one per CPU)")
+        parser.add_argument('--chunk-size', type=int, help="Labels per task sent to a worker (default: LABEL_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        shipments = Shipment.objects.all()
+        if options['tracking_numbers']:
+            shipments = shipments.filter(tracking_number__in=options['tracking_numbers'])
+        if options['status']:
+            shipments = shipments.filter(status=options['status'])
+        if not (options['tracking_numbers'] or options['status']):
+            raise CommandError("Pass tracking numbers or --status")
+
+        track_url = settings.SITE_URL.rstrip('/') + reverse('track')
+        try:
+            summary = labels.print_batch(
+                shipments, track_url, workers=options['workers'], chunk_size=options['chunk_size'],
+            )
+        except labels.LabelError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Printed {summary['labels']} labels in {summary['seconds']}s "
+            f"({summary['labels_per_second'] or '-'} labels/s): {labels.batch_dir() / (summary['name'] + '.pdf')}"
+        ))
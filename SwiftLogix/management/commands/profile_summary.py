@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from SwiftLogix import profiling
+
+
+class Command(BaseCommand):
+    help = "Summarize captured request profiles: slowest requests and the hottest functions across them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help="Only captures of this URL name")
+        parser.add_argument('--sort', default='tottime', choices=['tottime', 'cumulative', 'ncalls'])
+        parser.add_argument('--limit', type=int, default=25)
+        parser.add_argument('--clear', action='store_true', help="Delete every capture and exit")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(self.style.SUCCESS(f"Removed {profiling.clear_captures()} files."))
+            return
+
+        captures = profiling.list_captures(limit=None)
+        if options['view']:
+            captures = [c for c in captures if c['view'] == options['view']]
+        if not captures:
+            self.stdout.write("No captures yet; set PROFILER_SAMPLE_RATE or PROFILER_SLOW_MS.")
+            return
+
+        self.stdout.write(f"{'captured':<22}{'reason':<9}{'view':<32}{'ms':>9}{'db ms':>9}{'queries':>9}")
+        for capture in sorted(captures, key=lambda c: c['duration_ms'], reverse=True)[:options['limit']]:
+            self.stdout.write(
+                f"{capture['at'][:19]:<22}{capture['reason']:<9}{capture['view'][:31]:<32}"
+                f"{capture['duration_ms']:>9}{capture['db_ms']:>9}{capture['query_count']:>9}"
+            )
+
+        profiled = [c['name'] for c in captures if c['profiled']]
+        if profiled:
+            self.stdout.write(f"\nHot functions across {len(profiled)} profiled requests:")
+            self.stdout.write(profiling.hot_functions(profiled, sort=options['sort'], limit=options['limit']))
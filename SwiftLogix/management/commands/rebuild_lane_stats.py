@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from SwiftLogix import lanes
+from SwiftLogix.models import LaneStat, Shipment
+
+
+class Command(BaseCommand):
+    help = "Backfill lane transit statistics from delivered shipments not yet recorded"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Drop all lane statistics and relearn them from every delivered shipment",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            with transaction.atomic():
+                LaneStat.objects.all().delete()
+                Shipment.objects.filter(lane_recorded=True).update(lane_recorded=False)
+
+        pending = Shipment.objects.filter(status='delivered', lane_recorded=False).order_by('pk')
+        recorded = 0
+        last_pk = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for shipment in batch:
+                recorded += lanes.record_delivery(shipment)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recorded {recorded} deliveries into {LaneStat.objects.count()} lanes."
+        ))
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from SwiftLogix import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily shipment and quote rollups from the raw tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--until', help="Last day to rebuild (YYYY-MM-DD)")
+        parser.add_argument(
+            '--days',
+            type=int,
+            help="Rebuild only the last N days; the usual catch-up after bulk imports",
+        )
+        parser.add_argument('--all', action='store_true', help="Rebuild the complete history")
+
+    def handle(self, *args, **options):
+        since = parse_date(options['since']) if options['since'] else None
+        until = parse_date(options['until']) if options['until'] else None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        if not (since or until or options['all']):
+            raise CommandError("Pass --since/--until, --days or --all")
+
+        shipment_buckets, quote_buckets = rollups.rebuild(since, until)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {shipment_buckets} shipment buckets and {quote_buckets} quote buckets."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from SwiftLogix import geo, tasks
+from SwiftLogix.models import Job
+
+
+class Command(BaseCommand):
+    help = "Recompute distance-based progress for shipments in transit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help="Queue the recurring refresh job for run_worker instead of refreshing now",
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            task_name = tasks.refresh_route_progress.task_name
+            if Job.objects.filter(task=task_name, status='queued').exists():
+                self.stdout.write("Route progress refresh is already scheduled.")
+            else:
+                tasks.refresh_route_progress.delay()
+                self.stdout.write(self.style.SUCCESS("Scheduled recurring route progress refresh."))
+            return
+
+        written = geo.refresh_progress(chunk_size=options['chunk_size'])
+        cleared = geo.clear_inactive()
+        backend = 'numpy' if geo.np is not None else 'pure python'
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {written} shipments ({backend}); cleared {cleared} no longer moving."
+        ))
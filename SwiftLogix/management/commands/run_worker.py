@@ -0,0 +1,73 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from SwiftLogix import jobs
+
+
+class Command(BaseCommand):
+    help = "Claim and run background jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help="Jobs run in parallel threads (default: JOB_WORKER_CONCURRENCY)",
+        )
+        parser.add_argument('--queues', default='', help="Comma-separated queues to serve (default: all)")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when idle")
+        parser.add_argument('--once', action='store_true', help="Drain the due jobs and exit")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or getattr(settings, 'JOB_WORKER_CONCURRENCY', 4)
+        queues = [q for q in options['queues'].split(',') if q]
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Finishing running jobs, then stopping...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"Worker {worker_id} serving {queues or 'all queues'} with {concurrency} threads")
+        processed = failed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                # Claim only as many jobs as there are free threads, as soon as one frees up
+                free = concurrency - len(running)
+                if free:
+                    close_old_connections()
+                    jobs.requeue_stale()
+                    claimed = jobs.claim(worker_id, limit=free, queues=queues)
+                    running.update(pool.submit(self.run_job, job) for job in claimed)
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    failed += not future.result()
+            for future in wait(running).done:
+                processed += 1
+                failed += not future.result()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs ({failed} failed)."))
+
+    @staticmethod
+    def run_job(job):
+        try:
+            return jobs.run(job)
+        finally:
+            # Each pool thread has its own connection; don't leave it open between jobs
+            connection.close()
@@ -0,0 +1,30 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from SwiftLogix import notifications
+
+
+class Command(BaseCommand):
+    help = "Send pending status-change digests and report notification backlog and throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats', action='store_true', help="Only print backlog and throughput")
+        parser.add_argument(
+            '--no-wait', action='store_true',
+            help="Ignore the coalescing window and send everything pending now",
+        )
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            window = timedelta(0) if options['no_wait'] else None
+            emails = events = 0
+            while True:
+                sent, covered = notifications.flush(window=window)
+                if not sent:
+                    break
+                emails += sent
+                events += covered
+            self.stdout.write(self.style.SUCCESS(f"Sent {emails} digests covering {events} events."))
+        self.stdout.write(json.dumps(notifications.stats(), indent=2, default=str))
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+BASELINE_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware' if m == 'SwiftLogix.sessions.HybridSessionMiddleware' else m
+    for m in settings.MIDDLEWARE
+]
+
+SCENARIO = [
+    ('anonymous GET /contact/', 'get', '/contact/', None),
+    ('anonymous POST /contact/', 'post', '/contact/', {
+        'name': 'Bench', 'email': 'bench@example.com', 'subject': 'Hi', 'message': 'Hello',
+    }),
+    ('anonymous GET /contact/ (flash)', 'get', '/contact/', None),
+    ('POST /login/', 'post', '/login/', {'username': 'session-bench', 'password': 'session-bench-pw'}),
+    ('GET /dashboard/', 'get', '/dashboard/', None),
+    ('GET /dashboard/ (again)', 'get', '/dashboard/', None),
+    ('GET /profile/', 'get', '/profile/', None),
+]
+
+
+class Command(BaseCommand):
+    help = "Count django_session queries per request for the DB session backend vs the configured one"
+
+    def handle(self, *args, **options):
+        baseline = self.run_scenario(
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            MIDDLEWARE=BASELINE_MIDDLEWARE,
+        )
+        configured = self.run_scenario()
+
+        self.stdout.write(f"{'request':<36}{'db backend':>12}{settings.SESSION_ENGINE:>28}")
+        for (label, before), (_, after) in zip(baseline, configured):
+            self.stdout.write(f"{label:<36}{before:>12}{after:>28}")
+        saved = sum(count for _, count in baseline) - sum(count for _, count in configured)
+        self.stdout.write(self.style.SUCCESS(
+            f"Session queries removed: {saved} over {len(SCENARIO)} requests "
+            f"({saved / len(SCENARIO):.2f} per request)."
+        ))
+
+    def run_scenario(self, **overrides):
+        """Replay SCENARIO with a throwaway user, rolling back every DB write afterwards"""
+        results = []
+        overrides.setdefault('ALLOWED_HOSTS', ['testserver'])
+        overrides.setdefault('SECURE_SSL_REDIRECT', False)
+        with override_settings(**overrides), transaction.atomic():
+            User.objects.create_user('session-bench', password='session-bench-pw')
+            client = Client()
+            for label, method, path, data in SCENARIO:
+                with CaptureQueriesContext(connection) as queries:
+                    getattr(client, method)(path, data)
+                session_queries = [q for q in queries.captured_queries if 'django_session' in q['sql']]
+                results.append((label, len(session_queries)))
+            transaction.set_rollback(True)
+        return results
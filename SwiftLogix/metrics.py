@@ -0,0 +1,249 @@
+# SwiftLogix/metrics.py
+"""
+Per-view request instrumentation.
+
+``RequestMetricsMiddleware`` times every request and, through a database
+execute wrapper and the ``DjangoTemplates`` backend below, the queries and
+template rendering inside it. Observations are added to in-process
+histograms labelled by URL name; every ``METRICS_FLUSH_SECONDS`` each worker
+writes its cumulative histograms to ``METRICS_ALIAS`` under its own key, and
+``/metrics`` sums all workers into Prometheus text format. With
+``METRICS_SERVER_TIMING`` on, the same figures go out as a ``Server-Timing``
+header.
+"""
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+
+WORKERS_KEY = 'swiftlogix.metrics.workers'
+WORKER_KEY_PREFIX = 'swiftlogix.metrics.worker:'
+
+# name -> (help text, bucket upper bounds, labels)
+HISTOGRAMS = {
+    'swiftlogix_request_duration_seconds': (
+        'Wall time spent handling a request',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+        ('view', 'method', 'status'),
+    ),
+    'swiftlogix_request_db_duration_seconds': (
+        'Time spent in database queries per request',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+        ('view',),
+    ),
+    'swiftlogix_request_queries': (
+        'Database queries per request',
+        (0, 1, 2, 5, 10, 20, 50, 100, 250),
+        ('view',),
+    ),
+    'swiftlogix_request_template_duration_seconds': (
+        'Time spent rendering templates per request',
+        (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+        ('view',),
+    ),
+    'swiftlogix_response_size_bytes': (
+        'Response body size',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+        ('view',),
+    ),
+}
+
+_current = ContextVar('swiftlogix_request_metrics', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class Registry:
+    """Cumulative histograms for this worker, periodically published to the shared cache"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._series = {}  # (name, label values) -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        self._published_at = time.monotonic()
+
+    @property
+    def alias(self):
+        return getattr(settings, 'METRICS_ALIAS', None) or getattr(settings, 'CACHE_METRICS_ALIAS', None)
+
+    def observe(self, name, labels, value):
+        bounds = HISTOGRAMS[name][1]
+        index = bisect_left(bounds, value)
+        with self._lock:
+            series = self._series.get((name, labels))
+            if series is None:
+                series = self._series[(name, labels)] = [0] * (len(bounds) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def maybe_publish(self):
+        interval = getattr(settings, 'METRICS_FLUSH_SECONDS', 10)
+        if time.monotonic() - self._published_at >= interval:
+            self.publish()
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def publish(self):
+        self._published_at = time.monotonic()
+        if self.alias is None:
+            return
+        shared = caches[self.alias]
+        ttl = getattr(settings, 'METRICS_WORKER_TTL', 86400)
+        shared.set(WORKER_KEY_PREFIX + self.worker_id, self.snapshot(), ttl)
+        workers = shared.get(WORKERS_KEY) or []
+        if self.worker_id not in workers:
+            # Racing workers can drop each other here; each re-adds itself on its next publish
+            shared.set(WORKERS_KEY, workers[-255:] + [self.worker_id], ttl)
+
+    def collect(self):
+        """Histograms summed over every worker that has published, with this worker's live values"""
+        totals = {}
+        snapshots = [self.snapshot()]
+        if self.alias is not None:
+            shared = caches[self.alias]
+            workers = [w for w in shared.get(WORKERS_KEY) or [] if w != self.worker_id]
+            snapshots += shared.get_many([WORKER_KEY_PREFIX + w for w in workers]).values()
+        for snapshot in snapshots:
+            for key, series in snapshot.items():
+                if key[0] not in HISTOGRAMS:
+                    continue
+                total = totals.get(key)
+                if total is None or len(total) != len(series):
+                    totals[key] = list(series)
+                else:
+                    totals[key] = [a + b for a, b in zip(total, series)]
+        return totals
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(totals=None):
+    """Prometheus text exposition (format 0.0.4) of the request histograms and cache counters"""
+    from .cache import metrics as cache_metrics
+
+    totals = registry.collect() if totals is None else totals
+    lines = []
+    for name, (help_text, bounds, label_names) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series_name, labels), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_text}}} {series[-1]:.6f}')
+            lines.append(f'{name}_count{{{label_text}}} {cumulative}')
+
+    for counter, value in cache_metrics.snapshot().items():
+        if isinstance(value, int):
+            metric = f'swiftlogix_cache_{counter}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """Record wall, database and template time, query count and response size per URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', False)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unmatched>'
+        size = len(response.content) if not response.streaming else 0
+        registry.observe('swiftlogix_request_duration_seconds', (view, request.method, f'{response.status_code // 100}xx'), elapsed)
+        registry.observe('swiftlogix_request_db_duration_seconds', (view,), timings.db_seconds)
+        registry.observe('swiftlogix_request_queries', (view,), timings.queries)
+        registry.observe('swiftlogix_request_template_duration_seconds', (view,), timings.template_seconds)
+        registry.observe('swiftlogix_response_size_bytes', (view,), size)
+        registry.maybe_publish()
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.queries} queries", '
+                f'tpl;dur={timings.template_seconds * 1000:.1f}'
+            )
+        return response
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template_seconds += time.perf_counter() - started
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """The stock Django template backend, with render time counted toward the current request"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0006_quoterequest_user_shipment_user_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='lane_recorded',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='LaneStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin_country', models.CharField(max_length=50)),
+                ('origin_city', models.CharField(blank=True, max_length=50)),
+                ('destination_country', models.CharField(max_length=50)),
+                ('destination_city', models.CharField(blank=True, max_length=50)),
+                ('shipment_type', models.CharField(choices=[('air', 'Air Freight'), ('sea', 'Sea Freight'), ('road', 'Road Transport'), ('rail', 'Rail Transport')], max_length=10)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list, help_text='Sample counts per transit-hours bucket')),
+                ('mean_hours', models.FloatField(default=0)),
+                ('max_hours', models.FloatField(default=0)),
+                ('p50_hours', models.FloatField(blank=True, null=True)),
+                ('p80_hours', models.FloatField(blank=True, null=True)),
+                ('p95_hours', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Lane Statistic',
+                'verbose_name_plural': 'Lane Statistics',
+                'ordering': ['origin_country', 'destination_country', 'shipment_type'],
+                'constraints': [models.UniqueConstraint(fields=('origin_country', 'origin_city', 'destination_country', 'destination_city', 'shipment_type'), name='unique_lane')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0007_lanestat_shipment_lane_recorded'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuoteDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('freight_type', models.CharField(choices=[('air', 'Air Freight'), ('sea', 'Sea Freight'), ('road', 'Road Transport'), ('rail', 'Rail Transport')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('quoted', 'Quoted'), ('accepted', 'Accepted'), ('declined', 'Declined')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Quote Daily Rollup',
+                'verbose_name_plural': 'Quote Daily Rollups',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'freight_type', 'status'), name='unique_quote_rollup_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('picked_up', 'Picked Up'), ('in_transit', 'In Transit'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('on_hold', 'On Hold')], max_length=20)),
+                ('shipment_type', models.CharField(choices=[('air', 'Air Freight'), ('sea', 'Sea Freight'), ('road', 'Road Transport'), ('rail', 'Rail Transport')], max_length=10)),
+                ('origin_country', models.CharField(max_length=50)),
+                ('destination_country', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Shipment Daily Rollup',
+                'verbose_name_plural': 'Shipment Daily Rollups',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'shipment_type', 'origin_country', 'destination_country'), name='unique_shipment_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0009_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('picked_up', 'Picked Up'), ('in_transit', 'In Transit'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled'), ('on_hold', 'On Hold')], max_length=20)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('event_time', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='SwiftLogix.shipment')),
+            ],
+            options={
+                'ordering': ['event_time'],
+                'indexes': [models.Index(fields=['sent_at', 'recipient', 'created_at'], name='notification_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0011_webhooks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='receiver_latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='receiver_longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='sender_latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='sender_longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0012_shipment_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='remaining_distance_km',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='route_progress',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
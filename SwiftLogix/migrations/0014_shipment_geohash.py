@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+# A frozen copy of SwiftLogix.geo.geohash, so this migration does not depend on the live module
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat, lng, precision=9):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        mid = (span[0] + span[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            span[0] = mid
+        else:
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def backfill_geohash(apps, schema_editor):
+    Shipment = apps.get_model('SwiftLogix', 'Shipment')
+    located = Shipment.objects.filter(current_latitude__isnull=False, current_longitude__isnull=False)
+    batch = []
+    for shipment in located.only('pk', 'current_latitude', 'current_longitude').iterator(chunk_size=2000):
+        shipment.geohash = geohash(shipment.current_latitude, shipment.current_longitude)
+        batch.append(shipment)
+        if len(batch) == 2000:
+            Shipment.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    Shipment.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0013_shipment_route_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['current_latitude', 'current_longitude'], name='shipment_position_idx'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0015_userprofile_related_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quoterequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='quote_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='shipment_history_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0018_quote_triage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trackingupdate',
+            index=models.Index(fields=['shipment', 'created_at', 'id'], name='tracking_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0019_tracking_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(models.Q(('status', 'delivered'), _negated=True), models.Q(('status', 'cancelled'), _negated=True), models.Q(('status', 'on_hold'), _negated=True)), fields=['expected_delivery_date', 'id'], name='shipment_sla_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('status', 'in_transit')), fields=['updated_at', 'id'], name='shipment_sla_silent_idx'),
+        ),
+    ]
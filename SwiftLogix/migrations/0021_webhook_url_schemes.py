@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SwiftLogix', '0020_sla_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookendpoint',
+            name='url',
+            field=models.URLField(max_length=500, validators=[django.core.validators.URLValidator(schemes=['http', 'https'])]),
+        ),
+    ]
@@ -1,12 +1,15 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import DatabaseError, models
 from django.utils import timezone
 from django.contrib.auth.models import User  # NEW: Import User model
 import random
+import secrets
 import string
 
 # NEW: UserProfile Model - Add this at the top
 class UserProfile(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=20, blank=True)
     company_name = models.CharField(max_length=200, blank=True)
     address = models.TextField(blank=True)
@@ -18,6 +21,44 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s Profile"
 
 
+def generate_webhook_secret():
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """A customer URL that receives signed, batched shipment events for the profile's shipments"""
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='webhooks')
+    # The delivery pool speaks HTTP(S) only
+    url = models.URLField(max_length=500, validators=[URLValidator(schemes=['http', 'https'])])
+    secret = models.CharField(max_length=64, default=generate_webhook_secret, help_text="HMAC-SHA256 signing key")
+    is_active = models.BooleanField(default=True)
+    max_concurrency = models.PositiveSmallIntegerField(default=2, help_text="Requests in flight at once")
+    batch_size = models.PositiveSmallIntegerField(default=50, help_text="Events per request")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.profile.user.username} -> {self.url}"
+
+
+class InvalidTransition(ValueError):
+    """A status change the shipment state machine does not allow"""
+
+    def __init__(self, current, requested):
+        self.current = current
+        self.requested = requested
+        super().__init__(f"Shipment cannot move from {current} to {requested}")
+
+
+class StaleShipment(DatabaseError):
+    """The shipment row changed (its version moved on) since this copy was loaded"""
+
+
+# Shipments that can still be put on hold. Spelled as separate inequalities rather than
+# status__in: SQLite only matches a partial index to a query whose terms it can compare,
+# and it cannot compare a bound IN list
+HOLDABLE_SHIPMENT = ~models.Q(status='delivered') & ~models.Q(status='cancelled') & ~models.Q(status='on_hold')
+
+
 class Shipment(models.Model):
     SHIPMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -77,36 +118,224 @@ class Shipment(models.Model):
     signature_required = models.BooleanField(default=False)
     current_latitude = models.FloatField(null=True, blank=True)
     current_longitude = models.FloatField(null=True, blank=True)
+    # Geohash of the current position, kept in step on save; its prefixes are the fleet map's clusters
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    # Resolved from the city/country fields by the offline gazetteer on save
+    sender_latitude = models.FloatField(null=True, blank=True, editable=False)
+    sender_longitude = models.FloatField(null=True, blank=True, editable=False)
+    receiver_latitude = models.FloatField(null=True, blank=True, editable=False)
+    receiver_longitude = models.FloatField(null=True, blank=True, editable=False)
+
+    # Distance travelled along the great circle from the current position, refreshed in bulk by geo.refresh_progress
+    route_progress = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    remaining_distance_km = models.FloatField(null=True, blank=True, editable=False)
+
+    # Set once the delivered transit time has been folded into LaneStat
+    lane_recorded = models.BooleanField(default=False, editable=False)
+
+    # Bumped by every status write; saves and transitions only apply to the version they loaded
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Bounding-box scans for the fleet map
+            models.Index(fields=['current_latitude', 'current_longitude'], name='shipment_position_idx'),
+            # Keyset pages of a customer's history (see history.py)
+            models.Index(fields=['user', '-created_at', '-id'], name='shipment_history_idx'),
+            # SLA scans (see sla.py) over shipments that can still be put on hold, never the delivered history
+            models.Index(
+                fields=['expected_delivery_date', 'id'], name='shipment_sla_overdue_idx',
+                condition=HOLDABLE_SHIPMENT,
+            ),
+            models.Index(
+                fields=['updated_at', 'id'], name='shipment_sla_silent_idx',
+                condition=models.Q(status='in_transit'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.tracking_number} - {self.sender_name} to {self.receiver_name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so post_save receivers can see what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     def save(self, *args, **kwargs):
         if not self.tracking_number:
             self.tracking_number = self.generate_tracking_number()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.geocode()
+            self.update_geohash()
+        else:
+            extra = set()
+            if set(update_fields) & self.GEOCODED_FIELDS:
+                extra.update(self.geocode())
+            if {'current_latitude', 'current_longitude'} & set(update_fields):
+                self.update_geohash()
+                extra.add('geohash')
+            if extra:
+                kwargs['update_fields'] = set(update_fields) | extra
+
+        # Writes that can carry the status are checked against the state machine and the loaded version
+        loaded = getattr(self, '_loaded_values', None) or {}
+        self._expected_version = None
+        if not self._state.adding and 'version' in loaded and (update_fields is None or 'status' in update_fields):
+            previous = loaded.get('status')
+            if previous is not None and not self.can_transition(previous, self.status):
+                raise InvalidTransition(previous, self.status)
+            self._expected_version = loaded['version']
+            self.version = loaded['version'] + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        try:
+            super().save(*args, **kwargs)
+        except StaleShipment:
+            self.version = self._expected_version
+            raise
+        finally:
+            self._expected_version = None
+        # post_save receivers have compared against the loaded values; later saves compare against this one
+        self._loaded_values = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
     
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        # UPDATE ... WHERE id = %s AND version = %s: a concurrent writer got there first if nothing matched
+        if super()._do_update(base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update):
+            return True
+        if base_qs.filter(pk=pk_val).exists():
+            raise StaleShipment(f"Shipment {pk_val} was changed by someone else (expected version {expected})")
+        return False
+
+    def clean(self):
+        previous = (getattr(self, '_loaded_values', None) or {}).get('status')
+        if previous is not None and not self.can_transition(previous, self.status):
+            labels = dict(self.SHIPMENT_STATUS_CHOICES)
+            raise ValidationError({
+                'status': f"A {labels[previous].lower()} shipment cannot be set to {labels[self.status].lower()}.",
+            })
+
+    GEOCODED_FIELDS = {'sender_city', 'sender_country', 'receiver_city', 'receiver_country'}
+
+    def geocode(self):
+        """Fill sender/receiver coordinates when missing or the place changed; returns the fields set"""
+        from .gazetteer import resolve
+
+        loaded = getattr(self, '_loaded_values', None) or {}
+        updated = []
+        for side in ('sender', 'receiver'):
+            city, country = getattr(self, f'{side}_city'), getattr(self, f'{side}_country')
+            moved = (loaded.get(f'{side}_city'), loaded.get(f'{side}_country')) != (city, country)
+            if not moved and getattr(self, f'{side}_latitude') is not None:
+                continue
+            lat, lng = resolve(city, country) or (None, None)
+            setattr(self, f'{side}_latitude', lat)
+            setattr(self, f'{side}_longitude', lng)
+            updated += [f'{side}_latitude', f'{side}_longitude']
+        return updated
+
+    def update_geohash(self):
+        from .geo import geohash
+
+        if self.current_latitude is None or self.current_longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = geohash(self.current_latitude, self.current_longitude)
+
     def generate_tracking_number(self):
         """Generate a unique tracking number"""
         prefix = "SWL"
         random_part = ''.join(random.choices(string.digits, k=10))
         return f"{prefix}{random_part}"
     
-    def get_progress_percentage(self):
-        """Calculate progress percentage based on status"""
-        status_progress = {
-            'pending': 10,
-            'picked_up': 25,
-            'in_transit': 50,
-            'out_for_delivery': 75,
-            'delivered': 100,
-            'cancelled': 0,
-            'on_hold': 30,
-        }
-        return status_progress.get(self.status, 0)
+    STATUS_PROGRESS = {
+        'pending': 10,
+        'picked_up': 25,
+        'in_transit': 50,
+        'out_for_delivery': 75,
+        'delivered': 100,
+        'cancelled': 0,
+        'on_hold': 30,
+    }
+
+    # Status -> statuses it may move to; delivered and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': {'picked_up', 'in_transit', 'on_hold', 'cancelled'},
+        'picked_up': {'in_transit', 'out_for_delivery', 'delivered', 'on_hold', 'cancelled'},
+        'in_transit': {'out_for_delivery', 'delivered', 'on_hold', 'cancelled'},
+        'out_for_delivery': {'delivered', 'on_hold', 'cancelled'},
+        'on_hold': {'picked_up', 'in_transit', 'out_for_delivery', 'delivered', 'cancelled'},
+        'delivered': set(),
+        'cancelled': set(),
+    }
+
+    @classmethod
+    def can_transition(cls, current, requested):
+        return current == requested or requested in cls.STATUS_TRANSITIONS.get(current, ())
+
+    @classmethod
+    def statuses_leading_to(cls, requested):
+        """Statuses a shipment may be in to be moved to requested"""
+        return [status for status, targets in cls.STATUS_TRANSITIONS.items() if requested in targets]
+
+    def get_progress_percentage(self, lane=None):
+        """Calculate progress from distance travelled, elapsed time on a known lane, or status"""
+        floor = self.STATUS_PROGRESS.get(self.status, 0)
+        if self.status not in ('picked_up', 'in_transit', 'out_for_delivery'):
+            return floor
+        if self.route_progress is not None:
+            return max(floor, min(self.route_progress, 95))
+        if lane is None:
+            return floor
+        started = self.pickup_date or self.created_at
+        elapsed_hours = (timezone.now() - started).total_seconds() / 3600
+        timed = int(100 * elapsed_hours / lane.p50_hours) if lane.p50_hours else 0
+        return max(floor, min(timed, 95))
+
+
+class LaneStat(models.Model):
+    """Transit-time distribution for one origin/destination/type lane.
+
+    Rows with blank cities aggregate the whole country pair and are used
+    as a fallback when a city lane has too few samples.
+    """
+    origin_country = models.CharField(max_length=50)
+    origin_city = models.CharField(max_length=50, blank=True)
+    destination_country = models.CharField(max_length=50)
+    destination_city = models.CharField(max_length=50, blank=True)
+    shipment_type = models.CharField(max_length=10, choices=Shipment.SHIPMENT_TYPE_CHOICES)
+
+    sample_count = models.PositiveIntegerField(default=0)
+    histogram = models.JSONField(default=list, help_text="Sample counts per transit-hours bucket")
+    mean_hours = models.FloatField(default=0)
+    max_hours = models.FloatField(default=0)
+    p50_hours = models.FloatField(null=True, blank=True)
+    p80_hours = models.FloatField(null=True, blank=True)
+    p95_hours = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['origin_country', 'destination_country', 'shipment_type']
+        verbose_name = "Lane Statistic"
+        verbose_name_plural = "Lane Statistics"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origin_country', 'origin_city', 'destination_country', 'destination_city', 'shipment_type'],
+                name='unique_lane',
+            ),
+        ]
+
+    def __str__(self):
+        origin = f"{self.origin_city}, {self.origin_country}" if self.origin_city else self.origin_country
+        destination = f"{self.destination_city}, {self.destination_country}" if self.destination_city else self.destination_country
+        return f"{origin} -> {destination} ({self.shipment_type})"
 
 
 class TrackingUpdate(models.Model):
@@ -119,11 +348,36 @@ class TrackingUpdate(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Delta sync of a shipment's timeline in arrival order (see serializers.py)
+            models.Index(fields=['shipment', 'created_at', 'id'], name='tracking_sync_idx'),
+        ]
     
     def __str__(self):
         return f"{self.shipment.tracking_number} - {self.status} at {self.location}"
 
 
+class Notification(models.Model):
+    """A shipment status event waiting to be mailed to one recipient in their next digest"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='notifications')
+    recipient = models.EmailField()
+    status = models.CharField(max_length=20, choices=Shipment.SHIPMENT_STATUS_CHOICES)
+    location = models.CharField(max_length=100, blank=True)
+    description = models.TextField(blank=True)
+    event_time = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['event_time']
+        indexes = [
+            models.Index(fields=['sent_at', 'recipient', 'created_at'], name='notification_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.shipment_id} {self.status}"
+
+
 class QuoteRequest(models.Model):
     FREIGHT_CHOICES = [
         ('air', 'Air Freight'),
@@ -175,6 +429,13 @@ class QuoteRequest(models.Model):
     )
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='quote_requests')  # NEW: Link to user
 
+    # Triage queue (see triage.py): who is pricing this request and until when their claim holds
+    claimed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_quotes', editable=False
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    lease_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
@@ -183,11 +444,73 @@ class QuoteRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = "Quote Request"
         verbose_name_plural = "Quote Requests"
+        indexes = [
+            # Keyset pages of a customer's history (see history.py)
+            models.Index(fields=['user', '-created_at', '-id'], name='quote_history_idx'),
+            # Oldest-first scans for claimable requests in the triage queue
+            models.Index(fields=['status', 'lease_expires_at', 'created_at'], name='quote_triage_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.get_freight_type_display()} ({self.status.capitalize()})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
     
 
+class ShipmentDailyRollup(models.Model):
+    """Shipments created per day, bucketed by their current status, type and countries"""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Shipment.SHIPMENT_STATUS_CHOICES)
+    shipment_type = models.CharField(max_length=10, choices=Shipment.SHIPMENT_TYPE_CHOICES)
+    origin_country = models.CharField(max_length=50)
+    destination_country = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name = "Shipment Daily Rollup"
+        verbose_name_plural = "Shipment Daily Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'shipment_type', 'origin_country', 'destination_country'],
+                name='unique_shipment_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}/{self.shipment_type} {self.origin_country}->{self.destination_country}: {self.count}"
+
+
+class QuoteDailyRollup(models.Model):
+    """Quote requests created per day, bucketed by freight type and current status"""
+    day = models.DateField()
+    freight_type = models.CharField(max_length=10, choices=QuoteRequest.FREIGHT_CHOICES)
+    status = models.CharField(max_length=20, choices=QuoteRequest.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name = "Quote Daily Rollup"
+        verbose_name_plural = "Quote Daily Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'freight_type', 'status'],
+                name='unique_quote_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.freight_type}/{self.status}: {self.count}"
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -201,4 +524,78 @@ class ContactMessage(models.Model):
         verbose_name_plural = "Contact Messages"
 
     def __str__(self):
-        return f"{self.name} - {self.subject}"
\ No newline at end of file
+        return f"{self.name} - {self.subject}"
+
+
+class Job(models.Model):
+    """A unit of background work claimed and run by 'manage.py run_worker'"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class DeadJob(Job):
+    """Jobs that exhausted their retries; a separate admin page acts as the dead-letter queue"""
+
+    class Meta:
+        proxy = True
+        verbose_name = "Dead Job"
+        verbose_name_plural = "Dead Jobs (dead letter)"
+
+
+
+class WebhookDelivery(models.Model):
+    """One shipment event owed to a webhook endpoint"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('in_flight', 'In Flight'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    ]
+
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='deliveries')
+    event = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = "Webhook deliveries"
+        indexes = [
+            models.Index(fields=['status', 'endpoint', 'next_attempt_at'], name='webhook_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} #{self.pk} -> endpoint {self.endpoint_id} ({self.status})"
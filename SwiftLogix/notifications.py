@@ -0,0 +1,177 @@
+# SwiftLogix/notifications.py
+"""
+Batched customer notifications.
+
+Status changes are recorded as pending ``Notification`` rows for the sender
+and receiver instead of being mailed inline. A flush job waits until a
+recipient's oldest pending event is ``NOTIFICATION_WINDOW_SECONDS`` old,
+coalesces everything pending for that recipient into one digest, and sends
+all digests of a batch over a single backend connection. Events are marked
+sent per digest, only once the backend has accepted it.
+"""
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Job, Notification
+
+logger = logging.getLogger(__name__)
+
+LAST_FLUSH_CACHE_KEY = 'swiftlogix.notifications.last_flush'
+
+
+def coalescing_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_WINDOW_SECONDS', 300))
+
+
+def _recipients(shipment):
+    return {email for email in (shipment.sender_email, shipment.receiver_email) if email}
+
+
+def record(shipment, status, location='', description='', when=None):
+    """Queue a status event for everyone following the shipment"""
+    when = when or timezone.now()
+    Notification.objects.bulk_create([
+        Notification(
+            shipment=shipment, recipient=recipient, status=status,
+            location=location, description=description, event_time=when,
+        )
+        for recipient in _recipients(shipment)
+    ])
+    schedule_flush()
+
+
+def record_bulk(queryset, status):
+    """Queue one event per recipient for every shipment in queryset, which has just moved to status"""
+    now = timezone.now()
+    events = []
+    rows = queryset.values_list('pk', 'sender_email', 'receiver_email')
+    for pk, sender_email, receiver_email in rows.iterator():
+        for recipient in {sender_email, receiver_email} - {''}:
+            events.append(Notification(shipment_id=pk, recipient=recipient, status=status, event_time=now))
+    Notification.objects.bulk_create(events, batch_size=1000)
+    if events:
+        schedule_flush()
+    return len(events)
+
+
+def schedule_flush():
+    """Make sure one flush job is queued for when the oldest pending event's window closes"""
+    from .tasks import flush_notifications
+
+    if Job.objects.filter(task=flush_notifications.task_name, status='queued').exists():
+        return
+    oldest = Notification.objects.filter(sent_at__isnull=True).aggregate(oldest=Min('created_at'))['oldest']
+    if oldest is not None:
+        flush_notifications.delay(run_at=max(oldest + coalescing_window(), timezone.now()))
+
+
+def ready_recipients(limit, window=None):
+    """Recipients whose oldest pending event has waited out the coalescing window (or window, a timedelta)"""
+    cutoff = timezone.now() - (coalescing_window() if window is None else window)
+    return list(
+        Notification.objects.filter(sent_at__isnull=True)
+        .values('recipient')
+        .annotate(first=Min('created_at'))
+        .filter(first__lte=cutoff)
+        .order_by('first')
+        .values_list('recipient', flat=True)[:limit]
+    )
+
+
+def build_digest(recipient, events):
+    """One email summarising every pending event for a recipient, latest first per shipment"""
+    by_shipment = OrderedDict()
+    for event in events:
+        by_shipment.setdefault(event.shipment, []).append(event)
+
+    lines = []
+    for shipment, shipment_events in by_shipment.items():
+        lines.append(f"Shipment {shipment.tracking_number} "
+                     f"({shipment.sender_city} -> {shipment.receiver_city})")
+        seen = set()
+        for event in reversed(shipment_events):
+            # Coalesce repeats of a status inside the window to the latest one
+            if event.status in seen:
+                continue
+            seen.add(event.status)
+            line = f"  {event.event_time:%b %d, %Y %H:%M} - {event.get_status_display()}"
+            if event.location:
+                line += f" at {event.location}"
+            if event.description:
+                line += f": {event.description}"
+            lines.append(line)
+        lines.append("")
+
+    if len(by_shipment) == 1:
+        subject = f"Update on shipment {next(iter(by_shipment)).tracking_number}"
+    else:
+        subject = f"Updates on {len(by_shipment)} of your shipments"
+    body = "Hello,\n\nHere is the latest on your SwiftLogix shipments:\n\n" + "\n".join(lines)
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+
+
+def flush(batch_size=None, window=None):
+    """Send one batch of digests over a single connection; returns (emails sent, events covered)
+
+    A digest the backend fails to send (or drops under ``fail_silently``)
+    leaves its events pending for the next flush.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500)
+    recipients = ready_recipients(batch_size, window)
+    if not recipients:
+        return 0, 0
+
+    started = time.monotonic()
+    pending = (
+        Notification.objects.filter(sent_at__isnull=True, recipient__in=recipients)
+        .select_related('shipment')
+        .order_by('recipient', 'event_time')
+    )
+    grouped = OrderedDict()
+    for event in pending:
+        grouped.setdefault(event.recipient, []).append(event)
+
+    sent, event_ids = 0, []
+    with get_connection() as connection:
+        for recipient, events in grouped.items():
+            if not connection.send_messages([build_digest(recipient, events)]):
+                continue
+            ids = [event.pk for event in events]
+            Notification.objects.filter(pk__in=ids).update(sent_at=timezone.now())
+            sent += 1
+            event_ids.extend(ids)
+
+    elapsed = time.monotonic() - started
+    cache.set(LAST_FLUSH_CACHE_KEY, {
+        'at': timezone.now().isoformat(),
+        'emails': sent,
+        'events': len(event_ids),
+        'seconds': round(elapsed, 3),
+        'emails_per_second': round(sent / elapsed, 1) if elapsed else None,
+    }, timeout=None)
+    logger.info("Sent %s digests covering %s events in %.2fs", sent, len(event_ids), elapsed)
+    return sent, len(event_ids)
+
+
+def stats():
+    """Backlog and throughput figures for the notification pipeline"""
+    backlog = Notification.objects.filter(sent_at__isnull=True).aggregate(
+        events=Count('id'), oldest=Min('created_at'),
+    )
+    since = timezone.now() - timedelta(hours=1)
+    return {
+        'pending_events': backlog['events'],
+        'oldest_pending_seconds': (
+            round((timezone.now() - backlog['oldest']).total_seconds()) if backlog['oldest'] else 0
+        ),
+        'events_sent_last_hour': Notification.objects.filter(sent_at__gte=since).count(),
+        'last_flush': cache.get(LAST_FLUSH_CACHE_KEY),
+    }
@@ -0,0 +1,94 @@
+# SwiftLogix/offline.py
+"""
+Service worker and web app manifest for the tracking page.
+
+The worker (``templates/sw.js``, served from the site root so its scope
+covers ``/track/``) keeps four caches:
+
+* the app shell: the tracking page and the static files it draws with,
+  pre-cached on install. Static URLs come from ``{% static %}``, so under a
+  hashing storage they are content-addressed and served cache-first forever;
+  other same-origin static files are stale-while-revalidate.
+* CDN assets (Leaflet, fonts, icons), stale-while-revalidate.
+* tracking results: full ``track/api/`` responses, stale-while-revalidate,
+  capped at ``OFFLINE_TRACKING_ENTRIES``. The page renders the saved copy at
+  once, then asks for a delta with its cursor; offline, the saved copy stays
+  on screen as the last known status.
+* map tiles, cache-first under an LRU quota of ``OFFLINE_TILE_ENTRIES``.
+
+The cache names carry a version derived from the shell URLs and
+``OFFLINE_CACHE_VERSION``, so a deploy that changes a static file (or a bump
+of the setting) installs a new worker that drops the old caches.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+
+# Same-origin static files the tracking page needs before it can draw anything
+SHELL_STATIC = (
+    'logistica-1.0.0/css/bootstrap.min.css',
+    'logistica-1.0.0/css/style.css',
+    'logistica-1.0.0/lib/animate/animate.min.css',
+    'logistica-1.0.0/lib/owlcarousel/assets/owl.carousel.min.css',
+)
+
+# Third-party files the tracking page loads; fetched no-cors, so a failure here never blocks install
+SHELL_EXTERNAL = (
+    'https://unpkg.com/leaflet/dist/leaflet.css',
+    'https://unpkg.com/leaflet/dist/leaflet.js',
+    'https://fonts.googleapis.com/css2?family=Inter:wght@400;600&family=Roboto:wght@500;700&display=swap',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.10.0/css/all.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.4.1/font/bootstrap-icons.css',
+)
+
+TILE_HOST_SUFFIX = '.tile.openstreetmap.org'
+
+# Names like style.3f2a9c1b7e4d.css, as written by ManifestStaticFilesStorage
+HASHED_NAME_PATTERN = r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$'
+
+
+def shell_urls():
+    return [reverse('track')] + [static(path) for path in SHELL_STATIC]
+
+
+def cache_version(urls):
+    seed = json.dumps([getattr(settings, 'OFFLINE_CACHE_VERSION', '1'), urls, SHELL_EXTERNAL])
+    return hashlib.sha256(seed.encode()).hexdigest()[:12]
+
+
+def worker_context():
+    """Everything ``sw.js`` is rendered with"""
+    urls = shell_urls()
+    return {
+        'config': json.dumps({
+            'version': cache_version(urls),
+            'shell': urls,
+            'external': SHELL_EXTERNAL,
+            'trackPage': reverse('track'),
+            'trackApi': reverse('track_api'),
+            'staticUrl': settings.STATIC_URL,
+            'hashedName': HASHED_NAME_PATTERN,
+            'tileHostSuffix': TILE_HOST_SUFFIX,
+            'trackingEntries': getattr(settings, 'OFFLINE_TRACKING_ENTRIES', 20),
+            'tileEntries': getattr(settings, 'OFFLINE_TILE_ENTRIES', 200),
+        }),
+    }
+
+
+def manifest():
+    return {
+        'name': 'SwiftLogix Tracking',
+        'short_name': 'SwiftLogix',
+        'description': 'Track your SwiftLogix shipments, even on a patchy connection.',
+        'start_url': reverse('track'),
+        'scope': '/',
+        'display': 'standalone',
+        'background_color': '#FFFFFF',
+        'theme_color': '#FF3E41',
+        'icons': [
+            {'src': static('logistica-1.0.0/img/favicon.jpg'), 'sizes': '999x1016', 'type': 'image/jpeg'},
+        ],
+    }
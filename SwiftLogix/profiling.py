@@ -0,0 +1,191 @@
+# SwiftLogix/profiling.py
+"""
+Opt-in request profiling.
+
+``SamplingProfilerMiddleware`` runs ``cProfile`` on a random
+``PROFILER_SAMPLE_RATE`` fraction of requests (at most one at a time per
+worker) and records the SQL of any request slower than ``PROFILER_SLOW_MS``.
+Captures are written to ``PROFILER_DIR`` as a JSON summary plus, for
+profiled requests, a pstats dump; the oldest files are deleted beyond
+``PROFILER_MAX_CAPTURES``. SQL is stored without parameter values so
+captures never hold customer data. Both switches default to off.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERIES_PER_CAPTURE = 500
+CAPTURE_NAME = re.compile(r'^[\w.-]+$')
+UNSAFE_CHARS = re.compile(r'[^\w-]')
+
+_profiling = threading.BoundedSemaphore(1)
+
+
+def capture_dir():
+    return Path(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / '.cache' / 'profiles'))
+
+
+class QueryLog:
+    """Execute wrapper keeping each statement's SQL (no parameters) and duration"""
+
+    def __init__(self):
+        self.queries = []
+        self.dropped = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < MAX_QUERIES_PER_CAPTURE:
+                self.queries.append({
+                    'sql': sql,
+                    'ms': round((time.perf_counter() - started) * 1000, 3),
+                    'alias': context['connection'].alias,
+                })
+            else:
+                self.dropped += 1
+
+
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0)
+        self.slow_ms = getattr(settings, 'PROFILER_SLOW_MS', 0)
+
+    def __call__(self, request):
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate and _profiling.acquire(blocking=False)
+        if not sampled and not self.slow_ms:
+            return self.get_response(request)
+
+        query_log = QueryLog()
+        profiler = cProfile.Profile() if sampled else None
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_log))
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:
+                        # Another profiler (a debugger, or one on another thread on 3.12+) is active
+                        profiler = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            if sampled:
+                _profiling.release()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        slow = self.slow_ms and elapsed_ms >= self.slow_ms
+        if sampled or slow:
+            try:
+                save_capture(request, response, elapsed_ms, query_log, profiler, 'slow' if slow else 'sampled')
+            except OSError:
+                logger.exception("Could not write request profile")
+        return response
+
+
+def save_capture(request, response, elapsed_ms, query_log, profiler, reason):
+    directory = capture_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    name = f"{timezone.now():%Y%m%dT%H%M%S}-{UNSAFE_CHARS.sub('_', view)}-{uuid.uuid4().hex[:8]}"
+
+    if profiler is not None:
+        profiler.dump_stats(directory / f'{name}.prof')
+    summary = {
+        'name': name,
+        'reason': reason,
+        'at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'view': view,
+        'status': response.status_code,
+        'duration_ms': round(elapsed_ms, 2),
+        'db_ms': round(sum(q['ms'] for q in query_log.queries), 2),
+        'query_count': len(query_log.queries) + query_log.dropped,
+        'queries': query_log.queries,
+        'profiled': profiler is not None,
+    }
+    with open(directory / f'{name}.json', 'w') as handle:
+        json.dump(summary, handle)
+    rotate(directory)
+
+
+def rotate(directory):
+    keep = getattr(settings, 'PROFILER_MAX_CAPTURES', 200)
+    summaries = sorted(directory.glob('*.json'))
+    for stale in summaries[:max(0, len(summaries) - keep)]:
+        for path in (stale, stale.with_suffix('.prof')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_captures(limit=200):
+    """Capture summaries, newest first, without their query lists"""
+    captures = []
+    for path in sorted(capture_dir().glob('*.json'), reverse=True)[:limit]:
+        try:
+            with open(path) as handle:
+                summary = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        summary.pop('queries', None)
+        captures.append(summary)
+    return captures
+
+
+def load_capture(name):
+    if not CAPTURE_NAME.match(name):
+        return None
+    path = capture_dir() / f'{name}.json'
+    if not path.exists():
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def hot_functions(names=None, sort='tottime', limit=25):
+    """pstats report over the given captures (default: every profiled capture on disk)"""
+    directory = capture_dir()
+    paths = [directory / f'{name}.prof' for name in names] if names else sorted(directory.glob('*.prof'))
+    paths = [str(path) for path in paths if path.exists()]
+    if not paths:
+        return ''
+    out = io.StringIO()
+    stats = pstats.Stats(*paths, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def clear_captures():
+    removed = 0
+    for path in capture_dir().glob('*'):
+        if path.suffix in ('.json', '.prof'):
+            os.remove(path)
+            removed += 1
+    return removed
@@ -0,0 +1,130 @@
+# SwiftLogix/replicas.py
+"""
+Read-replica routing.
+
+``ReplicaMiddleware`` points the ORM's reads at a replica for GET/HEAD
+requests to the URL names in ``REPLICA_READ_VIEWS``; everything else, and
+every write, stays on ``default``. A request that writes pins its session to
+the primary for ``REPLICA_PIN_SECONDS`` so the user reads their own change
+back; writes to sessions and the job queue, which are never read from a
+replica, do not pin. A replica that fails to connect, or raises a connection error
+mid-request, is skipped for ``REPLICA_RETRY_SECONDS``; with none left, reads
+fall back to the primary.
+
+Replicas are the ``DATABASE_REPLICA_URLS`` entries in settings. To try it
+locally with SQLite, copy ``db.sqlite3`` to ``db-replica.sqlite3`` and set
+``DATABASE_REPLICA_URLS=sqlite:///db-replica.sqlite3``: the copy plays a
+replica that has stopped replicating, which makes the pinning visible.
+Without replica URLs, routing and sessions are left as they were.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PIN_SESSION_KEY = '_replica_pin_until'
+
+# Written on most requests and never read from a replica, so writing them does not pin
+UNPINNED_MODELS = frozenset({'sessions.Session', 'SwiftLogix.Job', 'SwiftLogix.DeadJob'})
+
+
+class RequestRouting:
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+_routing = ContextVar('swiftlogix_replica_routing', default=None)
+
+# alias -> monotonic time before which the replica is not tried again
+_down_until = {}
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def mark_down(alias):
+    _down_until[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+    logger.warning("Read replica %s is unavailable; using the primary", alias)
+
+
+def healthy_replica():
+    """A random replica that accepts connections, or None"""
+    now = time.monotonic()
+    candidates = [alias for alias in replicas() if _down_until.get(alias, 0) <= now]
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_down(alias)
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        return routing.alias if routing is not None else None
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and model._meta.label not in UNPINNED_MODELS:
+            routing.wrote = True
+            routing.alias = None
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    """Must come after the session middleware, which saves the pin this sets"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing = RequestRouting()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        # Only touch the session when there is a replica to be pinned away from
+        if routing.wrote and replicas() and hasattr(request, 'session'):
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+            request.session[PIN_SESSION_KEY] = timezone.now().timestamp() + pin_seconds
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD') or not replicas():
+            return None
+        if request.resolver_match.url_name not in getattr(settings, 'REPLICA_READ_VIEWS', ()):
+            return None
+        pinned_until = request.session.get(PIN_SESSION_KEY) if hasattr(request, 'session') else None
+        if pinned_until and pinned_until > timezone.now().timestamp():
+            return None
+        routing = _routing.get()
+        if routing is not None:
+            routing.alias = healthy_replica()
+        return None
+
+    def process_exception(self, request, exception):
+        routing = _routing.get()
+        if routing is not None and routing.alias and isinstance(exception, OperationalError):
+            mark_down(routing.alias)
+        return None
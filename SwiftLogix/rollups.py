@@ -0,0 +1,269 @@
+# SwiftLogix/rollups.py
+"""
+Daily reporting rollups.
+
+Shipments and quote requests are counted per creation day and bucketed by
+their current status (plus type/country or freight type). Model writes move
+one unit between buckets, so reports never aggregate the raw tables. The
+``rebuild_rollups`` command recomputes a date range from the raw tables to
+catch up after raw SQL or bulk imports.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import DEFERRED, Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import QuoteDailyRollup, QuoteRequest, Shipment, ShipmentDailyRollup
+
+SHIPMENT_DIMENSIONS = ('status', 'shipment_type', 'sender_country', 'receiver_country')
+QUOTE_DIMENSIONS = ('freight_type', 'status')
+
+
+def _shipment_key(created_at, status, shipment_type, sender_country, receiver_country):
+    return (
+        ('day', timezone.localdate(created_at)),
+        ('status', status),
+        ('shipment_type', shipment_type),
+        ('origin_country', sender_country),
+        ('destination_country', receiver_country),
+    )
+
+
+def _quote_key(created_at, freight_type, status):
+    return (
+        ('day', timezone.localdate(created_at)),
+        ('freight_type', freight_type),
+        ('status', status),
+    )
+
+
+def _bump(model, key, delta):
+    """Atomically add delta to one rollup bucket, creating it if needed"""
+    if not delta:
+        return
+    lookup = dict(key)
+    if model.objects.filter(**lookup).update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Another writer created the bucket between our UPDATE and INSERT
+        model.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def _loaded_key(instance, fields, key_func, model):
+    """The bucket an instance was counted in when it was loaded, or None if it is new"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return None
+    names = ('created_at',) + fields
+    if any(loaded.get(name, DEFERRED) is DEFERRED for name in names):
+        loaded = model.objects.filter(pk=instance.pk).values(*names).first()
+        if loaded is None:
+            return None
+    return key_func(*(loaded[name] for name in names))
+
+
+def _sync(instance, created, fields, key_func, model, rollup_model):
+    new_key = key_func(*(getattr(instance, name) for name in ('created_at',) + fields))
+    old_key = None if created else _loaded_key(instance, fields, key_func, model)
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        _bump(rollup_model, old_key, -1)
+    _bump(rollup_model, new_key, 1)
+
+
+def shipment_saved(instance, created):
+    _sync(instance, created, SHIPMENT_DIMENSIONS, _shipment_key, Shipment, ShipmentDailyRollup)
+
+
+def shipment_deleted(instance):
+    key = _shipment_key(*(getattr(instance, name) for name in ('created_at',) + SHIPMENT_DIMENSIONS))
+    _bump(ShipmentDailyRollup, key, -1)
+
+
+def quote_saved(instance, created):
+    _sync(instance, created, QUOTE_DIMENSIONS, _quote_key, QuoteRequest, QuoteDailyRollup)
+
+
+def quote_deleted(instance):
+    key = _quote_key(*(getattr(instance, name) for name in ('created_at',) + QUOTE_DIMENSIONS))
+    _bump(QuoteDailyRollup, key, -1)
+
+
+def _deltas(rows, fields, key_func, changes):
+    """Bucket deltas for rows (created_at followed by fields) moving to changes"""
+    names = ('created_at',) + fields
+    deltas = Counter()
+    for row in rows:
+        values = dict(zip(names, row))
+        deltas[key_func(*row)] -= 1
+        values.update(changes)
+        deltas[key_func(*(values[name] for name in names))] += 1
+    return deltas
+
+
+def _bump_on_commit(rollup_model, deltas):
+    """Apply deltas once the surrounding transaction commits (at once outside one)
+
+    The daily buckets are shared by every writer of the day, so they are
+    bumped in their own short statements rather than held locked for the
+    rest of the caller's transaction. A crash in between leaves them for
+    ``rebuild_rollups`` to correct.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: [_bump(rollup_model, key, delta) for key, delta in deltas.items()])
+
+
+def shipments_moved(rows, changes):
+    """Roll up shipments already written with changes; rows are (created_at, *SHIPMENT_DIMENSIONS) as they were"""
+    _bump_on_commit(ShipmentDailyRollup, _deltas(rows, SHIPMENT_DIMENSIONS, _shipment_key, changes))
+
+
+def quotes_moved(rows, changes):
+    """Roll up quote requests already written with changes; rows are (created_at, *QUOTE_DIMENSIONS) as they were"""
+    _bump_on_commit(QuoteDailyRollup, _deltas(rows, QUOTE_DIMENSIONS, _quote_key, changes))
+
+
+class _Contended(Exception):
+    pass
+
+
+def _tracked_update(queryset, fields, key_func, rollup_model, changes):
+    """queryset.update(**changes) without row locks; returns the pks it changed and rolls them up
+
+    Rows are read, grouped by their current bucket values and updated one
+    group at a time with those values (and the pks read) pinned in the WHERE
+    clause, so every row the UPDATE changes is in the bucket it was read in.
+    When a concurrent writer took some rows of a group, the group is undone
+    and retried row by row to learn which ones are still ours.
+    """
+    groups = defaultdict(list)
+    for pk, created_at, *values in queryset.values_list('pk', 'created_at', *fields):
+        groups[tuple(values)].append((pk, created_at))
+
+    moved, rows = [], []
+    for values, members in groups.items():
+        pinned = queryset.filter(**dict(zip(fields, values)))
+        pks = [pk for pk, _ in members]
+        try:
+            with transaction.atomic():
+                if pinned.filter(pk__in=pks).update(**changes) != len(pks):
+                    raise _Contended
+            won = set(pks)
+        except _Contended:
+            won = {pk for pk in pks if pinned.filter(pk=pk).update(**changes)}
+        moved.extend(pk for pk, _ in members if pk in won)
+        rows.extend((created_at,) + values for pk, created_at in members if pk in won)
+    _bump_on_commit(rollup_model, _deltas(rows, fields, key_func, changes))
+    return moved
+
+
+def shipments_bulk_move(queryset, **changes):
+    """queryset.update() that keeps the shipment rollups in step; returns the pks it changed"""
+    return _tracked_update(queryset, SHIPMENT_DIMENSIONS, _shipment_key, ShipmentDailyRollup, changes)
+
+
+def shipments_bulk_update(queryset, **changes):
+    """queryset.update() that keeps the shipment rollups in step"""
+    return len(shipments_bulk_move(queryset, **changes))
+
+
+def quotes_bulk_update(queryset, **changes):
+    """queryset.update() that keeps the quote rollups in step"""
+    return len(_tracked_update(queryset, QUOTE_DIMENSIONS, _quote_key, QuoteDailyRollup, changes))
+
+
+def _rebuild(model, rollup_model, fields, key_map, start, end):
+    source = model.objects.annotate(day=TruncDate('created_at'))
+    rollups = rollup_model.objects.all()
+    if start:
+        source = source.filter(day__gte=start)
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        source = source.filter(day__lte=end)
+        rollups = rollups.filter(day__lte=end)
+
+    rows = (
+        source.order_by()
+        .values('day', *fields)
+        .annotate(total=Count('id'))
+    )
+    buckets = [
+        rollup_model(
+            day=row['day'],
+            count=row['total'],
+            **{key_map.get(field, field): row[field] for field in fields},
+        )
+        for row in rows.iterator()
+    ]
+    with transaction.atomic():
+        rollups.delete()
+        rollup_model.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def rebuild(start=None, end=None):
+    """Recompute rollups for [start, end] (inclusive dates, open-ended if None) from the raw tables"""
+    shipments = _rebuild(
+        Shipment, ShipmentDailyRollup, SHIPMENT_DIMENSIONS,
+        {'sender_country': 'origin_country', 'receiver_country': 'destination_country'},
+        start, end,
+    )
+    quotes = _rebuild(QuoteRequest, QuoteDailyRollup, QUOTE_DIMENSIONS, {}, start, end)
+    return shipments, quotes
+
+
+# ============================================
+# REPORT QUERIES (rollup tables only)
+# ============================================
+
+def shipments_per_day(start, end, by='status'):
+    """{day: {<by value>: count}} for shipments created between start and end"""
+    report = defaultdict(dict)
+    rows = (
+        ShipmentDailyRollup.objects.filter(day__range=(start, end))
+        .values('day', by)
+        .annotate(total=Sum('count'))
+        .order_by('day', by)
+    )
+    for row in rows:
+        if row['total']:
+            report[row['day']][row[by]] = row['total']
+    return dict(report)
+
+
+def shipment_totals(start, end, by):
+    """[(value, count)] for shipments created between start and end, largest first"""
+    rows = (
+        ShipmentDailyRollup.objects.filter(day__range=(start, end))
+        .values_list(by)
+        .annotate(total=Sum('count'))
+        .filter(total__gt=0)
+        .order_by('-total')
+    )
+    return list(rows)
+
+
+def quote_conversion(start, end):
+    """Quote counts and accepted/total conversion per freight type"""
+    report = {}
+    rows = (
+        QuoteDailyRollup.objects.filter(day__range=(start, end))
+        .values_list('freight_type', 'status')
+        .annotate(total=Sum('count'))
+    )
+    for freight_type, status, total in rows:
+        entry = report.setdefault(freight_type, {'total': 0, 'accepted': 0, 'by_status': {}})
+        entry['total'] += total
+        entry['by_status'][status] = total
+        if status == 'accepted':
+            entry['accepted'] += total
+    for entry in report.values():
+        entry['conversion'] = round(100 * entry['accepted'] / entry['total'], 1) if entry['total'] else 0
+    return report
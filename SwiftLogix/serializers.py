@@ -0,0 +1,190 @@
+# SwiftLogix/serializers.py
+"""
+Serializers for the JSON endpoints.
+
+Rows are read with ``.values_list()`` and turned into plain dicts directly:
+choice labels come from maps built once at import, each event carries one
+ISO 8601 timestamp, and nothing is instantiated per tracking update. The
+encoder is orjson when it is installed and the stdlib ``json`` module with
+Django's encoder otherwise; both produce the same output.
+
+Long-lived tracking pages poll with the ``cursor`` from their last response
+as ``since`` and get back only what changed: events recorded after the
+cursor's watermark, and the shipment block only when its contents differ.
+The watermark is the (``created_at``, ``id``) of the newest event seen,
+i.e. arrival order rather than the scan's own ``timestamp``, so a scan that
+arrives late with an earlier timestamp is still delivered.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse
+
+from . import lanes
+from .models import Shipment, TrackingUpdate
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+STATUS_LABELS = dict(Shipment.SHIPMENT_STATUS_CHOICES)
+TYPE_LABELS = dict(Shipment.SHIPMENT_TYPE_CHOICES)
+
+# Columns the tracking response and its ETA prediction read
+TRACKING_SHIPMENT_FIELDS = (
+    'id', 'tracking_number', 'status', 'shipment_type',
+    'sender_name', 'sender_city', 'sender_country', 'sender_latitude', 'sender_longitude',
+    'receiver_name', 'receiver_city', 'receiver_country', 'receiver_latitude', 'receiver_longitude',
+    'current_latitude', 'current_longitude', 'route_progress', 'remaining_distance_km',
+    'pickup_date', 'expected_delivery_date', 'actual_delivery_date', 'created_at',
+    'weight', 'dimensions', 'package_description',
+)
+TRACKING_UPDATE_FIELDS = ('status', 'location', 'description', 'timestamp', 'created_at', 'id')
+
+_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    # orjson hands back what it cannot encode (Decimal, and datetimes so they match DjangoJSONEncoder)
+    return _encoder.default(value)
+
+
+if orjson is not None:
+    def dumps(data):
+        return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+else:
+    def dumps(data):
+        return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200):
+    """JsonResponse equivalent that encodes through ``dumps``"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+def _day(value):
+    return value.date().isoformat() if value else None
+
+
+def encode_sync_cursor(shipment_id, watermark, digest):
+    created_at, pk = watermark or (None, 0)
+    raw = [shipment_id, created_at.isoformat() if created_at else None, pk, digest]
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    """(shipment id, watermark or None, shipment digest) from a cursor; ValueError if it is malformed"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        shipment_id, created_at, pk, digest = raw
+        watermark = (datetime.fromisoformat(created_at), int(pk)) if created_at else None
+        return int(shipment_id), watermark, str(digest)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def _digest(data):
+    return hashlib.blake2b(dumps(data), digest_size=8).hexdigest()
+
+
+def tracking_updates(shipment_id, after=None):
+    """A shipment's events, newest first, as dicts with one ISO timestamp each
+
+    With ``after`` (a watermark), only events recorded since. Returns
+    (events, watermark of the newest event returned, or None).
+    """
+    rows = TrackingUpdate.objects.filter(shipment_id=shipment_id)
+    if after is not None:
+        created_at, pk = after
+        rows = rows.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    rows = rows.order_by('-timestamp').values_list(*TRACKING_UPDATE_FIELDS)
+    labels = STATUS_LABELS
+    events = []
+    watermark = None
+    for status, location, description, timestamp, created_at, pk in rows:
+        events.append({
+            'status': labels.get(status, status),
+            'status_code': status,
+            'location': location,
+            'description': description,
+            'timestamp': timestamp.isoformat(timespec='seconds'),
+        })
+        if watermark is None or (created_at, pk) > watermark:
+            watermark = (created_at, pk)
+    return events, watermark
+
+
+def tracking_payload(tracking_number, since=None):
+    """The track API's body for ``tracking_number``, or None when there is no such shipment
+
+    ``since`` is the ``cursor`` of an earlier response for the same shipment:
+    the body then holds only the events recorded after it, and ``shipment``
+    only if it changed (``full`` is False). A cursor for another shipment is
+    ignored. Raises ValueError for a malformed cursor.
+    """
+    previous = decode_sync_cursor(since) if since else None
+    shipment = (
+        Shipment.objects.filter(tracking_number__iexact=tracking_number)
+        .only(*TRACKING_SHIPMENT_FIELDS)
+        .first()
+    )
+    if shipment is None:
+        return None
+
+    prediction = lanes.predict(shipment)
+    current = (shipment.current_latitude, shipment.current_longitude)
+    if current[0] is None:
+        # No live position: pin the parcel at whichever end it is sitting at
+        if shipment.status == 'delivered':
+            current = (shipment.receiver_latitude, shipment.receiver_longitude)
+        elif shipment.status == 'pending':
+            current = (shipment.sender_latitude, shipment.sender_longitude)
+
+    data = {
+        'tracking_number': shipment.tracking_number,
+        'status': STATUS_LABELS.get(shipment.status, shipment.status),
+        'status_code': shipment.status,
+        'progress': prediction['progress'],
+        'remaining_distance_km': shipment.remaining_distance_km,
+        'sender_name': shipment.sender_name,
+        'sender_city': shipment.sender_city,
+        'sender_country': shipment.sender_country,
+        'receiver_name': shipment.receiver_name,
+        'receiver_city': shipment.receiver_city,
+        'receiver_country': shipment.receiver_country,
+        'sender_lat': shipment.sender_latitude,
+        'sender_lng': shipment.sender_longitude,
+        'receiver_lat': shipment.receiver_latitude,
+        'receiver_lng': shipment.receiver_longitude,
+        'current_lat': current[0],
+        'current_lng': current[1],
+        'shipment_type': TYPE_LABELS.get(shipment.shipment_type, shipment.shipment_type),
+        'pickup_date': _day(shipment.pickup_date),
+        'expected_delivery': _day(shipment.expected_delivery_date),
+        'predicted_delivery': _day(prediction['predicted_delivery']),
+        'lane_samples': prediction['lane_samples'],
+        'actual_delivery': _day(shipment.actual_delivery_date),
+        'weight': str(shipment.weight),
+        'dimensions': shipment.dimensions,
+        'package_description': shipment.package_description,
+    }
+    digest = _digest(data)
+
+    if previous is not None and previous[0] == shipment.pk:
+        _, after, previous_digest = previous
+        events, watermark = tracking_updates(shipment.pk, after=after)
+        payload = {'success': True, 'full': False, 'tracking_updates': events}
+        if digest != previous_digest:
+            payload['shipment'] = data
+        watermark = watermark or after
+    else:
+        events, watermark = tracking_updates(shipment.pk)
+        payload = {'success': True, 'full': True, 'shipment': data, 'tracking_updates': events}
+    payload['cursor'] = encode_sync_cursor(shipment.pk, watermark, digest)
+    return payload
@@ -0,0 +1,74 @@
+# SwiftLogix/sessions.py
+"""
+Session engine and middleware.
+
+``SESSION_ENGINE = 'SwiftLogix.sessions'`` gives cache-backed sessions with
+write-through to the database (Django's cached_db semantics): reads are
+served from ``SESSION_CACHE_ALIAS`` and only fall back to ``django_session``
+on a cache miss.
+
+``HybridSessionMiddleware`` additionally keeps anonymous sessions, which in
+this app only ever hold flash messages, in a signed cookie. They are
+promoted to the server-side store the moment a user logs in, so
+authenticated sessions stay revocable.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import cached_db, signed_cookies
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.utils import timezone
+
+CLEAR_EXPIRED_BATCH_SIZE = 5000
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = 'swiftlogix.sessions'
+
+    @classmethod
+    def clear_expired(cls):
+        """Delete expired rows in batches so clearsessions never holds a long table lock"""
+        model = cls.get_model_class()
+        now = timezone.now()
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:CLEAR_EXPIRED_BATCH_SIZE]
+            )
+            if not keys:
+                break
+            model.objects.filter(session_key__in=keys).delete()
+        # Cached copies expire on their own: they are stored with the session's remaining age.
+
+
+def is_signed_cookie_session(session_key):
+    """Signed-cookie sessions carry their payload in the cookie; server-side keys never contain ':'"""
+    return session_key is not None and ':' in session_key
+
+
+class HybridSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware that keeps anonymous sessions in a signed cookie"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.CookieSessionStore = signed_cookies.SessionStore
+        self.anonymous_cookies = getattr(settings, 'SESSION_ANONYMOUS_SIGNED_COOKIES', True)
+
+    def process_request(self, request):
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if self.anonymous_cookies and (session_key is None or is_signed_cookie_session(session_key)):
+            request.session = self.CookieSessionStore(session_key)
+        else:
+            request.session = self.SessionStore(session_key)
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if isinstance(session, self.CookieSessionStore) and session.get(SESSION_KEY):
+            request.session = self.promote(session)
+        return super().process_response(request, response)
+
+    def promote(self, cookie_session):
+        """Move a just-authenticated session into the server-side store"""
+        session = self.SessionStore()
+        session.update(cookie_session.items())
+        session.accessed = True
+        return session
@@ -0,0 +1,85 @@
+# SwiftLogix/signals.py
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import lanes, notifications, rollups, webhooks
+from .auth import invalidate_user
+from .models import QuoteRequest, Shipment, TrackingUpdate, UserProfile
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """Every account gets its profile once, when the user row is created"""
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=Shipment)
+def record_lane_on_delivery(sender, instance, **kwargs):
+    """Learn lane transit times as shipments are delivered"""
+    if instance.status == 'delivered' and not instance.lane_recorded:
+        lanes.record_delivery(instance)
+
+
+@receiver(post_save, sender=TrackingUpdate)
+def record_lane_on_delivered_update(sender, instance, created, **kwargs):
+    """A 'delivered' scan completes the shipment's timeline even if its status lags behind"""
+    if created and instance.status == 'delivered' and not instance.shipment.lane_recorded:
+        lanes.record_delivery(instance.shipment)
+
+
+@receiver(post_save, sender=Shipment)
+def update_shipment_rollups(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.shipment_saved(instance, created)
+
+
+@receiver(post_delete, sender=Shipment)
+def remove_shipment_from_rollups(sender, instance, **kwargs):
+    rollups.shipment_deleted(instance)
+
+
+@receiver(post_save, sender=QuoteRequest)
+def update_quote_rollups(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.quote_saved(instance, created)
+
+
+@receiver(post_delete, sender=QuoteRequest)
+def remove_quote_from_rollups(sender, instance, **kwargs):
+    rollups.quote_deleted(instance)
+
+
+@receiver(post_save, sender=TrackingUpdate)
+def notify_tracking_update(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        notifications.record(
+            instance.shipment, instance.status,
+            location=instance.location, description=instance.description, when=instance.timestamp,
+        )
+        webhooks.emit(instance.shipment, webhooks.shipment_event(
+            instance.shipment, instance.status,
+            location=instance.location, description=instance.description, when=instance.timestamp,
+            event='shipment.tracking_update',
+        ))
+
+
+@receiver(post_save, sender=Shipment)
+def notify_status_change(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_loaded_values', {}).get('status')
+    if not created and not raw and previous is not None and previous != instance.status:
+        notifications.record(instance, instance.status)
+        webhooks.emit(instance, webhooks.shipment_event(instance, instance.status))
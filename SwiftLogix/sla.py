@@ -0,0 +1,192 @@
+# SwiftLogix/sla.py
+"""
+SLA breach and stale-shipment detection.
+
+``detect`` looks for two kinds of exception among shipments that are still
+on their way:
+
+* overdue: ``expected_delivery_date`` passed more than ``SLA_GRACE_HOURS``
+  ago;
+* silent: in transit, and no tracking update has arrived for
+  ``SLA_STALE_DAYS``.
+
+Both are keyset range scans over partial indexes that hold only shipments
+that can still be put on hold (``shipment_sla_overdue_idx`` and
+``shipment_sla_silent_idx``), and "no recent update" is an ``EXISTS`` probe
+of ``tracking_sync_idx``, so a run costs the same however much delivered
+history the table holds. Each chunk of ``SLA_CHUNK_SIZE`` exceptions is put
+on hold in one conditional UPDATE (``transitions.bulk_transition``, which
+notifies customers and webhooks like the admin action) with a generated
+tracking update saying why, and every exception goes into a CSV report in
+``SLA_REPORT_DIR``. With ``SLA_HOLD`` off (or ``hold=False``) shipments are
+only reported.
+"""
+import csv
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
+from django.utils import timezone
+
+from . import transitions
+from .models import HOLDABLE_SHIPMENT, Shipment, TrackingUpdate
+
+HOLD_STATUS = 'on_hold'
+HOLD_LOCATION = 'SwiftLogix operations'
+
+REPORT_COLUMNS = (
+    'tracking_number', 'reason', 'status', 'action', 'expected_delivery_date', 'days_overdue',
+    'last_update_at', 'days_since_update', 'sender_email', 'receiver_email',
+)
+SCAN_FIELDS = (
+    'id', 'tracking_number', 'status', 'expected_delivery_date', 'updated_at', 'sender_email', 'receiver_email',
+    'already_held',
+)
+
+
+def report_dir():
+    return Path(getattr(settings, 'SLA_REPORT_DIR', settings.BASE_DIR / '.cache' / 'sla'))
+
+
+def _last_update():
+    latest = TrackingUpdate.objects.filter(shipment=OuterRef('pk')).order_by('-created_at', '-id')
+    return Subquery(latest.values('created_at')[:1])
+
+
+def overdue(now=None):
+    """Shipments past their expected delivery (plus the grace period) that can still be put on hold
+
+    already_held marks those this job held once for the same breach and staff
+    released since: they are reported, not held again, until the expected
+    delivery date is moved.
+    """
+    now = now or timezone.now()
+    grace = timedelta(hours=getattr(settings, 'SLA_GRACE_HOURS', 0))
+    previous_hold = TrackingUpdate.objects.filter(
+        shipment=OuterRef('pk'), status=HOLD_STATUS, location=HOLD_LOCATION,
+        created_at__gte=OuterRef('expected_delivery_date'),
+    )
+    return (
+        # HOLDABLE_SHIPMENT is the condition of shipment_sla_overdue_idx, so the planner can use it
+        Shipment.objects.filter(HOLDABLE_SHIPMENT, expected_delivery_date__lt=now - grace)
+        .annotate(already_held=Exists(previous_hold))
+    )
+
+
+def silent(now=None):
+    """In-transit shipments with no tracking update, nor any status change, for SLA_STALE_DAYS"""
+    cutoff = (now or timezone.now()) - timedelta(days=getattr(settings, 'SLA_STALE_DAYS', 3))
+    recent = TrackingUpdate.objects.filter(shipment=OuterRef('pk'), created_at__gte=cutoff)
+    return (
+        Shipment.objects.filter(status='in_transit', updated_at__lt=cutoff).filter(~Exists(recent))
+        .annotate(already_held=Value(False))
+    )
+
+
+def _chunks(queryset, field, size):
+    """Rows of queryset in (field, id) order, size at a time, each chunk one index range scan"""
+    queryset = queryset.annotate(last_update_at=_last_update()).order_by(field, 'id')
+    after = None
+    while True:
+        page = queryset
+        if after is not None:
+            page = page.filter(Q(**{f'{field}__gt': after[0]}) | Q(**{field: after[0], 'id__gt': after[1]}))
+        rows = list(page.values(*SCAN_FIELDS, 'last_update_at')[:size])
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1][field], rows[-1]['id'])
+
+
+def _describe(reason, row, now):
+    if reason == 'overdue':
+        return (
+            f"Held for review: delivery was expected on {row['expected_delivery_date']:%d %b %Y} "
+            "and the shipment has not been delivered. Our team is looking into it."
+        )
+    days = (now - (row['last_update_at'] or row['updated_at'])).days
+    return (
+        f"Held for review: no tracking update for {days} days. "
+        "Our team is confirming the shipment's location."
+    )
+
+
+def _hold(rows, reason, now):
+    """Put rows on hold in one conditional UPDATE; returns the ids that moved"""
+    rows = [row for row in rows if not row['already_held']]
+    if not rows:
+        return set()
+    ids = [row['id'] for row in rows]
+    transitions.bulk_transition(Shipment.objects.filter(pk__in=ids), HOLD_STATUS)
+    # Rows that moved on (delivered, cancelled) since the scan were left alone by the UPDATE
+    held = set(Shipment.objects.filter(pk__in=ids, status=HOLD_STATUS).values_list('pk', flat=True))
+    # Created in bulk, so post_save does not notify a second time: bulk_transition already did
+    TrackingUpdate.objects.bulk_create([
+        TrackingUpdate(
+            shipment_id=row['id'], status=HOLD_STATUS, location=HOLD_LOCATION,
+            description=_describe(reason, row, now), timestamp=now,
+        )
+        for row in rows if row['id'] in held
+    ])
+    return held
+
+
+def _report_row(reason, row, action, now):
+    expected = row['expected_delivery_date']
+    last_update = row['last_update_at']
+    return {
+        'tracking_number': row['tracking_number'],
+        'reason': reason,
+        'status': row['status'],
+        'action': action,
+        'expected_delivery_date': expected.isoformat(timespec='minutes'),
+        'days_overdue': max(0, (now - expected).days),
+        'last_update_at': last_update.isoformat(timespec='minutes') if last_update else '',
+        'days_since_update': (now - (last_update or row['updated_at'])).days,
+        'sender_email': row['sender_email'],
+        'receiver_email': row['receiver_email'],
+    }
+
+
+def detect(hold=None, now=None, chunk_size=None):
+    """Find overdue and silent shipments, hold them (unless hold is False) and write the report
+
+    Returns a summary: counts per reason, how many were held, and the report's path.
+    """
+    now = now or timezone.now()
+    hold = getattr(settings, 'SLA_HOLD', True) if hold is None else hold
+    chunk_size = chunk_size or getattr(settings, 'SLA_CHUNK_SIZE', 500)
+    directory = report_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'sla-{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.csv'
+
+    summary = {'overdue': 0, 'silent': 0, 'held': 0, 'report': str(path)}
+    seen = set()
+    with open(path, 'w', newline='') as handle:
+        writer = csv.DictWriter(handle, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        scans = (('overdue', overdue(now), 'expected_delivery_date'), ('silent', silent(now), 'updated_at'))
+        for reason, queryset, field in scans:
+            for rows in _chunks(queryset, field, chunk_size):
+                # An overdue shipment can be silent too; report it once
+                rows = [row for row in rows if row['id'] not in seen]
+                seen.update(row['id'] for row in rows)
+                held = _hold(rows, reason, now) if hold and rows else set()
+                for row in rows:
+                    if row['id'] in held:
+                        action = 'held'
+                    else:
+                        action = 'held earlier' if row['already_held'] else 'reported'
+                    writer.writerow(_report_row(reason, row, action, now))
+                summary[reason] += len(rows)
+                summary['held'] += len(held)
+    _prune(directory)
+    return summary
+
+
+def _prune(directory):
+    keep = getattr(settings, 'SLA_MAX_REPORTS', 90)
+    for stale in sorted(directory.glob('sla-*.csv'), reverse=True)[keep:]:
+        stale.unlink(missing_ok=True)
@@ -0,0 +1,91 @@
+# SwiftLogix/tasks.py
+"""Background tasks enqueued by the views; run by 'manage.py run_worker'."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from . import geo, labels, notifications, sla
+from .jobs import task
+from .models import ContactMessage, Job, QuoteRequest, Shipment
+
+
+@task(queue='mail')
+def send_contact_acknowledgement(message_id):
+    message = ContactMessage.objects.get(pk=message_id)
+    send_mail(
+        subject=f"We received your message: {message.subject}",
+        message=(
+            f"Hi {message.name},\n\n"
+            "Thanks for contacting SwiftLogix. Our team will get back to you shortly.\n"
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[message.email],
+    )
+
+
+@task(queue='mail')
+def send_quote_confirmation(quote_id):
+    quote = QuoteRequest.objects.get(pk=quote_id)
+    send_mail(
+        subject="Your SwiftLogix quote request",
+        message=(
+            f"Hi {quote.name},\n\n"
+            f"We received your {quote.get_freight_type_display()} quote request "
+            f"from {quote.origin or '-'} to {quote.destination or '-'} and will contact you soon.\n"
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[quote.email],
+    )
+
+
+@task(queue='mail')
+def send_welcome_email(user_id):
+    from django.contrib.auth.models import User
+
+    user = User.objects.get(pk=user_id)
+    send_mail(
+        subject="Welcome to SwiftLogix",
+        message=(
+            f"Hi {user.first_name or user.username},\n\n"
+            "Your account is ready. Track shipments and request quotes from your dashboard.\n"
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+    )
+
+
+@task(queue='mail')
+def flush_notifications():
+    """Send every digest whose window has closed, then reschedule for the rest"""
+    while notifications.flush()[0]:
+        pass
+    notifications.schedule_flush()
+
+
+@task()
+def refresh_route_progress(reschedule=True):
+    """Recompute distance progress for moving shipments, then queue the next run"""
+    geo.refresh_progress()
+    geo.clear_inactive()
+    already_queued = Job.objects.filter(task=refresh_route_progress.task_name, status='queued').exists()
+    if reschedule and not already_queued:
+        interval = getattr(settings, 'ROUTE_PROGRESS_INTERVAL_SECONDS', 300)
+        refresh_route_progress.delay(run_at=timezone.now() + timedelta(seconds=interval))
+
+
+@task()
+def detect_sla_breaches(reschedule=True):
+    """Hold and report overdue and silent shipments, then queue the next run"""
+    sla.detect()
+    already_queued = Job.objects.filter(task=detect_sla_breaches.task_name, status='queued').exists()
+    if reschedule and not already_queued:
+        interval = getattr(settings, 'SLA_CHECK_INTERVAL_SECONDS', 3600)
+        detect_sla_breaches.delay(run_at=timezone.now() + timedelta(seconds=interval))
+
+
+@task(max_attempts=2)
+def print_labels(shipment_ids, track_url, name):
+    """Render a label batch for the admin action; it shows up on the labels page when finished"""
+    labels.print_batch(Shipment.objects.filter(pk__in=shipment_ids), track_url, name=name)
@@ -0,0 +1,149 @@
+// SwiftLogix service worker; the caching strategy is described in SwiftLogix/offline.py
+const CONFIG = {{ config|safe }};
+
+const SHELL_CACHE = `swiftlogix-shell-${CONFIG.version}`;
+const CDN_CACHE = `swiftlogix-cdn-${CONFIG.version}`;
+// Results and tiles do not depend on the deploy, so they outlive new workers
+const TRACKING_CACHE = 'swiftlogix-tracking-v1';
+const TILE_CACHE = 'swiftlogix-tiles-v1';
+const CURRENT_CACHES = [SHELL_CACHE, CDN_CACHE, TRACKING_CACHE, TILE_CACHE];
+
+const SHELL_URLS = new Set(CONFIG.shell.map(url => new URL(url, self.location).href));
+const HASHED_NAME = new RegExp(CONFIG.hashedName);
+
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const shell = await caches.open(SHELL_CACHE);
+        await shell.addAll(CONFIG.shell);
+        const cdn = await caches.open(CDN_CACHE);
+        await Promise.all(CONFIG.external.map(url =>
+            fetch(url, { mode: 'no-cors' }).then(response => cdn.put(url, response)).catch(() => null)
+        ));
+        await self.skipWaiting();
+    })());
+});
+
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith('swiftlogix-') && !CURRENT_CACHES.includes(name))
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+
+// Cache keys come back in insertion order and put() re-appends an entry, so the first keys are the least recently used
+async function trim(cache, maxEntries) {
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - maxEntries)).map(key => cache.delete(key)));
+}
+
+
+function storable(response) {
+    return response.ok || response.type === 'opaque';
+}
+
+
+async function cacheFirst(cacheName, event) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request, { ignoreVary: true });
+    if (cached) return cached;
+    const response = await fetch(event.request);
+    if (storable(response)) event.waitUntil(cache.put(event.request, response.clone()));
+    return response;
+}
+
+
+async function staleWhileRevalidate(cacheName, event) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(event.request, { ignoreVary: true });
+    const network = fetch(event.request).then(response => {
+        if (storable(response)) event.waitUntil(cache.put(event.request, response.clone()));
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+
+async function trackPage(event) {
+    if (!new URL(event.request.url).search) return staleWhileRevalidate(SHELL_CACHE, event);
+    // Server-rendered lookups (?tracking_number=) go to the network; offline, the shell still loads
+    try {
+        return await fetch(event.request);
+    } catch (err) {
+        return (await caches.match(CONFIG.trackPage, { ignoreVary: true })) || Response.error();
+    }
+}
+
+
+async function saveTracking(cache, request, response) {
+    if (!response.ok) return;
+    const body = await response.text();
+    if (!JSON.parse(body).success) return;
+    // The page tells a saved copy from a live one by this header
+    const headers = new Headers(response.headers);
+    headers.set('X-Saved-At', new Date().toISOString());
+    await cache.put(request, new Response(body, { status: response.status, headers: headers }));
+    await trim(cache, CONFIG.trackingEntries);
+}
+
+
+async function trackingResult(event) {
+    const cache = await caches.open(TRACKING_CACHE);
+    const cached = await cache.match(event.request, { ignoreVary: true });
+    const network = fetch(event.request).then(response => {
+        event.waitUntil(saveTracking(cache, event.request, response.clone()).catch(() => null));
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+
+async function tile(event) {
+    const cache = await caches.open(TILE_CACHE);
+    const cached = await cache.match(event.request);
+    if (cached) {
+        // Re-insert to mark it recently used
+        event.waitUntil(cache.put(event.request, cached.clone()));
+        return cached;
+    }
+    const response = await fetch(event.request);
+    if (storable(response)) {
+        event.waitUntil(cache.put(event.request, response.clone()).then(() => trim(cache, CONFIG.tileEntries)));
+    }
+    return response;
+}
+
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const url = new URL(request.url);
+
+    if (url.hostname.endsWith(CONFIG.tileHostSuffix)) {
+        event.respondWith(tile(event));
+    } else if (url.origin !== self.location.origin) {
+        if (CONFIG.external.includes(request.url)) event.respondWith(staleWhileRevalidate(CDN_CACHE, event));
+    } else if (SHELL_URLS.has(url.href) && url.pathname !== CONFIG.trackPage) {
+        event.respondWith(HASHED_NAME.test(url.pathname)
+            ? cacheFirst(SHELL_CACHE, event)
+            : staleWhileRevalidate(SHELL_CACHE, event));
+    } else if (url.pathname === CONFIG.trackApi && url.searchParams.has('tracking_number') && !url.searchParams.has('since')) {
+        // Deltas (?since=) are small and only make sense live, so they always go to the network
+        event.respondWith(trackingResult(event));
+    } else if (request.mode === 'navigate' && url.pathname === CONFIG.trackPage) {
+        event.respondWith(trackPage(event));
+    }
+});
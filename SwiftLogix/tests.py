@@ -1,3 +1,1694 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import hashlib
+import hmac
+import http.server
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.mail.backends import locmem
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import auth, cache, compression, gazetteer, geo, history, jobs, labels, lanes, metrics, notifications, profiling, replicas, rollups, serializers, sessions, sla, transitions, triage, urls, webhooks
+from .admin import ShipmentAdminForm
+from .models import (
+    ContactMessage, InvalidTransition, Job, LaneStat, Notification, QuoteDailyRollup, QuoteRequest, Shipment, ShipmentDailyRollup, StaleShipment, TrackingUpdate, WebhookDelivery, WebhookEndpoint,
+)
+
+# Fixture sizes every view is rendered against; query counts must not grow between them
+SIZES = (2, 12)
+
+STAFF_PASSWORD = 'budget-staff-pw'
+
+
+def make_shipment(n, user=None, **fields):
+    defaults = dict(
+        tracking_number=f'QB{n:010d}',
+        status='in_transit',
+        shipment_type='air',
+        user=user,
+        sender_name=f'Sender {n}', sender_email=f'sender{n}@example.com', sender_phone='1',
+        sender_address='1 Harbour Road', sender_city='Accra', sender_country='Ghana',
+        receiver_name=f'Receiver {n}', receiver_email=f'receiver{n}@example.com', receiver_phone='2',
+        receiver_address='2 Station Street', receiver_city='London', receiver_country='United Kingdom',
+        package_description='Parts', weight=10, dimensions='10x10x10', declared_value=100,
+        pickup_date=timezone.now() - timedelta(days=2),
+        expected_delivery_date=timezone.now() + timedelta(days=3),
+        current_latitude=20.0 + n * 0.01, current_longitude=-0.5,
+    )
+    defaults.update(fields)
+    return Shipment.objects.create(**defaults)
+
+
+def make_fixture(size):
+    """size shipments (each with size tracking updates), quotes, messages, jobs and webhook deliveries"""
+    customer = User.objects.create_user('customer', 'customer@example.com', 'customer-pw')
+    staff = User.objects.create_superuser('staff', 'staff@example.com', STAFF_PASSWORD)
+    endpoint = WebhookEndpoint.objects.create(profile=customer.profile, url='https://example.com/hook')
+    for n in range(size):
+        owner = User.objects.create_user(f'owner{n}', f'owner{n}@example.com', 'owner-pw')
+        shipment = make_shipment(n, user=customer if n % 2 else owner)
+        TrackingUpdate.objects.bulk_create([
+            TrackingUpdate(shipment=shipment, status='in_transit', location=f'Hub {i}', description='Scanned')
+            for i in range(size)
+        ])
+        QuoteRequest.objects.create(
+            name=f'Quote {n}', email=f'quote{n}@example.com', mobile='1', freight_type='sea',
+            origin='Accra', destination='Rotterdam', user=customer if n % 2 else owner,
+        )
+        ContactMessage.objects.create(name=f'Contact {n}', email=f'c{n}@example.com', subject='Hi', message='Hello')
+        WebhookDelivery.objects.create(endpoint=endpoint, event='shipment.status_changed', payload={'n': n})
+    return customer, staff
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    # setUp() clears every cache, so none of them may be the real file or Redis caches
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'query-budget-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class QueryBudgetTests(TestCase):
+    """Each view's query count stays under its budget and does not grow with the data"""
+
+    # url name -> (who is logged in, method, reverse kwargs / query data, query budget)
+    VIEW_BUDGETS = {
+        'home': (None, 'get', None, 0),
+        'about': (None, 'get', None, 0),
+        'services': (None, 'get', None, 0),
+        'contact': (None, 'get', None, 0),
+        'pricing': (None, 'get', None, 0),
+        'feature': (None, 'get', None, 0),
+        'quote': (None, 'get', None, 0),
+        'team': (None, 'get', None, 0),
+        'testimonial': (None, 'get', None, 0),
+        'page_not_found': (None, 'get', None, 0),
+        'track': (None, 'get', {'data': {'tracking_number': 'QB0000000001'}}, 2),
+        'track_api': (None, 'get', {'data': {'tracking_number': 'QB0000000001'}}, 3),
+        'service_worker': (None, 'get', None, 0),
+        'web_manifest': (None, 'get', None, 0),
+        'terms': (None, 'get', None, 0),
+        'help': (None, 'get', None, 0),
+        'air': (None, 'get', None, 0),
+        'sea': (None, 'get', None, 0),
+        'road': (None, 'get', None, 0),
+        'warehouse': (None, 'get', None, 0),
+        'customs': (None, 'get', None, 0),
+        'express': (None, 'get', None, 0),
+        'login': (None, 'get', None, 0),
+        'logout': ('customer', 'get', None, 4),
+        'register': (None, 'get', None, 0),
+        'dashboard': ('customer', 'get', None, 6),
+        'profile': ('customer', 'get', None, 2),
+        'shipment_history': ('customer', 'get', {'data': {'limit': '3', 'status': 'in_transit'}}, 3),
+        'quote_history': ('customer', 'get', {'data': {'fields': 'id,status,quote_amount'}}, 3),
+        'reports': ('staff', 'get', None, 7),
+        'quote_queue': ('staff', 'get', None, 4),
+        # SQLite has no SKIP LOCKED, so this is the per-row claim path plus its rollup bumps
+        'quote_queue_api': ('staff', 'post', {'data': {'action': 'claim', 'limit': '1'}}, 18),
+        'labels': ('staff', 'get', None, 2),
+        'label_download': ('staff', 'get', {'kwargs': {'name': 'missing'}}, 2),
+        'fleet': ('staff', 'get', None, 2),
+        # One query per uncached tile: this box covers 10 tiles at zoom 4
+        'fleet_api': ('staff', 'get', {'data': {'bbox': '-10,0,10,60', 'zoom': '4'}}, 12),
+        'fleet_tile': ('staff', 'get', {'kwargs': {'z': 3, 'x': 3, 'y': 3}}, 3),
+        'metrics': ('staff', 'get', None, 2),
+        'profiles': ('staff', 'get', None, 2),
+        'profile_capture': ('staff', 'get', {'kwargs': {'name': 'missing'}}, 2),
+    }
+
+    ADMIN_CHANGELIST_BUDGET = 9
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def login(self, username):
+        if username == 'staff':
+            self.client.login(username='staff', password=STAFF_PASSWORD)
+        elif username:
+            self.client.login(username=username, password=f'{username}-pw')
+
+    def capture(self, method, url, data=None):
+        for cache in caches.all():
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 500, f"{url} failed with {response.status_code}")
+        return queries.captured_queries
+
+    def assertBudget(self, label, counts, budget):
+        """counts is {fixture size: captured queries}; fail with the SQL of the offending run"""
+        largest = counts[SIZES[-1]]
+        sql = '\n'.join(f"  {i}. {query['sql']}" for i, query in enumerate(largest, 1))
+        self.assertLessEqual(
+            len(largest), budget,
+            f"{label} ran {len(largest)} queries, budget is {budget}:\n{sql}",
+        )
+        sizes = {size: len(queries) for size, queries in counts.items()}
+        self.assertEqual(
+            len(set(sizes.values())), 1,
+            f"{label} query count grows with data size {sizes}:\n{sql}",
+        )
+
+    def measure(self, username, method, url, data=None):
+        counts = {}
+        for size in SIZES:
+            savepoint = transaction.savepoint()
+            make_fixture(size)
+            self.login(username)
+            counts[size] = self.capture(method, url, data)
+            self.client.logout()
+            transaction.savepoint_rollback(savepoint)
+        return counts
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name}
+        self.assertEqual(names - set(self.VIEW_BUDGETS), set(), "Add a query budget for these views")
+
+    def test_view_query_budgets(self):
+        for name, (username, method, options, budget) in self.VIEW_BUDGETS.items():
+            options = options or {}
+            with self.subTest(view=name):
+                url = reverse(name, kwargs=options.get('kwargs'))
+                self.assertBudget(name, self.measure(username, method, url, options.get('data')), budget)
+
+    def test_admin_changelist_query_budgets(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != 'SwiftLogix':
+                continue
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            with self.subTest(admin=model.__name__):
+                self.assertBudget(
+                    f'{model.__name__} changelist',
+                    self.measure('staff', 'get', url),
+                    self.ADMIN_CHANGELIST_BUDGET,
+                )
+
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'sessions-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class SessionTests(TestCase):
+    """Anonymous sessions stay in a signed cookie; logged-in ones are served from the cache"""
+
+    def session_key(self):
+        return self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    @override_settings(MESSAGE_STORAGE='django.contrib.messages.storage.session.SessionStorage')
+    def test_anonymous_flash_message_stays_in_the_cookie(self):
+        self.client.post(reverse('contact'), {'name': 'A', 'email': 'a@example.com', 'subject': 'Hi', 'message': 'Hello'})
+        self.assertTrue(sessions.is_signed_cookie_session(self.session_key()))
+        self.assertFalse(Session.objects.exists())
+
+    def test_login_promotes_the_session_and_reads_skip_the_database(self):
+        User.objects.create_user('member', password='member-pw')
+        self.client.post(reverse('login'), {'username': 'member', 'password': 'member-pw'})
+        key = self.session_key()
+        self.assertFalse(sessions.is_signed_cookie_session(key))
+        self.assertTrue(Session.objects.filter(session_key=key).exists())
+
+        session_table = Session._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.wsgi_request.user.username, 'member')
+        self.assertFalse([query['sql'] for query in queries if session_table in query['sql']])
+
+    def test_clear_expired_deletes_in_batches(self):
+        store = sessions.SessionStore
+        for n in range(5):
+            Session.objects.create(session_key=f'expired{n}', session_data='', expire_date=timezone.now() - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=timezone.now() + timedelta(days=1))
+        with mock.patch.object(sessions, 'CLEAR_EXPIRED_BATCH_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            store.clear_expired()
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 3)
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'auth-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class UserCacheTests(TestCase):
+    """request.user is reused between requests until the user changes, in every worker"""
+
+    def setUp(self):
+        self.addCleanup(auth._local.clear)
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'first-pw')
+        self.assertTrue(self.client.login(username='cached', password='first-pw'))
+
+    def current_user(self):
+        return self.client.get(reverse('dashboard')).wsgi_request.user
+
+    def test_user_is_reused_and_the_shared_cache_holds_no_user(self):
+        self.assertTrue(self.current_user().is_authenticated)
+        with self.assertNumQueries(0):
+            auth.ProfileBackend().get_user(self.user.pk)
+        token = caches['shared'].get(auth.CACHE_KEY.format(self.user.pk))
+        self.assertIsInstance(token, str)
+        self.assertNotIn(self.user.password, token)
+
+    def test_password_change_logs_other_sessions_out(self):
+        self.assertTrue(self.current_user().is_authenticated)
+        self.user.set_password('second-pw')
+        self.user.save()
+        self.assertFalse(self.current_user().is_authenticated)
+
+    def test_bulk_deactivation_applies_once_invalidated(self):
+        self.assertTrue(self.current_user().is_authenticated)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        auth.invalidate_users([self.user.pk])
+        self.assertFalse(self.current_user().is_authenticated)
+
+    def test_copy_in_another_worker_is_not_served_after_a_change(self):
+        backend = auth.ProfileBackend()
+        backend.get_user(self.user.pk)
+        stale = auth._local.get(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(first_name='Renamed')
+        auth.invalidate_user(self.user.pk)
+        # Another worker still holds the old copy; the token it was loaded under is gone
+        auth._local.set(self.user.pk, stale)
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Renamed')
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class ShipmentTransitionTests(TestCase):
+    """Status changes follow Shipment.STATUS_TRANSITIONS and never overwrite a newer version"""
+
+    def test_allowed_transition_bumps_version(self):
+        shipment = make_shipment(1)
+        moved = transitions.transition(shipment.pk, 'out_for_delivery', notify=False)
+        self.assertEqual((moved.status, moved.version), ('out_for_delivery', shipment.version + 1))
+        shipment.refresh_from_db()
+        self.assertEqual((shipment.status, shipment.version), ('out_for_delivery', moved.version))
+
+    def test_transition_takes_no_row_locks(self):
+        shipment = make_shipment(1)
+        # As on PostgreSQL, so any select_for_update() on the way would show up in the SQL
+        with mock.patch.object(connection.features, 'has_select_for_update', True), \
+                self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            transitions.transition(shipment.pk, 'out_for_delivery', notify=False)
+        self.assertFalse([query['sql'] for query in queries if 'FOR UPDATE' in query['sql']])
+        # The rollup bucket moved after commit, from the row the UPDATE replaced
+        counted = sorted(ShipmentDailyRollup.objects.filter(count__gt=0).values_list('status', 'count'))
+        self.assertEqual(counted, [('out_for_delivery', 1)])
+
+    def test_same_status_is_a_no_op(self):
+        shipment = make_shipment(1)
+        self.assertIsNone(transitions.transition(shipment.pk, 'in_transit'))
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.version, make_shipment(2).version)
+
+    def test_forbidden_transition_is_refused(self):
+        shipment = make_shipment(1, status='delivered')
+        with self.assertRaises(InvalidTransition):
+            transitions.transition(shipment.pk, 'in_transit')
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.status, 'delivered')
+        self.assertIsNotNone(transitions.transition(shipment.pk, 'in_transit', force=True, notify=False))
+
+    def test_delivery_records_the_delivery_date(self):
+        shipment = make_shipment(1)
+        moved = transitions.transition(shipment.pk, 'delivered', notify=False)
+        self.assertIsNotNone(moved.actual_delivery_date)
+
+    def test_save_from_a_stale_copy_is_refused(self):
+        shipment = make_shipment(1)
+        stale = Shipment.objects.get(pk=shipment.pk)
+        transitions.transition(shipment.pk, 'out_for_delivery', notify=False)
+        stale.status = 'on_hold'
+        # A DatabaseError, so it breaks the transaction it is raised in
+        with self.assertRaises(StaleShipment), transaction.atomic():
+            stale.save()
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.status, 'out_for_delivery')
+
+    def test_save_of_a_forbidden_status_is_refused(self):
+        shipment = Shipment.objects.get(pk=make_shipment(1, status='cancelled').pk)
+        shipment.status = 'in_transit'
+        with self.assertRaises(InvalidTransition):
+            shipment.save()
+
+    def test_bulk_transition_leaves_rows_that_cannot_move(self):
+        moving = make_shipment(1)
+        cancelled = make_shipment(2, status='cancelled')
+        delivered = make_shipment(3, status='delivered')
+        moved, skipped = transitions.bulk_transition(Shipment.objects.all(), 'delivered')
+        self.assertEqual((moved, skipped), (1, 2))
+        moving.refresh_from_db()
+        cancelled.refresh_from_db()
+        delivered.refresh_from_db()
+        self.assertEqual((moving.status, cancelled.status), ('delivered', 'cancelled'))
+        self.assertIsNotNone(moving.actual_delivery_date)
+        # Only the shipments that moved get a delivery date
+        self.assertIsNone(cancelled.actual_delivery_date)
+        self.assertEqual(delivered.version, make_shipment(4).version)
+
+    def test_admin_mark_as_delivered_skips_cancelled_shipments(self):
+        User.objects.create_superuser('staff', 'staff@example.com', STAFF_PASSWORD)
+        self.client.login(username='staff', password=STAFF_PASSWORD)
+        moving, cancelled = make_shipment(1), make_shipment(2, status='cancelled')
+        self.client.post(reverse('admin:SwiftLogix_shipment_changelist'), {
+            'action': 'mark_as_delivered', '_selected_action': [moving.pk, cancelled.pk],
+        })
+        moving.refresh_from_db()
+        cancelled.refresh_from_db()
+        self.assertEqual(moving.status, 'delivered')
+        self.assertIsNotNone(moving.actual_delivery_date)
+        self.assertEqual(cancelled.status, 'cancelled')
+        self.assertIsNone(cancelled.actual_delivery_date)
+
+    def admin_form(self, shipment, **changes):
+        data = {
+            field.name: field.value_from_object(shipment)
+            for field in Shipment._meta.concrete_fields if field.editable and not field.primary_key
+        }
+        data['user'] = shipment.user_id or ''
+        data.update(changes)
+        return ShipmentAdminForm(data, instance=shipment)
+
+    def test_admin_form_saves_from_the_current_version(self):
+        shipment = Shipment.objects.get(pk=make_shipment(1).pk)
+        form = self.admin_form(shipment, status='out_for_delivery', loaded_version=shipment.version)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_admin_form_refuses_an_outdated_version(self):
+        shipment = make_shipment(1)
+        loaded_version = shipment.version
+        transitions.transition(shipment.pk, 'out_for_delivery', notify=False)
+        current = Shipment.objects.get(pk=shipment.pk)
+        form = self.admin_form(current, status='on_hold', loaded_version=loaded_version)
+        self.assertFalse(form.is_valid())
+        self.assertIn('was updated while you were editing it', str(form.non_field_errors()))
+
+
+def make_quote(n, **fields):
+    defaults = dict(
+        name=f'Quote {n}', email=f'quote{n}@example.com', mobile='1', freight_type='sea',
+        origin='Accra', destination='Rotterdam',
+    )
+    defaults.update(fields)
+    return QuoteRequest.objects.create(**defaults)
+
+
+def rollup_counts(rollup_model):
+    return sorted(
+        (row.day, row.freight_type, row.status, row.count)
+        for row in rollup_model.objects.filter(count__gt=0)
+    )
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', NOTIFICATION_WINDOW_SECONDS=300)
+class NotificationTests(TestCase):
+    """Status events are coalesced per recipient and mailed once the window closes"""
+
+    def setUp(self):
+        self.shipment = make_shipment(1)
+        notifications.record(self.shipment, 'in_transit', location='Accra')
+        notifications.record(self.shipment, 'in_transit', location='Lagos')
+        notifications.record(self.shipment, 'out_for_delivery', location='London')
+
+    def age(self, seconds=301):
+        Notification.objects.update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_events_wait_for_the_window(self):
+        self.assertEqual(notifications.flush(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(notifications.flush(window=timedelta(0)), (2, 6))
+
+    def test_one_digest_per_recipient(self):
+        self.age()
+        self.assertEqual(notifications.flush(), (2, 6))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['receiver1@example.com', 'sender1@example.com'])
+        body = mail.outbox[0].body
+        # Repeats of a status are coalesced to the latest one
+        self.assertEqual(body.count('In Transit'), 1)
+        self.assertIn('at Lagos', body)
+        self.assertNotIn('at Accra', body)
+        self.assertIn('Out for Delivery at London', body)
+
+    def test_no_resend_after_flush(self):
+        self.age()
+        notifications.flush()
+        self.assertEqual(notifications.flush(window=timedelta(0)), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+
+    def test_unsent_digest_stays_pending(self):
+        self.age()
+        # The backend drops the second digest, as it does under fail_silently
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=[1, 0]):
+            self.assertEqual(notifications.flush(), (1, 3))
+        self.assertEqual(Notification.objects.filter(sent_at__isnull=True).values('recipient').distinct().count(), 1)
+
+    def test_command_no_wait_sends_now(self):
+        call_command('send_notifications', no_wait=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class WebhookReceiver(http.server.ThreadingHTTPServer):
+    """A local endpoint that records what it receives and answers with `status` after `delay` seconds"""
+
+    daemon_threads = True
+
+    def __init__(self, status=200, delay=0):
+        self.status, self.delay = status, delay
+        self.requests, self.in_flight, self.most_in_flight = [], 0, 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), WebhookHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.most_in_flight = max(server.most_in_flight, server.in_flight)
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+            server.requests.append({'headers': self.headers, 'body': body, 'client_port': self.client_address[1]})
+        self.send_response(server.status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_MAX_ATTEMPTS=3)
+class WebhookDeliveryTests(TestCase):
+    """Deliveries are signed, share keep-alive connections and back off until they give up"""
+
+    def setUp(self):
+        self.receiver = WebhookReceiver()
+        self.addCleanup(self.receiver.stop)
+        self.pool = webhooks.ConnectionPool(timeout=5)
+        self.addCleanup(self.pool.close)
+        owner = User.objects.create_user('hooked')
+        self.endpoint = WebhookEndpoint.objects.create(profile=owner.profile, url=self.receiver.url, batch_size=2)
+        self.shipment = make_shipment(1, user=owner)
+        for status in ('picked_up', 'in_transit', 'out_for_delivery'):
+            webhooks.emit(self.shipment, webhooks.shipment_event(self.shipment, status))
+
+    def deliver(self):
+        return webhooks.deliver_batch(self.pool, self.endpoint, webhooks.claim(self.endpoint, self.endpoint.batch_size))
+
+    def test_signed_batches_reuse_the_connection(self):
+        self.assertTrue(self.deliver())
+        self.assertTrue(self.deliver())
+        self.assertFalse(WebhookDelivery.objects.exclude(status='delivered').exists())
+
+        first, second = self.receiver.requests
+        self.assertEqual(first['client_port'], second['client_port'])
+        self.assertEqual([len(json.loads(request['body'])['events']) for request in (first, second)], [2, 1])
+        for request in (first, second):
+            headers = request['headers']
+            expected = hmac.new(
+                self.endpoint.secret.encode(),
+                headers[webhooks.TIMESTAMP_HEADER].encode() + b'.' + request['body'], hashlib.sha256,
+            ).hexdigest()
+            self.assertEqual(headers[webhooks.SIGNATURE_HEADER], f'sha256={expected}')
+
+    def test_server_errors_back_off_then_fail(self):
+        self.receiver.status = 503
+        self.endpoint.batch_size = 3
+        deliveries = WebhookDelivery.objects.filter(endpoint=self.endpoint)
+        for attempt in (1, 2):
+            started = timezone.now()
+            with self.assertLogs(webhooks.logger, 'WARNING'):
+                self.assertFalse(self.deliver())
+            self.assertEqual(
+                set(deliveries.values_list('status', 'attempts', 'response_status')), {('pending', attempt, 503)},
+            )
+            self.assertFalse(deliveries.filter(next_attempt_at__lte=started).exists())
+            self.assertTrue(all(error.startswith('HTTP 503') for error in deliveries.values_list('last_error', flat=True)))
+            # Nothing is due again until the backoff has passed
+            self.assertEqual(webhooks.claim(self.endpoint, 3), [])
+            deliveries.update(next_attempt_at=timezone.now())
+        with self.assertLogs(webhooks.logger, 'WARNING'):
+            self.assertFalse(self.deliver())
+        self.assertEqual(set(deliveries.values_list('status', 'attempts')), {('failed', 3)})
+        self.assertEqual(len(self.receiver.requests), 3)
+        self.assertEqual(webhooks.claim(self.endpoint, 3), [])
+
+    def test_only_http_urls(self):
+        WebhookEndpoint(profile=self.endpoint.profile, url='https://example.com/hook').full_clean()
+        for url in ('ftp://example.com/hook', 'file:///etc/passwd'):
+            with self.assertRaises(ValidationError):
+                WebhookEndpoint(profile=self.endpoint.profile, url=url).full_clean()
+        with self.assertRaises(ValueError):
+            self.pool.post('ftp://example.com/hook', b'{}', {})
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    FLEET_MAX_TILES=64,
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'fleet-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class FleetMapTests(TestCase):
+    """Fleet tiles cluster moving shipments by geohash cell and the bbox API refuses oversized boxes"""
+
+    def test_geohash(self):
+        self.assertEqual(geo.geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(make_shipment(1).geohash, geo.geohash(20.01, -0.5))
+
+    def test_tile_ranges(self):
+        self.assertEqual(geo.tiles_covering(-10, -10, 10, 10, 1), [(1, 0, 0), (1, 0, 1), (1, 1, 0), (1, 1, 1)])
+        # Across the antimeridian: the eastern and western edge columns only
+        self.assertEqual(geo.tiles_covering(170, 1, -170, 10, 2), [(2, 3, 1), (2, 0, 1)])
+        self.assertEqual(geo.tile_count(geo.tile_ranges(-180, -89, 180, 89, 20)), 4 ** 20)
+        for bbox in ((0, 10, 10, 0), (float('nan'), 0, 10, 10)):
+            with self.assertRaises(ValueError):
+                geo.tile_ranges(*bbox, 3)
+
+    def test_tile_clusters_at_low_zoom_and_lists_when_zoomed_in(self):
+        for n in range(3):
+            make_shipment(n)
+        make_shipment(3, status='delivered')
+        z = 4
+        x, y = geo.tiles_covering(-0.5, 20.01, -0.5, 20.01, z)[0][1:]
+        tile = geo.fleet_tile(z, x, y)
+        self.assertEqual(([cell['count'] for cell in tile['clusters']], tile['shipments']), ([3], []))
+
+        z = 16
+        x, y = geo.tiles_covering(-0.5, 20.01, -0.5, 20.01, z)[0][1:]
+        tile = geo.fleet_tile(z, x, y, detail_zoom=13)
+        self.assertEqual([shipment['tracking_number'] for shipment in tile['shipments']], ['QB0000000001'])
+
+    def test_api_validates_the_box(self):
+        User.objects.create_superuser('staff', 'staff@example.com', STAFF_PASSWORD)
+        self.client.login(username='staff', password=STAFF_PASSWORD)
+        make_shipment(1)
+        url = reverse('fleet_api')
+        for query in ({'bbox': '1,2,3', 'zoom': 3}, {'bbox': 'nan,0,1,1', 'zoom': 3},
+                      {'bbox': '0,10,10,0', 'zoom': 3}, {'bbox': '-180,-85,180,85', 'zoom': 20}):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(url, query).status_code, 400)
+        response = self.client.get(url, {'bbox': '-10,10,10,30', 'zoom': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(cell['count'] for cell in response.json()['clusters']), 1)
+
+
+class GazetteerTests(TestCase):
+    """Free-text places resolve offline, forgiving case, accents, aliases and small misspellings"""
+
+    ACCRA = (5.5560, -0.1969)
+    LONDON = (51.5074, -0.1278)
+
+    def test_resolve(self):
+        cases = [
+            (('Accra', 'Ghana'), self.ACCRA),
+            (('  ACCRA. ', 'ghana'), self.ACCRA),
+            (('Sekondi', 'GH'), (4.8845, -1.7554)),
+            (('London', 'UK'), self.LONDON),
+            (('Manchestr', 'England'), (53.4808, -2.2426)),
+            (('Kumasi', ''), (6.6885, -1.6244)),
+            (('Atlantis', 'Ghana'), None),
+            (('', 'Ghana'), None),
+        ]
+        for (city, country), expected in cases:
+            with self.subTest(city=city, country=country):
+                self.assertEqual(gazetteer.resolve(city, country), expected)
+
+    def test_save_resolves_only_places_that_changed(self):
+        shipment = make_shipment(1)
+        self.assertEqual((shipment.sender_latitude, shipment.sender_longitude), self.ACCRA)
+        self.assertEqual((shipment.receiver_latitude, shipment.receiver_longitude), self.LONDON)
+
+        shipment = Shipment.objects.get(pk=shipment.pk)
+        shipment.receiver_city = 'Lagos'
+        shipment.receiver_country = 'Nigeria'
+        with mock.patch.object(gazetteer, 'resolve', wraps=gazetteer.resolve) as resolve:
+            shipment.save()
+        resolve.assert_called_once_with('Lagos', 'Nigeria')
+        shipment.refresh_from_db()
+        self.assertEqual((shipment.receiver_latitude, shipment.receiver_longitude), (6.5244, 3.3792))
+
+
+class RouteProgressTests(TestCase):
+    """Route progress is the share of the great-circle route already covered"""
+
+    # Accra -> London, with current positions at the start, part way, past the end and on a too-short route
+    ROWS = [
+        (5.6037, -0.1870, 51.5072, -0.1276, 5.6037, -0.1870),
+        (5.6037, -0.1870, 51.5072, -0.1276, 30.0, -0.15),
+        (5.6037, -0.1870, 51.5072, -0.1276, 51.5072, -0.1276),
+        (51.5072, -0.1276, 51.5073, -0.1276, 51.5072, -0.1276),
+    ]
+
+    def test_numpy_and_fallback_agree(self):
+        metrics = geo.route_metrics(self.ROWS)
+        with mock.patch.object(geo, 'np', None):
+            self.assertEqual(geo.route_metrics(self.ROWS), metrics)
+        self.assertEqual([progress for progress, _ in metrics], [0, 53, 100, None])
+        self.assertEqual(metrics[0][1], round(geo.haversine_km(*self.ROWS[0][:4]), 1))
+
+    def test_refresh_writes_active_shipments(self):
+        moving = make_shipment(1, sender_latitude=5.6037, sender_longitude=-0.1870,
+                               receiver_latitude=51.5072, receiver_longitude=-0.1276,
+                               current_latitude=30.0, current_longitude=-0.15)
+        make_shipment(2, status='delivered', sender_latitude=5.6, sender_longitude=-0.18,
+                      receiver_latitude=51.5, receiver_longitude=-0.12)
+        self.assertEqual(geo.refresh_progress(chunk_size=1), 1)
+        moving.refresh_from_db()
+        self.assertEqual((moving.route_progress, moving.remaining_distance_km), tuple(geo.route_metrics([self.ROWS[1]])[0]))
+
+
+class LabelTests(TestCase):
+    """A batch is one page per shipment in order, and a failed batch leaves no file behind"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(LABELS_DIR=self.directory))
+        self.shipments = [make_shipment(n) for n in range(3)]
+
+    def pages(self, name):
+        pdf = (self.directory / f'{name}.pdf').read_bytes()
+        streams = re.findall(rb'/FlateDecode >>\nstream\n(.*?)\nendstream', pdf, re.S)
+        return pdf.count(b'/Type /Page '), [zlib.decompress(stream) for stream in streams]
+
+    def assertBatch(self, summary):
+        self.assertEqual(summary['labels'], 3)
+        count, streams = self.pages(summary['name'])
+        self.assertEqual((count, len(streams)), (3, 3))
+        for shipment, stream in zip(self.shipments, streams):
+            self.assertIn(shipment.tracking_number.encode(), stream)
+        self.assertEqual(labels.list_batches(), [summary])
+
+    def test_batch_in_process(self):
+        self.assertBatch(labels.print_batch(Shipment.objects.all(), 'http://testserver/track/', workers=1))
+
+    def test_batch_in_pool_keeps_order(self):
+        self.assertBatch(labels.print_batch(Shipment.objects.all(), 'http://testserver/track/', workers=2, chunk_size=1))
+
+    def test_failed_batch_is_removed(self):
+        pages = iter([[b'x'], labels.LabelError('drawing failed')])
+
+        def render_pages(chunk, track_url):
+            result = next(pages)
+            if isinstance(result, Exception):
+                raise result
+            return [zlib.compress(page) for page in result]
+
+        with mock.patch.object(labels, 'render_pages', render_pages), self.assertRaises(labels.LabelError):
+            labels.print_batch(Shipment.objects.all(), 'http://testserver/track/', name='broken', workers=1, chunk_size=1)
+        self.assertEqual(list(self.directory.iterdir()), [])
+        self.assertIsNone(labels.batch_path('broken'))
+
+
+@override_settings(JOB_BACKOFF_BASE=10, JOB_BACKOFF_MAX=3600)
+class JobQueueTests(TestCase):
+    """Jobs are claimed once, retried with backoff and dead-lettered when they run out of attempts"""
+
+    def setUp(self):
+        self.failures = 0
+
+        def flaky(fail_times):
+            if self.failures < fail_times:
+                self.failures += 1
+                raise RuntimeError('flaky')
+
+        self.flaky = jobs.task(name='tests.flaky', queue='tests', max_attempts=3)(flaky)
+        self.addCleanup(jobs.registry.pop, 'tests.flaky')
+
+    def test_failures_back_off_then_dead_letter(self):
+        job = self.flaky.delay(fail_times=10)
+        for attempt, base in ((1, 10), (2, 20)):
+            started = timezone.now()
+            with self.assertLogs(jobs.logger, 'WARNING'):
+                self.assertFalse(jobs.run(jobs.claim('worker', queues=['tests'])[0]))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', attempt))
+            self.assertIn('RuntimeError: flaky', job.last_error)
+            wait = (job.run_at - started).total_seconds()
+            self.assertTrue(base * 0.8 - 1 <= wait <= base * 1.2 + 1, wait)
+            # Not due again until the backoff has passed
+            self.assertEqual(jobs.claim('worker', queues=['tests']), [])
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            self.assertFalse(jobs.run(jobs.claim('worker', queues=['tests'])[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 3))
+        self.assertIsNotNone(job.finished_at)
+
+        jobs.retry(Job.objects.filter(pk=job.pk))
+        self.failures = 10
+        self.assertTrue(jobs.run(jobs.claim('worker', queues=['tests'])[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+    def test_unknown_task_is_dead_at_once(self):
+        job = Job.objects.create(task='tests.missing', queue='tests', payload={})
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            self.assertFalse(jobs.run(jobs.claim('worker', queues=['tests'])[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 1))
+
+    def test_claim_takes_each_due_job_once(self):
+        due = [self.flaky.delay(fail_times=0) for _ in range(3)]
+        self.flaky.delay(run_at=timezone.now() + timedelta(hours=1), fail_times=0)
+        first = jobs.claim('one', limit=2, queues=['tests'])
+        second = jobs.claim('two', limit=2, queues=['tests'])
+        self.assertEqual(sorted(job.pk for job in first + second), [job.pk for job in due])
+        self.assertEqual(jobs.claim('three', limit=2, queues=['tests']), [])
+        self.assertEqual(jobs.claim('other', limit=2, queues=['mail']), [])
+        self.assertEqual(Job.objects.get(pk=second[0].pk).locked_by, 'two')
+
+    def test_lost_runs_count_as_attempts(self):
+        job = self.flaky.delay(fail_times=0)
+        for attempt in (1, 2):
+            jobs.claim('worker', queues=['tests'])
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(jobs.requeue_stale(lease_seconds=60), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', attempt, ''))
+        jobs.claim('worker', queues=['tests'])
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            jobs.requeue_stale(lease_seconds=60)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 3))
+
+    @override_settings(JOB_BACKOFF_MAX=60)
+    def test_backoff_is_capped(self):
+        self.assertLessEqual(jobs.backoff(20), 72)
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    METRICS_ENABLED=True,
+    METRICS_SERVER_TIMING=True,
+    METRICS_TOKEN='scrape-token',
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'metrics-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class RequestMetricsTests(TestCase):
+    """Requests are timed per URL name, reported in Server-Timing and summed across workers on /metrics"""
+
+    def series(self, name, labels):
+        return metrics.registry.snapshot().get((name, labels), [0])
+
+    def test_server_timing_and_histograms(self):
+        shipment = make_shipment(1)
+        before = sum(self.series('swiftlogix_request_queries', ('track_api',))[:-1])
+        response = self.client.get(reverse('track_api'), {'tracking_number': shipment.tracking_number})
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=0\.0$')
+        self.assertEqual(sum(self.series('swiftlogix_request_queries', ('track_api',))[:-1]), before + 1)
+        self.assertGreater(sum(self.series('swiftlogix_request_duration_seconds', ('track_api', 'GET', '2xx'))[:-1]), 0)
+
+        response = self.client.get(reverse('home'))
+        self.assertNotRegex(response['Server-Timing'], r'tpl;dur=0\.0$')
+
+    def test_prometheus_buckets_are_cumulative(self):
+        bounds = metrics.HISTOGRAMS['swiftlogix_request_queries'][1]
+        series = [0] * (len(bounds) + 2)
+        series[0], series[3], series[-2], series[-1] = 1, 2, 1, 1003
+        text = metrics.render_prometheus({('swiftlogix_request_queries', ('home',)): series})
+        self.assertIn('swiftlogix_request_queries_bucket{view="home",le="0"} 1', text)
+        self.assertIn('swiftlogix_request_queries_bucket{view="home",le="5"} 3', text)
+        self.assertIn('swiftlogix_request_queries_bucket{view="home",le="+Inf"} 4', text)
+        self.assertIn('swiftlogix_request_queries_count{view="home"} 4', text)
+        self.assertIn('swiftlogix_request_queries_sum{view="home"} 1003.000000', text)
+
+    def test_metrics_sums_workers_and_needs_the_token(self):
+        other = [0] * (len(metrics.HISTOGRAMS['swiftlogix_request_queries'][1]) + 2)
+        other[0], other[-1] = 5, 0
+        caches['shared'].set(metrics.WORKER_KEY_PREFIX + 'other:1', {('swiftlogix_request_queries', ('elsewhere',)): other})
+        caches['shared'].set(metrics.WORKERS_KEY, ['other:1'])
+        self.assertEqual(metrics.registry.collect()[('swiftlogix_request_queries', ('elsewhere',))][0], 5)
+
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('swiftlogix_request_queries_count{view="elsewhere"} 5', response.content.decode())
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PROFILER_SAMPLE_RATE=0.0,
+    PROFILER_SLOW_MS=0,
+    PROFILER_MAX_CAPTURES=2,
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'profiling-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class ProfilingTests(TestCase):
+    """Sampled and slow requests are captured without parameter values, and old captures rotate out"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(PROFILER_DIR=self.directory))
+        self.shipment = make_shipment(1)
+
+    def track(self):
+        return self.client.get(reverse('track_api'), {'tracking_number': self.shipment.tracking_number})
+
+    def test_off_by_default(self):
+        self.track()
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    @override_settings(PROFILER_SAMPLE_RATE=1.0)
+    def test_sampled_request_is_profiled_without_parameters(self):
+        self.track()
+        [capture] = profiling.list_captures()
+        self.assertEqual((capture['reason'], capture['view'], capture['profiled']), ('sampled', 'track_api', True))
+        queries = profiling.load_capture(capture['name'])['queries']
+        self.assertTrue(queries)
+        self.assertFalse([query for query in queries if self.shipment.tracking_number in query['sql']])
+        self.assertIn('function calls', profiling.hot_functions([capture['name']]))
+
+    @override_settings(PROFILER_SLOW_MS=0.001)
+    def test_slow_requests_keep_their_sql_and_rotate(self):
+        for _ in range(3):
+            self.track()
+        captures = profiling.list_captures()
+        self.assertEqual([capture['reason'] for capture in captures], ['slow', 'slow'])
+        self.assertFalse(any(capture['profiled'] for capture in captures))
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+        self.assertIsNone(profiling.load_capture('../settings'))
+        self.assertEqual(profiling.clear_captures(), 2)
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'history-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class HistoryTests(TestCase):
+    """History pages walk a user's rows newest first by (created_at, id), with validated filters"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('historian', password='history-pw')
+        self.shipments = [make_shipment(n, user=self.user) for n in range(5)]
+        make_shipment(9, user=User.objects.create_user('someone-else'))
+        # Ties on created_at are broken by id
+        self.created = timezone.make_aware(datetime(2025, 3, 10, 12, 0))
+        Shipment.objects.update(created_at=self.created)
+        self.client.login(username='historian', password='history-pw')
+
+    def get(self, **params):
+        return self.client.get(reverse('shipment_history'), params)
+
+    def test_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        for expected_more in (True, True, False):
+            data = history.page(history.SHIPMENTS, self.user, {'limit': '2', 'cursor': cursor or ''})
+            self.assertEqual(data['has_more'], expected_more)
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, sorted((shipment.pk for shipment in self.shipments), reverse=True))
+
+    def test_cursor_round_trip_and_garbage(self):
+        cursor = history.encode_cursor(self.created, 42)
+        self.assertEqual(history.decode_cursor(cursor), (self.created, 42))
+        encode = lambda raw: base64.urlsafe_b64encode(raw.encode()).decode()
+        for garbage in ('!!!', encode('[1]'), encode('["not a date", 1]'), encode('["2025-03-10T12:00:00", "x"]'), encode('{}')):
+            with self.subTest(cursor=garbage), self.assertRaises(history.HistoryError):
+                history.decode_cursor(garbage)
+
+    def test_api_filters_and_sparse_fields(self):
+        data = self.get(fields='tracking_number', created_after='2025-03-10', created_before='2025-03-10').json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(set(data['results'][0]), {'tracking_number'})
+        self.assertEqual(self.get(created_after='2025-03-11').json()['results'], [])
+        self.assertEqual(self.get(status='delivered').json()['results'], [])
+
+    def test_api_rejects_bad_parameters(self):
+        for params in ({'created_after': '2024-02-30'}, {'created_before': 'yesterday'}, {'fields': 'password'},
+                       {'status': 'lost'}, {'type': 'rocket'}, {'limit': 'ten'}, {'cursor': 'garbage'}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+class SerializerTests(TestCase):
+    """The tracking body is built from values_list rows, with labels from import-time maps"""
+
+    def setUp(self):
+        self.shipment = make_shipment(1, status='pending', current_latitude=None, current_longitude=None)
+        now = timezone.now()
+        TrackingUpdate.objects.create(shipment=self.shipment, status='pending', location='Accra',
+                                      description='Booked', timestamp=now - timedelta(hours=2))
+        TrackingUpdate.objects.create(shipment=self.shipment, status='in_transit', location='Kotoka',
+                                      description='Departed', timestamp=now - timedelta(hours=1))
+
+    def test_dumps_matches_django_encoder(self):
+        data = {'weight': Decimal('10.50'), 'at': timezone.now(), 'day': timezone.now().date(), 'none': None, 'n': [1, 2.5]}
+        expected = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        self.assertEqual(serializers.dumps(data), expected)
+
+    def test_tracking_updates_are_newest_first_with_labels(self):
+        events, watermark = serializers.tracking_updates(self.shipment.pk)
+        self.assertEqual([event['status_code'] for event in events], ['in_transit', 'pending'])
+        self.assertEqual(events[0]['status'], serializers.STATUS_LABELS['in_transit'])
+        self.assertEqual(set(events[0]), {'status', 'status_code', 'location', 'description', 'timestamp'})
+        newest = TrackingUpdate.objects.order_by('-created_at', '-id').values_list('created_at', 'id').first()
+        self.assertEqual(watermark, newest)
+
+    def test_payload(self):
+        with self.assertNumQueries(3):
+            payload = serializers.tracking_payload(self.shipment.tracking_number.lower())
+        self.assertTrue(payload['full'])
+        data = payload['shipment']
+        self.assertEqual((data['status'], data['status_code']), (serializers.STATUS_LABELS['pending'], 'pending'))
+        self.assertEqual(data['weight'], '10.00')
+        # No live position: a pending parcel sits at the sender
+        self.assertIsNotNone(data['sender_lat'])
+        self.assertEqual((data['current_lat'], data['current_lng']), (data['sender_lat'], data['sender_lng']))
+        self.assertEqual(len(payload['tracking_updates']), 2)
+        self.assertIsNone(serializers.tracking_payload('QB9999999999'))
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'delta-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class DeltaSyncTests(TestCase):
+    """Polling with ``since`` returns only events recorded after the cursor and the shipment only if it changed"""
+
+    def setUp(self):
+        self.shipment = make_shipment(1)
+        self.first = self.add_event('Accra', timestamp=timezone.now() - timedelta(hours=3))
+
+    def add_event(self, location, timestamp=None):
+        return TrackingUpdate.objects.create(shipment=self.shipment, status='in_transit', location=location,
+                                             description='Scanned', timestamp=timestamp or timezone.now())
+
+    def poll(self, since=None):
+        params = {'tracking_number': self.shipment.tracking_number}
+        if since:
+            params['since'] = since
+        return self.client.get(reverse('track_api'), params)
+
+    def locations(self, data):
+        return [event['location'] for event in data['tracking_updates']]
+
+    def test_unchanged_poll_is_empty_and_keeps_the_watermark(self):
+        first = self.poll().json()
+        self.assertTrue(first['full'])
+        self.assertEqual(self.locations(first), ['Accra'])
+        again = self.poll(first['cursor']).json()
+        self.assertFalse(again['full'])
+        self.assertNotIn('shipment', again)
+        self.assertEqual(again['tracking_updates'], [])
+        self.assertEqual(again['cursor'], first['cursor'])
+
+    def test_only_new_events_including_late_scans(self):
+        cursor = self.poll().json()['cursor']
+        self.add_event('Kotoka')
+        # Arrives after the cursor but was scanned before the first event
+        self.add_event('Tema', timestamp=timezone.now() - timedelta(days=1))
+        data = self.poll(cursor).json()
+        self.assertEqual(self.locations(data), ['Kotoka', 'Tema'])
+        self.assertNotIn('shipment', data)
+        self.assertEqual(self.poll(data['cursor']).json()['tracking_updates'], [])
+
+    def test_shipment_block_only_when_it_changed(self):
+        cursor = self.poll().json()['cursor']
+        Shipment.objects.filter(pk=self.shipment.pk).update(status='out_for_delivery')
+        data = self.poll(cursor).json()
+        self.assertEqual(data['shipment']['status_code'], 'out_for_delivery')
+        self.assertNotIn('shipment', self.poll(data['cursor']).json())
+
+    def test_cursor_for_another_shipment_gets_the_full_body(self):
+        other = make_shipment(2)
+        cursor = serializers.encode_sync_cursor(other.pk, (timezone.now(), 10**6), 'digest')
+        data = self.poll(cursor).json()
+        self.assertTrue(data['full'])
+        self.assertEqual(self.locations(data), ['Accra'])
+
+    def test_malformed_cursor_is_a_400(self):
+        for cursor in ('not-base64!', base64.urlsafe_b64encode(b'[1, 2]').decode()):
+            with self.subTest(cursor=cursor):
+                response = self.poll(cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    OFFLINE_TRACKING_ENTRIES=7,
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'offline-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class OfflineTests(TestCase):
+    """The service worker is served from the root with its config baked in; the manifest points at tracking"""
+
+    def worker_config(self):
+        response = self.client.get(reverse('service_worker'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/javascript'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        return json.loads(re.search(r'^const CONFIG = (.*);$', response.content.decode(), re.MULTILINE).group(1))
+
+    def test_service_worker(self):
+        self.assertEqual(reverse('service_worker'), '/sw.js')
+        config = self.worker_config()
+        self.assertEqual(config['shell'][0], reverse('track'))
+        self.assertEqual(config['trackApi'], reverse('track_api'))
+        self.assertEqual(config['trackingEntries'], 7)
+        self.assertTrue(re.search(config['hashedName'], 'css/style.3f2a9c1b7e4d.css'))
+        self.assertFalse(re.search(config['hashedName'], 'css/style.css'))
+
+    def test_cache_version_follows_the_setting(self):
+        version = self.worker_config()['version']
+        self.assertEqual(self.worker_config()['version'], version)
+        with self.settings(OFFLINE_CACHE_VERSION='bumped'):
+            self.assertNotEqual(self.worker_config()['version'], version)
+
+    def test_manifest_and_registration(self):
+        response = self.client.get(reverse('web_manifest'))
+        self.assertEqual(response['Content-Type'], 'application/manifest+json')
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        manifest = response.json()
+        self.assertEqual((manifest['start_url'], manifest['scope']), (reverse('track'), '/'))
+        self.assertTrue(manifest['icons'])
+        page = self.client.get(reverse('track'))
+        self.assertContains(page, f'rel="manifest" href="{reverse("web_manifest")}"')
+        self.assertContains(page, reverse('service_worker'))
+
+
+@override_settings(HTML_MINIFY=True, COMPRESSION_MIN_BYTES=256, COMPRESSION_EXCLUDE_VIEWS=['secret_page'])
+class CompressionTests(SimpleTestCase):
+    """Dynamic HTML is minified and compressed unless it carries a secret BREACH could recover"""
+
+    PAGE = '<html>\n  <body>\n' + '    <p>Shipment   on   its   way</p>\n' * 40 + '  </body>\n</html>\n'
+
+    def setUp(self):
+        # gzip is always there; Brotli depends on an optional package
+        patcher = mock.patch.object(compression, 'brotli', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, response, url_name='page', accept='br, gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        request.resolver_match = mock.Mock(url_name=url_name)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    def test_minify_collapses_whitespace_and_drops_comments(self):
+        html = '<div>\n    <span>a</span>   <span>b</span>  <!-- note -->\n</div><!--[if IE]><p>old</p><![endif]-->'
+        self.assertEqual(compression.minify_html(html), '<div>\n<span>a</span> <span>b</span>\n</div><!--[if IE]><p>old</p><![endif]-->')
+
+    def test_minify_preserves_pre_textarea_script_and_style(self):
+        blocks = (
+            '<pre>  keep\n    this  </pre>',
+            '<TEXTAREA name="m">  two  spaces\n\n</TEXTAREA>',
+            '<script>\n  if (a  <  b) {}  // <!-- not a comment -->\n</script>',
+            '<style>\n  p  { margin: 0 }\n</style>',
+        )
+        for block in blocks:
+            with self.subTest(block=block):
+                self.assertEqual(compression.minify_html('<p>  x  </p>\n   ' + block + '   \n  <p>y</p>'),
+                                 '<p> x </p>\n' + block + '\n<p>y</p>')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(compression.accepted_encodings('gzip, deflate, br'), ['gzip', 'deflate', 'br'])
+        self.assertEqual(compression.accepted_encodings('gzip;q=0.5, BR;q=1.0, identity;q=0, *;q=0.1'), ['br', 'gzip', '*'])
+        self.assertEqual(compression.accepted_encodings('gzip;q=1.2.3, deflate'), ['deflate'])
+        self.assertEqual(compression.accepted_encodings(''), [])
+        self.assertEqual(compression.choose_encoding('br;q=1, *;q=0.5'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('br, deflate'))
+
+    def test_html_is_minified_then_gzipped(self):
+        response = self.respond(HttpResponse(self.PAGE, headers={'ETag': '"v1"'}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content).decode(), compression.minify_html(self.PAGE))
+
+    def test_no_compression_without_an_accepted_encoding_or_below_the_threshold(self):
+        response = self.respond(HttpResponse(self.PAGE), accept='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(self.respond(HttpResponse('<p>small</p>')).has_header('Content-Encoding'))
+        self.assertFalse(self.respond(HttpResponse(b'\x89PNG' * 200, content_type='image/png')).has_header('Content-Encoding'))
+
+    def test_breach_exposed_responses_are_not_compressed(self):
+        with_token = HttpResponse(self.PAGE.replace('<body>', '<body><input type="hidden" name="csrfmiddlewaretoken" value="t">'))
+        with_cookie = HttpResponse(self.PAGE)
+        with_cookie.set_cookie(settings.CSRF_COOKIE_NAME, 'token')
+        for response, url_name in ((with_token, 'page'), (with_cookie, 'page'), (HttpResponse(self.PAGE), 'secret_page')):
+            with self.subTest(url_name=url_name):
+                response = self.respond(response, url_name=url_name)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                # Still minified, and caches still key on the encoding
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertNotIn(b'   ', response.content)
+
+    def test_streaming_responses_are_compressed_chunk_by_chunk(self):
+        chunks = [b'{"row": %d}\n' % n for n in range(100)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b''.join(chunks))
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'SwiftLogix.cache.TieredCache', 'LOCATION': 'shared', 'OPTIONS': {'L1_TIMEOUT': 5}},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-shared'},
+    },
+    CACHE_METRICS_ALIAS='shared',
+)
+class CacheTests(TestCase):
+    """The L1 copy is bounded in size and age, and a value is computed once however many ask for it"""
+
+    def setUp(self):
+        caches['default'].clear()
+        cache.metrics.reset()
+
+    def test_lru_evicts_oldest_and_expires(self):
+        lru = cache.LRUCache(max_entries=2, ttl=10)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b', None), lru.get('c')), (1, None, 3))
+        with mock.patch.object(cache.time, 'monotonic', return_value=time.monotonic() + 11):
+            self.assertIsNone(lru.get('a', None))
+
+    def test_l1_serves_a_replaced_value_for_at_most_l1_timeout(self):
+        tiered = caches['default']
+        tiered.set('key', 'old')
+        # Another worker replaces the value in the shared cache
+        caches['shared'].set('key', 'new')
+        self.assertEqual(tiered.get('key'), 'old')
+        with mock.patch.object(cache.time, 'monotonic', return_value=time.monotonic() + 6):
+            self.assertEqual(tiered.get('key'), 'new')
+        counts = cache.metrics.snapshot()
+        self.assertEqual((counts['l1_hits'], counts['l2_hits']), (1, 1))
+
+    def test_concurrent_cold_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        start = threading.Barrier(8)
+        results = []
+
+        def read():
+            start.wait()
+            results.append(cache.get_or_compute('report', compute, 60))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((len(calls), results), (1, ['value'] * 8))
+
+    def test_stale_value_served_while_another_worker_recomputes(self):
+        cache.get_or_compute('report', lambda: 'old', 60)
+        caches['default'].add('swiftlogix.lock:report', 1, timeout=30)
+        with mock.patch.object(cache, '_should_refresh_early', return_value=True):
+            self.assertEqual(cache.get_or_compute('report', lambda: 'new', 60), 'old')
+        self.assertEqual(cache.metrics.snapshot()['stale_served'], 1)
+
+    def test_lock_wait_times_out_without_releasing_the_holders_lock(self):
+        caches['default'].add('swiftlogix.lock:report', 1, timeout=30)
+        self.assertEqual(cache.get_or_compute('report', lambda: 'value', 60, lock_timeout=0.1), 'value')
+        self.assertIsNotNone(caches['default'].get('swiftlogix.lock:report'))
+
+    def test_xfetch_refreshes_early_in_proportion_to_compute_time(self):
+        expires_at = time.time() + 10
+        with mock.patch.object(cache.random, 'random', return_value=0.5):
+            self.assertFalse(cache._should_refresh_early(1, expires_at, 1.0))
+            self.assertTrue(cache._should_refresh_early(20, expires_at, 1.0))
+        with mock.patch.object(cache.random, 'random', return_value=1e-6):
+            self.assertTrue(cache._should_refresh_early(1, expires_at, 1.0))
+
+    def test_bumping_a_namespace_recomputes(self):
+        self.assertEqual(cache.get_or_compute('report', lambda: 1, 60, namespace='reports'), 1)
+        self.assertEqual(cache.get_or_compute('report', lambda: 2, 60, namespace='reports'), 1)
+        cache.bump_namespace('reports')
+        self.assertEqual(cache.get_or_compute('report', lambda: 2, 60, namespace='reports'), 2)
+
+
+class LaneStatTests(TestCase):
+    """Delivered shipments teach their lanes, and later shipments on the lane get an ETA from them"""
+
+    HOURS = (20, 26, 30, 34, 44)
+
+    def deliver(self, n, hours, **fields):
+        pickup = timezone.now() - timedelta(days=10)
+        return make_shipment(n, status='delivered', pickup_date=pickup,
+                             actual_delivery_date=pickup + timedelta(hours=hours), **fields)
+
+    def test_deliveries_build_city_and_country_lanes_once(self):
+        shipments = [self.deliver(n, hours) for n, hours in enumerate(self.HOURS)]
+        self.assertFalse(lanes.record_delivery(shipments[0]))
+
+        city_lane, country_lane = (LaneStat.objects.get(**keys) for keys in lanes.lane_keys(shipments[0]))
+        for lane in (city_lane, country_lane):
+            self.assertEqual(lane.sample_count, 5)
+            self.assertAlmostEqual(lane.mean_hours, sum(self.HOURS) / 5)
+            self.assertEqual(lane.max_hours, 44)
+            # 1 sample in (18, 24], 3 in (24, 36], 1 in (36, 48]: the median sits half way into (24, 36]
+            self.assertAlmostEqual(lane.p50_hours, 30)
+            self.assertLessEqual(lane.p50_hours, lane.p80_hours)
+            self.assertLessEqual(lane.p80_hours, lane.p95_hours)
+        self.assertEqual(city_lane.origin_city, 'accra')
+
+    def test_prediction_needs_enough_samples_and_prefers_the_city_lane(self):
+        for n, hours in enumerate(self.HOURS[:4]):
+            self.deliver(n, hours)
+        moving = make_shipment(10)
+        self.assertEqual(lanes.predict(moving)['predicted_delivery'], None)
+
+        self.deliver(4, self.HOURS[4])
+        # Another city in the same countries only feeds the country lane
+        self.deliver(5, 400, receiver_city='Manchester')
+        prediction = lanes.predict(moving)
+        lane = lanes.lane_for(moving)
+        self.assertEqual((lane.origin_city, prediction['lane_samples']), ('accra', 5))
+        self.assertEqual(prediction['predicted_delivery'], moving.pickup_date + timedelta(hours=lane.p50_hours))
+        self.assertEqual(lanes.predict(self.deliver(11, 30))['predicted_delivery'], None)
+
+
+class RollupTests(TestCase):
+    """Bulk updates move exactly the rows they change between buckets"""
+
+    def test_bulk_update_counts_only_rows_it_changed(self):
+        first, second = make_quote(1), make_quote(2)
+        pending = QuoteRequest.objects.filter(status='pending')
+        rows = list(pending.values_list('pk', 'created_at', *rollups.QUOTE_DIMENSIONS))
+        # A concurrent writer takes the second request after the rows were read
+        with self.captureOnCommitCallbacks(execute=True):
+            rollups.quotes_bulk_update(QuoteRequest.objects.filter(pk=second.pk), status='processing')
+        with mock.patch.object(pending, 'values_list', return_value=rows), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rollups.quotes_bulk_update(pending, status='quoted'), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'quoted')
+        counted = rollup_counts(QuoteDailyRollup)
+        rollups.rebuild()
+        self.assertEqual(counted, rollup_counts(QuoteDailyRollup))
+
+
+@override_settings(SLA_GRACE_HOURS=0, SLA_STALE_DAYS=3, SLA_MAX_REPORTS=90)
+class SlaTests(TestCase):
+    """Overdue and silent shipments are put on hold once and always reported"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = self.settings(SLA_REPORT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.now = timezone.now()
+        self.overdue = make_shipment(1, expected_delivery_date=self.now - timedelta(days=2))
+        self.silent = make_shipment(2)
+        self.on_time = make_shipment(3)
+        make_shipment(4, status='delivered', expected_delivery_date=self.now - timedelta(days=2))
+        # Quiet for a week, except that the on-time one had a scan today
+        Shipment.objects.filter(pk__in=[self.silent.pk, self.on_time.pk]).update(updated_at=self.now - timedelta(days=7))
+        TrackingUpdate.objects.create(shipment=self.on_time, status='in_transit', location='Accra', description='Scanned')
+
+    def detect(self, **kwargs):
+        summary = sla.detect(**kwargs)
+        with open(summary['report'], newline='') as handle:
+            return summary, {row['tracking_number']: row for row in csv.DictReader(handle)}
+
+    def status(self, shipment):
+        return Shipment.objects.values_list('status', flat=True).get(pk=shipment.pk)
+
+    def test_report_only(self):
+        summary, rows = self.detect(hold=False)
+        self.assertEqual((summary['overdue'], summary['silent'], summary['held']), (1, 1, 0))
+        self.assertEqual({number: (row['reason'], row['action']) for number, row in rows.items()}, {
+            self.overdue.tracking_number: ('overdue', 'reported'),
+            self.silent.tracking_number: ('silent', 'reported'),
+        })
+        self.assertEqual(rows[self.overdue.tracking_number]['days_overdue'], '2')
+        self.assertEqual(self.status(self.overdue), 'in_transit')
+        self.assertFalse(TrackingUpdate.objects.filter(location=sla.HOLD_LOCATION).exists())
+
+    def test_hold(self):
+        summary, rows = self.detect(hold=True)
+        self.assertEqual(summary['held'], 2)
+        self.assertEqual({row['action'] for row in rows.values()}, {'held'})
+        for shipment, phrase in ((self.overdue, 'delivery was expected'), (self.silent, 'no tracking update for 7 days')):
+            self.assertEqual(self.status(shipment), 'on_hold')
+            update = TrackingUpdate.objects.get(shipment=shipment, location=sla.HOLD_LOCATION)
+            self.assertIn(phrase, update.description)
+        self.assertEqual(self.status(self.on_time), 'in_transit')
+        # Held shipments are out of both scans
+        summary, rows = self.detect(hold=True)
+        self.assertEqual((summary['overdue'], summary['silent'], rows), (0, 0, {}))
+
+    def test_released_shipment_is_not_held_again_for_the_same_breach(self):
+        self.detect(hold=True)
+        # Staff release it without moving the expected delivery date
+        Shipment.objects.filter(pk=self.overdue.pk).update(status='in_transit')
+        summary, rows = self.detect(hold=True)
+        self.assertEqual(summary['held'], 0)
+        self.assertEqual(rows[self.overdue.tracking_number]['action'], 'held earlier')
+        self.assertEqual(self.status(self.overdue), 'in_transit')
+
+        # A new promise that is broken again is a new breach
+        later = timezone.now() + timedelta(days=2)
+        Shipment.objects.filter(pk=self.overdue.pk).update(expected_delivery_date=timezone.now() + timedelta(days=1))
+        summary, rows = self.detect(hold=True, now=later)
+        self.assertEqual(rows[self.overdue.tracking_number]['action'], 'held')
+        self.assertEqual(self.status(self.overdue), 'on_hold')
+
+    def test_chunks_report_each_shipment_once(self):
+        # Overdue and silent: reported under the first reason only
+        Shipment.objects.filter(pk=self.overdue.pk).update(updated_at=self.now - timedelta(days=7))
+        for n in range(5, 9):
+            make_shipment(n, expected_delivery_date=self.now - timedelta(days=n))
+        summary, rows = self.detect(hold=False, chunk_size=2)
+        self.assertEqual((summary['overdue'], summary['silent']), (5, 1))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[self.overdue.tracking_number]['reason'], 'overdue')
+
+
+class QuoteTriageTests(TestCase):
+    """A quote request is held by one claimer at a time, and claims keep the rollups exact"""
+
+    def setUp(self):
+        self.first = User.objects.create_user('first')
+        self.second = User.objects.create_user('second')
+
+    def assertRollupsMatchRaw(self):
+        counted = rollup_counts(QuoteDailyRollup)
+        rollups.rebuild()
+        self.assertEqual(counted, rollup_counts(QuoteDailyRollup))
+
+    def test_second_claimer_gets_nothing(self):
+        quote = make_quote(1)
+        # Rollups are bumped once the claim commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(triage.claim(self.first, 5), [quote])
+            self.assertEqual(triage.claim(self.second, 5), [])
+            self.assertEqual(triage.claim_selected(self.second, QuoteRequest.objects.all()), 0)
+            self.assertFalse(triage.complete(self.second, quote.pk, 100))
+            self.assertEqual(triage.release(self.second, [quote.pk]), 0)
+        quote.refresh_from_db()
+        self.assertEqual((quote.status, quote.claimed_by), ('processing', self.first))
+        self.assertRollupsMatchRaw()
+
+    def test_expired_lease_passes_to_next_claimer(self):
+        quote = make_quote(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            triage.claim(self.first)
+            QuoteRequest.objects.filter(pk=quote.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(triage.claim(self.second), [quote])
+            self.assertFalse(triage.complete(self.first, quote.pk, 100))
+            self.assertTrue(triage.complete(self.second, quote.pk, 100))
+        quote.refresh_from_db()
+        self.assertEqual((quote.status, quote.claimed_by), ('quoted', self.second))
+        self.assertRollupsMatchRaw()
+
+
+    def test_skip_locked_claim_leaves_buckets_until_commit(self):
+        quotes = [make_quote(n) for n in range(3)]
+        rollup_table = QuoteDailyRollup._meta.db_table
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(triage.claim(self.first, 2), quotes[:2])
+            self.assertFalse([query['sql'] for query in queries if rollup_table in query['sql']])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(QuoteRequest.objects.filter(claimed_by=self.first).count(), 2)
+        self.assertRollupsMatchRaw()
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Claimers racing on separate connections never take the same request"""
+
+    CLAIMERS = 4
+
+    def test_concurrent_claimers_split_the_queue(self):
+        quotes = [make_quote(n) for n in range(6)]
+        users = [User.objects.create_user(f'claimer{n}') for n in range(self.CLAIMERS)]
+        start = threading.Barrier(self.CLAIMERS)
+        claimed, errors = {}, []
+
+        def claim(user):
+            try:
+                start.wait()
+                claimed[user.pk] = [quote.pk for quote in triage.claim(user, 3)]
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        taken = [pk for pks in claimed.values() for pk in pks]
+        self.assertEqual(sorted(taken), sorted(quote.pk for quote in quotes))
+        for user in users:
+            held = QuoteRequest.objects.filter(claimed_by=user).values_list('pk', flat=True)
+            self.assertEqual(sorted(held), sorted(claimed[user.pk]))
+        counted = rollup_counts(QuoteDailyRollup)
+        rollups.rebuild()
+        self.assertEqual(counted, rollup_counts(QuoteDailyRollup))
+
+
+class WebhookConcurrencyTests(TransactionTestCase):
+    """The dispatcher never has more requests in flight to an endpoint than it allows"""
+
+    def test_endpoint_limit_holds_under_a_larger_thread_pool(self):
+        receiver = WebhookReceiver(delay=0.1)
+        self.addCleanup(receiver.stop)
+        owner = User.objects.create_user('hooked')
+        endpoint = WebhookEndpoint.objects.create(profile=owner.profile, url=receiver.url, max_concurrency=2, batch_size=1)
+        shipment = make_shipment(1, user=owner)
+        for n in range(6):
+            webhooks.emit(shipment, webhooks.shipment_event(shipment, 'in_transit', description=f'scan {n}'))
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            dispatcher = webhooks.Dispatcher(executor)
+            pending = set()
+            while True:
+                submitted = dispatcher.dispatch()
+                self.assertLessEqual(len(submitted), endpoint.max_concurrency)
+                pending |= set(submitted)
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self.assertTrue(all(future.result() for future in done))
+            dispatcher.pool.close()
+
+        self.assertEqual(len(receiver.requests), 6)
+        self.assertEqual(receiver.most_in_flight, endpoint.max_concurrency)
+        self.assertFalse(WebhookDelivery.objects.exclude(status='delivered').exists())
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    SECURE_SSL_REDIRECT=False,
+    DATABASE_REPLICAS=['replica_test'],
+    REPLICA_PIN_SECONDS=10,
+    REPLICA_RETRY_SECONDS=30,
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'replica-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reads go to a second SQLite database standing in for a replica that has fallen behind"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.replica_path = Path(directory.name) / 'replica.sqlite3'
+        self.shipment = make_shipment(1, status='in_transit')
+        self.user = User.objects.create_user('reader')
+        self.client.force_login(self.user)
+        # Snapshot the primary, then move on without it
+        connection.ensure_connection()
+        replica = sqlite3.connect(self.replica_path)
+        connection.connection.backup(replica)
+        replica.close()
+        Shipment.objects.filter(pk=self.shipment.pk).update(status='out_for_delivery')
+        self.addCleanup(replicas._down_until.clear)
+
+    def use_replica(self, path):
+        # Built by hand rather than declared in settings, which the test runner would try to set up
+        primary = connections['default']
+        replica = primary.__class__(dict(primary.settings_dict, NAME=str(path)), 'replica_test')
+        connections['replica_test'] = replica
+        self.addCleanup(connections.__delitem__, 'replica_test')
+        self.addCleanup(replica.close)
+
+    def tracked_status(self):
+        response = self.client.get(reverse('track_api'), {'tracking_number': self.shipment.tracking_number})
+        return response.json()['shipment']['status_code']
+
+    def test_reads_go_to_the_replica_until_a_write_pins_the_session(self):
+        self.use_replica(self.replica_path)
+        self.assertEqual(self.tracked_status(), 'in_transit')
+
+        self.client.post(reverse('contact'), {'name': 'R', 'email': 'r@example.com', 'subject': 'Hi', 'message': 'Hello'})
+        pinned_until = self.client.session[replicas.PIN_SESSION_KEY]
+        self.assertAlmostEqual(pinned_until, timezone.now().timestamp() + 10, delta=2)
+        self.assertEqual(self.tracked_status(), 'out_for_delivery')
+
+        session = self.client.session
+        session[replicas.PIN_SESSION_KEY] = timezone.now().timestamp() - 1
+        session.save()
+        self.assertEqual(self.tracked_status(), 'in_transit')
+
+    def test_session_and_job_writes_do_not_pin(self):
+        routing = replicas.RequestRouting()
+        token = replicas._routing.set(routing)
+        self.addCleanup(replicas._routing.reset, token)
+        router = replicas.ReplicaRouter()
+        for model in (Session, Job):
+            router.db_for_write(model)
+        self.assertFalse(routing.wrote)
+        router.db_for_write(ContactMessage)
+        self.assertTrue(routing.wrote)
+
+    def test_unreachable_replica_falls_back_and_is_skipped(self):
+        self.use_replica(self.replica_path.parent / 'missing' / 'replica.sqlite3')
+        with self.assertLogs(replicas.logger, 'WARNING'):
+            self.assertEqual(self.tracked_status(), 'out_for_delivery')
+        self.assertAlmostEqual(replicas._down_until['replica_test'], time.monotonic() + 30, delta=2)
+
+        unreachable = OperationalError('unable to open database file')
+        with mock.patch.object(connections['replica_test'], 'ensure_connection', side_effect=unreachable) as connect:
+            self.assertEqual(self.tracked_status(), 'out_for_delivery')
+            connect.assert_not_called()
+            # Tried again once the retry period is over
+            with mock.patch.object(replicas.time, 'monotonic', return_value=time.monotonic() + 31), \
+                    self.assertLogs(replicas.logger, 'WARNING'):
+                self.assertEqual(self.tracked_status(), 'out_for_delivery')
+            connect.assert_called_once()
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES={
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+        for alias in ('default', 'shared', 'sessions')
+    },
+)
+class BenchmarkCommandTests(TransactionTestCase):
+    """The benchmark seeds realistic rows, drives the views from client threads and cleans up after itself"""
+
+    def test_seed_run_compare_and_purge(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        first, second = Path(directory.name) / 'first.json', Path(directory.name) / 'second.json'
+        options = dict(requests=6, warmup=1, concurrency=2, scenarios='track_shipment_api,dashboard_view', stdout=StringIO())
+
+        call_command('benchmark', seed=12, updates_per_shipment=2, quotes=5, output=str(first), **options)
+        self.assertEqual(Shipment.objects.filter(tracking_number__startswith='BEN').count(), 12)
+        self.assertFalse(Shipment.objects.filter(sender_latitude__isnull=True).exists())
+        # bulk_create skips the rollup signals; the seed rebuilds today's buckets itself
+        self.assertEqual(sum(ShipmentDailyRollup.objects.values_list('count', flat=True)), 12)
+
+        report = json.loads(first.read_text())
+        self.assertEqual(set(report['scenarios']), {'track_shipment_api', 'dashboard_view'})
+        for result in report['scenarios'].values():
+            self.assertEqual((result['requests'], result['errors']), (6, 0))
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+        out = StringIO()
+        call_command('benchmark', compare=str(first), output=str(second), **dict(options, stdout=out))
+        self.assertIn('Change since', out.getvalue())
+
+        call_command('benchmark', purge=True, stdout=StringIO())
+        self.assertFalse(Shipment.objects.exists())
+        self.assertFalse(QuoteRequest.objects.exists())
+        self.assertFalse(User.objects.exists())
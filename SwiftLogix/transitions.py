@@ -0,0 +1,114 @@
+# SwiftLogix/transitions.py
+"""
+Shipment status changes under optimistic concurrency.
+
+Every status write is a compare-and-swap on ``Shipment.version``:
+``UPDATE ... SET status = %s, version = version + 1 WHERE id = %s AND
+version = %s``. A writer that loses the race re-reads the row, re-checks
+``Shipment.STATUS_TRANSITIONS`` against the status it now finds and tries
+again, so concurrent scans never wait on ``SELECT ... FOR UPDATE`` and never
+move a shipment backwards. The shared daily rollup buckets are bumped after
+the UPDATE commits, from the row it replaced, so scans do not queue on them
+either. Full-row saves are held to the same rule by ``Shipment.save``.
+"""
+import random
+import time
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import lanes, notifications, rollups, webhooks
+from .models import InvalidTransition, Shipment, StaleShipment, TrackingUpdate
+
+MAX_ATTEMPTS = 8
+BACKOFF_SECONDS = 0.005
+
+# What the transition and its side effects (notifications, webhooks, lane statistics) read
+LOADED_FIELDS = (
+    'status', 'version', 'tracking_number', 'user', 'sender_email', 'receiver_email',
+    'shipment_type', 'sender_city', 'sender_country', 'receiver_city', 'receiver_country',
+    'pickup_date', 'actual_delivery_date', 'created_at', 'lane_recorded',
+)
+
+
+def transition(shipment_id, status, when=None, force=False, notify=True, attempts=MAX_ATTEMPTS):
+    """Move a shipment to status; returns the updated shipment, or None if it was already there
+
+    Raises InvalidTransition when the state machine forbids the move (unless
+    force), and StaleShipment when every attempt lost to a concurrent writer.
+    notify=False skips the status_changed notification and webhook.
+    """
+    when = when or timezone.now()
+    for attempt in range(attempts):
+        shipment = Shipment.objects.only(*LOADED_FIELDS).get(pk=shipment_id)
+        if shipment.status == status:
+            return None
+        if not force and not Shipment.can_transition(shipment.status, status):
+            raise InvalidTransition(shipment.status, status)
+
+        changes = {'status': status}
+        if status == 'delivered' and shipment.actual_delivery_date is None:
+            changes['actual_delivery_date'] = when
+        updated = Shipment.objects.filter(pk=shipment_id, version=shipment.version).update(
+            version=F('version') + 1, updated_at=timezone.now(), **changes,
+        )
+        if not updated:
+            # Another writer moved the version on; re-read and check the move again
+            time.sleep(random.uniform(0, BACKOFF_SECONDS * 2 ** attempt))
+            continue
+
+        # The version guard means the loaded row is exactly what the UPDATE replaced
+        rollups.shipments_moved(
+            [tuple(getattr(shipment, name) for name in ('created_at',) + rollups.SHIPMENT_DIMENSIONS)], changes,
+        )
+        for field, value in changes.items():
+            setattr(shipment, field, value)
+        shipment.version += 1
+        if notify:
+            notifications.record(shipment, status, when=when)
+            webhooks.emit(shipment, webhooks.shipment_event(shipment, status, when=when))
+        if status == 'delivered' and not shipment.lane_recorded:
+            lanes.record_delivery(shipment)
+        return shipment
+    raise StaleShipment(f"Shipment {shipment_id} kept changing; gave up after {attempts} attempts")
+
+
+def record_scan(shipment_id, status, location='', description='', when=None):
+    """Ingest one scan: add it to the timeline and advance the shipment's status if that is a move forward
+
+    Scans that arrive late or out of order stay in the timeline without
+    moving the status back. Returns the new TrackingUpdate.
+    """
+    when = when or timezone.now()
+    update = TrackingUpdate.objects.create(
+        shipment_id=shipment_id, status=status, location=location, description=description, timestamp=when,
+    )
+    try:
+        # The scan's own tracking_update event already tells the recipients
+        transition(shipment_id, status, when=when, notify=False)
+    except InvalidTransition:
+        pass
+    return update
+
+
+def bulk_transition(queryset, status):
+    """Move every shipment in queryset that may go to status; returns (moved, skipped)
+
+    Conditional UPDATEs, one per rollup bucket and no row locks: rows whose
+    current status does not lead to status are left alone rather than regressed.
+    """
+    total = queryset.count()
+    movable = queryset.filter(status__in=Shipment.statuses_leading_to(status))
+    now = timezone.now()
+    changes = {'status': status, 'version': F('version') + 1, 'updated_at': now}
+    if status == 'delivered':
+        # Part of the same UPDATE, so only the shipments that move get a delivery date
+        changes['actual_delivery_date'] = Coalesce(F('actual_delivery_date'), Value(now))
+    with transaction.atomic():
+        moved = rollups.shipments_bulk_move(movable, **changes)
+        # queryset.update() skips post_save, so notify exactly the shipments that moved
+        notifications.record_bulk(Shipment.objects.filter(pk__in=moved), status)
+        webhooks.emit_bulk(Shipment.objects.filter(pk__in=moved), status)
+    return len(moved), total - len(moved)
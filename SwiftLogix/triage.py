@@ -0,0 +1,101 @@
+# SwiftLogix/triage.py
+"""
+Work queue for pricing quote requests.
+
+Staff (on the quote queue page or its API) and automated pricers call
+``claim`` to take the oldest unclaimed requests. A claim moves a request to
+``processing`` under a lease of ``QUOTE_LEASE_SECONDS``; ``renew`` extends
+it, ``complete`` prices the request and ``release`` hands it back. A
+request whose lease ran out is claimable again, and its old holder can no
+longer complete it once someone else has taken it.
+
+Claims use ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports
+it (PostgreSQL), so concurrent claimers skip each other's rows instead of
+queueing behind them, and a conditional ``UPDATE`` per request elsewhere
+(SQLite). Either way a request is held by one person at a time. The daily
+rollup buckets are bumped after the claim commits, so claimers never wait
+on each other's bucket rows.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import rollups
+from .models import QuoteRequest
+
+MAX_CLAIM = 50
+
+
+def lease():
+    return timedelta(seconds=getattr(settings, 'QUOTE_LEASE_SECONDS', 900))
+
+
+def _claimable(now):
+    return Q(status='pending') | Q(status='processing', lease_expires_at__lt=now)
+
+
+def claimable(now=None):
+    """Pending requests, and claimed ones whose lease has run out, oldest first"""
+    return QuoteRequest.objects.filter(_claimable(now or timezone.now())).order_by('created_at')
+
+
+def _claim_changes(user, now):
+    return {'status': 'processing', 'claimed_by': user, 'claimed_at': now, 'lease_expires_at': now + lease()}
+
+
+def claim(user, limit=1):
+    """Atomically take up to `limit` claimable requests for user and return them"""
+    limit = max(1, min(limit, MAX_CLAIM))
+    now = timezone.now()
+    changes = _claim_changes(user, now)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            # The locked rows are ours, so update them by pk; their buckets move on commit
+            rows = list(claimable(now).select_for_update(skip_locked=True)
+                        .values_list('pk', 'created_at', *rollups.QUOTE_DIMENSIONS)[:limit])
+            ids = [pk for pk, *_ in rows]
+            if ids:
+                QuoteRequest.objects.filter(pk__in=ids).update(**changes)
+                rollups.quotes_moved([row[1:] for row in rows], changes)
+    else:
+        # Without SKIP LOCKED, let a conditional UPDATE decide which claimer wins each row
+        ids = []
+        for pk in claimable(now).values_list('pk', flat=True)[:limit * 2]:
+            if rollups.quotes_bulk_update(claimable(now).filter(pk=pk), **changes):
+                ids.append(pk)
+            if len(ids) == limit:
+                break
+    return list(QuoteRequest.objects.filter(pk__in=ids).order_by('created_at'))
+
+
+def claim_selected(user, queryset):
+    """Claim the claimable requests among queryset (the admin action); returns how many were taken"""
+    now = timezone.now()
+    return rollups.quotes_bulk_update(queryset.filter(_claimable(now)), **_claim_changes(user, now))
+
+
+def held_by(user):
+    """Requests user currently holds, soonest-expiring first"""
+    return QuoteRequest.objects.filter(claimed_by=user, status='processing').order_by('lease_expires_at')
+
+
+def renew(user, quote_ids):
+    return held_by(user).filter(pk__in=quote_ids).update(lease_expires_at=timezone.now() + lease())
+
+
+def release(user, quote_ids):
+    return rollups.quotes_bulk_update(
+        held_by(user).filter(pk__in=quote_ids),
+        status='pending', claimed_by=None, claimed_at=None, lease_expires_at=None,
+    )
+
+
+def complete(user, quote_id, amount):
+    """Price a held request; False if it is no longer user's to price"""
+    return bool(rollups.quotes_bulk_update(
+        held_by(user).filter(pk=quote_id),
+        status='quoted', quote_amount=amount, lease_expires_at=None, updated_at=timezone.now(),
+    ))
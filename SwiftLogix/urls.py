@@ -13,6 +13,9 @@ urlpatterns = [
     path('testimonial/', views.testimonial, name='testimonial'),
     path("404/", views.page_not_found_view, name="page_not_found"),
     path('track/', views.track_shipment, name='track'),
+    path('track/api/', views.track_shipment_api, name='track_api'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('manifest.webmanifest', views.web_manifest, name='web_manifest'),
     path('terms/', views.terms, name='terms'),
     path('help/', views.help, name='help'),
     path("air/", views.air, name="air"),
@@ -28,6 +31,23 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('profile/', views.profile_view, name='profile'),
+    path('history/shipments/', views.shipment_history_api, name='shipment_history'),
+    path('history/quotes/', views.quote_history_api, name='quote_history'),
+
+    # Staff reporting
+    path('reports/', views.reports_view, name='reports'),
+    path('quotes/queue/', views.quote_queue, name='quote_queue'),
+    path('quotes/queue/api/', views.quote_queue_api, name='quote_queue_api'),
+    path('labels/', views.labels_view, name='labels'),
+    path('labels/<str:name>/', views.labels_view, name='label_download'),
+    path('fleet/', views.fleet_map, name='fleet'),
+    path('fleet/api/', views.fleet_api, name='fleet_api'),
+    path('fleet/tiles/<int:z>/<int:x>/<int:y>/', views.fleet_tile_api, name='fleet_tile'),
+
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles_view, name='profiles'),
+    path('profiles/<str:name>/', views.profiles_view, name='profile_capture'),
 ]
 
    
\ No newline at end of file
@@ -1,12 +1,23 @@
 # SwiftLogix/views.py
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
-from .models import Shipment, TrackingUpdate, QuoteRequest, ContactMessage, UserProfile
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from .models import Shipment, TrackingUpdate, QuoteRequest, ContactMessage
+from . import geo, history, labels, metrics, offline, profiling, rollups, serializers, tasks, triage
+from .auth import get_profile
+from .cache import get_or_compute
 
 
 def home(request):
@@ -26,12 +37,13 @@ def contact(request):
         message_text = request.POST.get("message")
         
         # Save message to database
-        ContactMessage.objects.create(
+        contact_message = ContactMessage.objects.create(
             name=name,
             email=email,
             subject=subject,
             message=message_text
         )
+        tasks.send_contact_acknowledgement.delay(message_id=contact_message.pk)
         
         messages.success(request, "Your message has been sent successfully!")
         return redirect("contact")
@@ -90,6 +102,7 @@ def quote(request):
                 special_note=request.POST.get('note', ''),
                 user=request.user if request.user.is_authenticated else None  # Link to user if logged in
             )
+            tasks.send_quote_confirmation.delay(quote_id=quote_request.pk)
             messages.success(request, 'Your quote request has been submitted successfully! We will contact you soon.')
             return redirect('quote')
         except Exception as e:
@@ -143,49 +156,15 @@ def track_shipment_api(request):
             })
         
         try:
-            shipment = Shipment.objects.get(tracking_number__iexact=tracking_number)
-            tracking_updates = shipment.tracking_updates.all()
-            
-            updates_data = []
-            for update in tracking_updates:
-                updates_data.append({
-                    'status': update.get_status_display(),
-                    'location': update.location,
-                    'description': update.description,
-                    'timestamp': update.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                    'date': update.timestamp.strftime('%b %d, %Y'),
-                    'time': update.timestamp.strftime('%I:%M %p')
-                })
-            
-            return JsonResponse({
-                'success': True,
-                'shipment': {
-                    'tracking_number': shipment.tracking_number,
-                    'status': shipment.get_status_display(),
-                    'status_code': shipment.status,
-                    'progress': shipment.get_progress_percentage(),
-                    'sender_name': shipment.sender_name,
-                    'sender_city': shipment.sender_city,
-                    'sender_country': shipment.sender_country,
-                    'receiver_name': shipment.receiver_name,
-                    'receiver_city': shipment.receiver_city,
-                    'receiver_country': shipment.receiver_country,
-                    'shipment_type': shipment.get_shipment_type_display(),
-                    'pickup_date': shipment.pickup_date.strftime('%Y-%m-%d'),
-                    'expected_delivery': shipment.expected_delivery_date.strftime('%Y-%m-%d'),
-                    'actual_delivery': shipment.actual_delivery_date.strftime('%Y-%m-%d') if shipment.actual_delivery_date else None,
-                    'weight': str(shipment.weight),
-                    'dimensions': shipment.dimensions,
-                    'package_description': shipment.package_description
-                },
-                'tracking_updates': updates_data
-            })
-            
-        except Shipment.DoesNotExist:
+            payload = serializers.tracking_payload(tracking_number, since=request.GET.get('since'))
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+        if payload is None:
             return JsonResponse({
                 'success': False,
                 'error': f'No shipment found with tracking number: {tracking_number}'
             })
+        return serializers.json_response(payload)
     
     return JsonResponse({
         'success': False,
@@ -193,6 +172,24 @@ def track_shipment_api(request):
     })
 
 
+# ============================================
+# OFFLINE TRACKING
+# ============================================
+
+def service_worker(request):
+    """The tracking page's service worker; served from the root so its scope covers the whole site"""
+    response = render(request, 'sw.js', offline.worker_context(), content_type='application/javascript')
+    # Browsers check for a new worker on navigation; make sure they see a deploy straight away
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def web_manifest(request):
+    response = JsonResponse(offline.manifest(), content_type='application/manifest+json')
+    patch_cache_control(response, public=True, max_age=86400)
+    return response
+
+
 # ============================================
 # AUTHENTICATION VIEWS (UPDATED & IMPROVED)
 # ============================================
@@ -271,12 +268,11 @@ def register_view(request):
                 last_name=last_name
             )
             
-            # Create user profile
-            UserProfile.objects.create(
-                user=user,
-                phone=phone,
-                company_name=company_name
-            )
+            # The post_save signal created the profile; fill in what the form collected
+            user.profile.phone = phone
+            user.profile.company_name = company_name
+            user.profile.save(update_fields=['phone', 'company_name'])
+            tasks.send_welcome_email.delay(user_id=user.pk)
             
             # IMPORTANT: Log the user in immediately
             auth_login(request, user)
@@ -294,7 +290,7 @@ def register_view(request):
 @login_required
 def dashboard_view(request):
     """User dashboard showing their shipments and quotes"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     
     # Get user's shipments
     shipments = Shipment.objects.filter(user=request.user).order_by('-created_at')[:5]
@@ -316,7 +312,7 @@ def dashboard_view(request):
 @login_required
 def profile_view(request):
     """User profile page"""
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile = get_profile(request.user)
     
     if request.method == 'POST':
         # Update user info
@@ -336,4 +332,271 @@ def profile_view(request):
         messages.success(request, 'Profile updated successfully!')
         return redirect('profile')
     
-    return render(request, 'profile.html', {'profile': profile})
\ No newline at end of file
+    return render(request, 'profile.html', {'profile': profile})
+
+
+def _history_response(request, resource):
+    try:
+        data = history.page(resource, request.user, request.GET)
+    except history.HistoryError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    response = serializers.json_response(dict(data, success=True))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def shipment_history_api(request):
+    """The user's shipments, newest first, one keyset page at a time"""
+    return _history_response(request, history.SHIPMENTS)
+
+
+@login_required
+def quote_history_api(request):
+    """The user's quote requests, newest first, one keyset page at a time"""
+    return _history_response(request, history.QUOTES)
+
+# ============================================
+# STAFF REPORTING
+# ============================================
+
+def _report_context(start, end):
+    """Report tables built from the rollups; reports_view caches them for a minute"""
+    statuses = Shipment.SHIPMENT_STATUS_CHOICES
+    type_labels = dict(Shipment.SHIPMENT_TYPE_CHOICES)
+    freight_labels = dict(QuoteRequest.FREIGHT_CHOICES)
+    per_day = []
+    for day, counts in sorted(rollups.shipments_per_day(start, end).items(), reverse=True):
+        row = [counts.get(code, 0) for code, label in statuses]
+        per_day.append((day, row, sum(row)))
+
+    return {
+        'start': start,
+        'end': end,
+        'statuses': statuses,
+        'per_day': per_day,
+        'by_type': [
+            (type_labels.get(code, code), total)
+            for code, total in rollups.shipment_totals(start, end, 'shipment_type')
+        ],
+        'by_origin': rollups.shipment_totals(start, end, 'origin_country')[:10],
+        'by_destination': rollups.shipment_totals(start, end, 'destination_country')[:10],
+        'quotes': {
+            freight_labels.get(code, code): entry
+            for code, entry in rollups.quote_conversion(start, end).items()
+        },
+    }
+
+
+def _report_date(value):
+    """A date from the report's query string, or None if it is missing, malformed or impossible"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+@staff_member_required
+def reports_view(request):
+    """Operational report served entirely from the daily rollup tables"""
+    end = _report_date(request.GET.get('end')) or timezone.localdate()
+    start = _report_date(request.GET.get('start')) or end - timedelta(days=29)
+    if start > end:
+        start, end = end, start
+    # The page shows the range it actually covers, so a shortened one is visible
+    start = max(start, end - timedelta(days=settings.REPORT_MAX_DAYS - 1))
+
+    context = get_or_compute(
+        f'{start.isoformat()}:{end.isoformat()}',
+        lambda: _report_context(start, end),
+        timeout=60,
+        namespace='reports',
+    )
+    return render(request, 'reports.html', context)
+
+
+# ============================================
+# QUOTE TRIAGE QUEUE
+# ============================================
+
+QUEUE_FIELDS = (
+    'id', 'name', 'email', 'mobile', 'freight_type', 'origin', 'destination',
+    'weight', 'dimensions', 'special_note', 'created_at', 'lease_expires_at',
+)
+
+
+def _apply_queue_action(request):
+    """Run the queue action in request.POST; returns (message, claimed requests) or raises ValueError"""
+    action = request.POST.get('action')
+    ids = [int(pk) for pk in request.POST.getlist('quote') if pk.isdigit()]
+    if action == 'claim':
+        try:
+            limit = int(request.POST.get('limit') or 1)
+        except ValueError:
+            raise ValueError("limit must be a number")
+        claimed = triage.claim(request.user, limit)
+        return f"Claimed {len(claimed)} quote requests.", claimed
+    if action == 'renew':
+        return f"Extended {triage.renew(request.user, ids)} leases.", []
+    if action == 'release':
+        return f"Released {triage.release(request.user, ids)} quote requests.", []
+    if action == 'complete':
+        try:
+            amount = Decimal(request.POST.get('amount', ''))
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite() or amount < 0:
+            raise ValueError("Enter the quote amount in USD")
+        if len(ids) != 1 or not triage.complete(request.user, ids[0], amount.quantize(Decimal('0.01'))):
+            raise ValueError("That request is no longer yours: its lease ran out and someone else claimed it.")
+        return "Quote saved.", []
+    raise ValueError("Unknown action")
+
+
+@staff_member_required
+def quote_queue(request):
+    """Claim pending quote requests, price them, or hand them back"""
+    if request.method == 'POST':
+        try:
+            message, claimed = _apply_queue_action(request)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, message)
+        return redirect('quote_queue')
+
+    return render(request, 'quote_queue.html', {
+        'held': triage.held_by(request.user),
+        'waiting': triage.claimable().count(),
+        'lease_minutes': int(triage.lease().total_seconds() // 60),
+    })
+
+
+@staff_member_required
+def quote_queue_api(request):
+    """JSON form of the quote queue: GET lists what you hold, POST takes the page's actions"""
+    claimed = []
+    message = None
+    if request.method == 'POST':
+        try:
+            message, claimed = _apply_queue_action(request)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return serializers.json_response({
+        'success': True,
+        'message': message,
+        'claimed': [quote.pk for quote in claimed],
+        'held': list(triage.held_by(request.user).values(*QUEUE_FIELDS)),
+        'waiting': triage.claimable().count(),
+    })
+
+
+# ============================================
+# SHIPPING LABELS
+# ============================================
+
+@staff_member_required
+def labels_view(request, name=None):
+    """Finished label batches (printed from the shipment admin), or one batch's PDF"""
+    if name is None:
+        return render(request, 'labels.html', {'batches': labels.list_batches()})
+    path = labels.batch_path(name)
+    if path is None:
+        raise Http404("No such label batch")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'labels-{name}.pdf')
+
+
+# ============================================
+# LIVE FLEET MAP
+# ============================================
+
+def _cached_fleet_tile(z, x, y):
+    return get_or_compute(
+        f'{z}/{x}/{y}',
+        lambda: geo.fleet_tile(
+            z, x, y,
+            detail_zoom=settings.FLEET_DETAIL_ZOOM,
+            max_markers=settings.FLEET_TILE_MAX_MARKERS,
+        ),
+        timeout=settings.FLEET_TILE_TTL,
+        namespace='fleet',
+    )
+
+
+def _fleet_response(data):
+    response = JsonResponse(data)
+    patch_cache_control(response, private=True, max_age=settings.FLEET_TILE_TTL)
+    return response
+
+
+@staff_member_required
+def fleet_map(request):
+    """Map of every shipment on the move"""
+    return render(request, 'fleet.html', {'detail_zoom': settings.FLEET_DETAIL_ZOOM})
+
+
+@staff_member_required
+def fleet_tile_api(request, z, x, y):
+    """One XYZ tile of the fleet map: clusters at low zoom, shipments when zoomed in"""
+    if not 0 <= z <= 20 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return JsonResponse({'success': False, 'error': 'Tile out of range'}, status=400)
+    return _fleet_response(dict(_cached_fleet_tile(z, x, y), success=True, tile=[z, x, y]))
+
+
+@staff_member_required
+def fleet_api(request):
+    """Fleet map data for a bounding box, assembled from the cached tiles that cover it"""
+    try:
+        west, south, east, north = (float(value) for value in request.GET.get('bbox', '').split(','))
+        zoom = max(0, min(20, int(request.GET.get('zoom', ''))))
+        ranges = geo.tile_ranges(west, south, east, north, zoom)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Expected bbox=west,south,east,north and zoom'}, status=400)
+
+    # Counted from the ranges, so a huge box is turned away before any tile is listed
+    if geo.tile_count(ranges) > settings.FLEET_MAX_TILES:
+        return JsonResponse({'success': False, 'error': 'Bounding box too large for this zoom'}, status=400)
+    tiles = geo.tiles_in(ranges, zoom)
+
+    clusters, shipments = [], []
+    for z, x, y in tiles:
+        tile = _cached_fleet_tile(z, x, y)
+        clusters.extend(tile['clusters'])
+        shipments.extend(tile['shipments'])
+    return _fleet_response({
+        'success': True,
+        'zoom': zoom,
+        'tiles': len(tiles),
+        'clusters': clusters,
+        'shipments': shipments,
+    })
+
+
+# ============================================
+# MONITORING
+# ============================================
+
+@never_cache
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs METRICS_TOKEN as a bearer token, or a staff session"""
+    token = settings.METRICS_TOKEN
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    allowed = (token and constant_time_compare(supplied, token)) or request.user.is_staff
+    if not allowed:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def profiles_view(request, name=None):
+    """Captured request profiles: the list, or one capture's SQL and hot functions"""
+    if name is None:
+        return render(request, 'profiles.html', {'captures': profiling.list_captures()})
+    capture = profiling.load_capture(name)
+    if capture is None:
+        raise Http404("No such capture")
+    capture['queries'].sort(key=lambda query: query['ms'], reverse=True)
+    return render(request, 'profiles.html', {
+        'capture': capture,
+        'hot_functions': profiling.hot_functions([name]) if capture['profiled'] else '',
+    })
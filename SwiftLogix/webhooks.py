@@ -0,0 +1,282 @@
+# SwiftLogix/webhooks.py
+"""
+Outbound webhooks for shipment events.
+
+``emit`` stores one ``WebhookDelivery`` per active endpoint of the shipment
+owner's profile. ``Dispatcher`` (run by ``manage.py deliver_webhooks``)
+claims due deliveries per endpoint, POSTs them in batches over pooled
+keep-alive connections with an HMAC-SHA256 signature, and retries failures
+with exponential backoff. Each endpoint has its own cap on requests in
+flight so one slow customer cannot take every delivery thread.
+"""
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+
+from .jobs import backoff
+from .models import WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-SwiftLogix-Signature'
+TIMESTAMP_HEADER = 'X-SwiftLogix-Timestamp'
+
+
+# ============================================
+# EVENT CAPTURE
+# ============================================
+
+def _endpoints_for(user_ids):
+    endpoints = defaultdict(list)
+    rows = WebhookEndpoint.objects.filter(profile__user_id__in=user_ids, is_active=True).values_list('pk', 'profile__user_id')
+    for endpoint_id, user_id in rows:
+        endpoints[user_id].append(endpoint_id)
+    return endpoints
+
+
+def shipment_event(shipment, status, location='', description='', when=None, event='shipment.status_changed'):
+    return {
+        'type': event,
+        'tracking_number': shipment.tracking_number,
+        'status': status,
+        'location': location,
+        'description': description,
+        'occurred_at': (when or timezone.now()).isoformat(),
+    }
+
+
+def emit(shipment, payload):
+    """Queue payload for every active endpoint subscribed through the shipment owner's profile"""
+    if not shipment.user_id:
+        return 0
+    deliveries = [
+        WebhookDelivery(endpoint_id=endpoint_id, event=payload['type'], payload=payload)
+        for endpoint_id in _endpoints_for([shipment.user_id]).get(shipment.user_id, [])
+    ]
+    WebhookDelivery.objects.bulk_create(deliveries)
+    return len(deliveries)
+
+
+def emit_bulk(queryset, status):
+    """Queue status_changed events for every owned shipment in queryset, which has just moved to status"""
+    rows = list(
+        queryset.filter(user__isnull=False)
+        .values_list('tracking_number', 'user_id')
+    )
+    endpoints = _endpoints_for({user_id for _, user_id in rows})
+    now = timezone.now().isoformat()
+    deliveries = []
+    for tracking_number, user_id in rows:
+        payload = {
+            'type': 'shipment.status_changed', 'tracking_number': tracking_number,
+            'status': status, 'location': '', 'description': '', 'occurred_at': now,
+        }
+        for endpoint_id in endpoints.get(user_id, []):
+            deliveries.append(WebhookDelivery(endpoint_id=endpoint_id, event=payload['type'], payload=payload))
+    WebhookDelivery.objects.bulk_create(deliveries, batch_size=1000)
+    return len(deliveries)
+
+
+# ============================================
+# SIGNING
+# ============================================
+
+def sign(secret, timestamp, body):
+    """Signature receivers recompute over '<timestamp>.<raw body>' to authenticate a request"""
+    message = f'{timestamp}.'.encode() + body
+    return 'sha256=' + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+# ============================================
+# CONNECTION POOL
+# ============================================
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections reused per origin, safe to share between threads"""
+
+    def __init__(self, max_idle_per_origin=4, timeout=10):
+        self.max_idle_per_origin = max_idle_per_origin
+        self.timeout = timeout
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if idle:
+                return idle.pop(), True
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(netloc, timeout=self.timeout), False
+
+    def _release(self, scheme, netloc, connection):
+        with self._lock:
+            idle = self._idle[(scheme, netloc)]
+            if len(idle) < self.max_idle_per_origin:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def post(self, url, body, headers):
+        """POST body and return (status, response body); retries once if a reused socket went stale"""
+        parts = urlsplit(url)
+        # Rows written around model validation could still hold another scheme
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported webhook URL scheme {parts.scheme!r}")
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        for attempt in range(2):
+            connection, reused = self._acquire(parts.scheme, parts.netloc)
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                content = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(parts.scheme, parts.netloc, connection)
+            return response.status, content
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+# ============================================
+# DELIVERY ENGINE
+# ============================================
+
+def claim(endpoint, limit):
+    """Mark up to `limit` due deliveries for endpoint as in flight and return them"""
+    now = timezone.now()
+    candidate_ids = list(
+        WebhookDelivery.objects.filter(endpoint=endpoint, status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not candidate_ids:
+        return []
+    WebhookDelivery.objects.filter(pk__in=candidate_ids, status='pending').update(status='in_flight', locked_at=now)
+    return list(WebhookDelivery.objects.filter(pk__in=candidate_ids, status='in_flight', locked_at=now).order_by('pk'))
+
+
+def deliver_batch(pool, endpoint, deliveries):
+    """POST one batch to endpoint and record the outcome on every delivery in it"""
+    body = json.dumps(
+        {'events': [dict(delivery.payload, id=delivery.pk) for delivery in deliveries]},
+        cls=DjangoJSONEncoder,
+    ).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'SwiftLogix-Webhooks/1.0',
+        TIMESTAMP_HEADER: timestamp,
+        SIGNATURE_HEADER: sign(endpoint.secret, timestamp, body),
+    }
+    ids = [delivery.pk for delivery in deliveries]
+    try:
+        status, content = pool.post(endpoint.url, body, headers)
+        error = '' if 200 <= status < 300 else f"HTTP {status}: {content[:500].decode(errors='replace')}"
+    except Exception as exc:
+        status, error = None, f"{type(exc).__name__}: {exc}"
+
+    if not error:
+        WebhookDelivery.objects.filter(pk__in=ids).update(
+            status='delivered', delivered_at=timezone.now(), response_status=status,
+            locked_at=None, last_error='',
+        )
+        return True
+
+    # Every delivery in a batch shares its attempt count history closely enough to retry together
+    attempts = max(delivery.attempts for delivery in deliveries) + 1
+    max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+    if attempts >= max_attempts:
+        changes = {'status': 'failed'}
+    else:
+        changes = {'status': 'pending', 'next_attempt_at': timezone.now() + timedelta(seconds=backoff(attempts))}
+    WebhookDelivery.objects.filter(pk__in=ids).update(
+        attempts=attempts, response_status=status, last_error=error, locked_at=None, **changes,
+    )
+    logger.warning("Webhook batch of %s to %s failed (attempt %s): %s", len(ids), endpoint.url, attempts, error)
+    return False
+
+
+class Dispatcher:
+    """Fans due deliveries out to a thread pool, honouring each endpoint's concurrency limit"""
+
+    def __init__(self, executor, pool=None):
+        self.executor = executor
+        self.pool = pool or ConnectionPool(timeout=getattr(settings, 'WEBHOOK_TIMEOUT', 10))
+        self._in_flight = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _reserve(self, endpoint):
+        with self._lock:
+            if self._in_flight[endpoint.pk] >= endpoint.max_concurrency:
+                return False
+            self._in_flight[endpoint.pk] += 1
+            return True
+
+    def _run(self, endpoint, deliveries):
+        try:
+            return deliver_batch(self.pool, endpoint, deliveries)
+        finally:
+            with self._lock:
+                self._in_flight[endpoint.pk] -= 1
+            close_old_connections()
+
+    def due_endpoints(self):
+        endpoint_ids = (
+            WebhookDelivery.objects.filter(status='pending', next_attempt_at__lte=timezone.now())
+            .values('endpoint')
+            .annotate(oldest=Min('next_attempt_at'))
+            .order_by('oldest')
+            .values_list('endpoint', flat=True)
+        )
+        return WebhookEndpoint.objects.filter(pk__in=list(endpoint_ids), is_active=True)
+
+    def dispatch(self):
+        """Submit every batch that fits under the endpoint limits; returns the futures submitted"""
+        futures = []
+        for endpoint in self.due_endpoints():
+            while self._reserve(endpoint):
+                deliveries = claim(endpoint, endpoint.batch_size)
+                if not deliveries:
+                    with self._lock:
+                        self._in_flight[endpoint.pk] -= 1
+                    break
+                futures.append(self.executor.submit(self._run, endpoint, deliveries))
+        return futures
+
+
+def requeue_stale(lease_seconds=None):
+    """Return deliveries stuck in flight (worker crashed mid-request) to pending"""
+    lease_seconds = lease_seconds or getattr(settings, 'WEBHOOK_LEASE_SECONDS', 300)
+    cutoff = timezone.now() - timedelta(seconds=lease_seconds)
+    return WebhookDelivery.objects.filter(status='in_flight', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None,
+    )
@@ -48,13 +48,17 @@ INSTALLED_APPS = [
 # ==================================================
 
 MIDDLEWARE = [
+    'SwiftLogix.metrics.RequestMetricsMiddleware',
+    'SwiftLogix.profiling.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'SwiftLogix.compression.CompressionMiddleware',
 
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'SwiftLogix.sessions.HybridSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'SwiftLogix.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,7 +76,8 @@ WSGI_APPLICATION = 'didon.wsgi.application'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Stock DjangoTemplates that also times rendering for the request metrics
+        'BACKEND': 'SwiftLogix.metrics.DjangoTemplates',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -100,12 +105,103 @@ DATABASES = {
     )
 }
 
+# Read replicas, comma-separated; GET requests to REPLICA_READ_VIEWS read from them
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=Csv())
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    DATABASES[f'replica{index}'] = dj_database_url.parse(url, conn_max_age=600)
+    DATABASES[f'replica{index}']['TEST'] = {'MIRROR': 'default'}
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
 # Only add SSL requirement for PostgreSQL (production)
-if 'postgres' in DATABASES['default']['ENGINE']:
-    DATABASES['default']['OPTIONS'] = {
-        'sslmode': 'require' if not DEBUG else 'prefer'
+for database in DATABASES.values():
+    if 'postgres' in database['ENGINE']:
+        database['OPTIONS'] = {
+            'sslmode': 'require' if not DEBUG else 'prefer'
+        }
+
+# SQLite tests run on a file: the shared in-memory database fails concurrent connections
+# (the queue claim tests) instead of making them wait
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', str(BASE_DIR / 'test-db.sqlite3'))
+
+DATABASE_ROUTERS = ['SwiftLogix.replicas.ReplicaRouter']
+REPLICA_READ_VIEWS = (
+    'home', 'about', 'services', 'contact', 'pricing', 'feature', 'team', 'testimonial',
+    'terms', 'help', 'air', 'sea', 'road', 'warehouse', 'customs', 'express',
+    'track', 'track_api', 'reports', 'fleet', 'fleet_api', 'fleet_tile',
+)
+# After a request writes, that session reads from the primary for this long
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+# A replica that fails a connection is skipped for this long
+REPLICA_RETRY_SECONDS = config('REPLICA_RETRY_SECONDS', default=30, cast=int)
+
+# ==================================================
+# CACHE & SESSIONS
+# ==================================================
+
+# Shared across gunicorn workers: Redis when REDIS_URL is set, files otherwise
+REDIS_URL = config('REDIS_URL', default='')
+
+
+def shared_cache(name):
+    if REDIS_URL:
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': name,
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / '.cache' / name),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 
+
+CACHES = {
+    # In-process LRU (L1) in front of the shared cache (L2); see SwiftLogix/cache.py
+    'default': {
+        'BACKEND': 'SwiftLogix.cache.TieredCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int),
+            'L1_TIMEOUT': config('CACHE_L1_TIMEOUT', default=5, cast=int),
+        },
+    },
+    'shared': shared_cache('shared'),
+    # Sessions skip the L1 so a logout is seen by every worker immediately
+    'sessions': shared_cache('sessions'),
+}
+
+# Hit-rate counters are aggregated across workers here ('manage.py cache_stats')
+CACHE_METRICS_ALIAS = 'shared'
+
+# Cache-backed sessions with write-through to django_session ('clearsessions' prunes it)
+SESSION_ENGINE = config('SESSION_ENGINE', default='SwiftLogix.sessions')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Keep anonymous (flash-message only) sessions in a signed cookie until login
+SESSION_ANONYMOUS_SIGNED_COOKIES = config('SESSION_ANONYMOUS_SIGNED_COOKIES', default=True, cast=bool)
+
+# ==================================================
+# MONITORING ('/metrics')
+# ==================================================
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Per-request app/db/template timings in a Server-Timing header; leaks timings, so off in production
+METRICS_SERVER_TIMING = config('METRICS_SERVER_TIMING', default=DEBUG, cast=bool)
+# Bearer token for Prometheus scrapes; staff sessions can always read /metrics
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_ALIAS = 'shared'
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=10, cast=int)
+
+# Profiling ('/profiles/', 'manage.py profile_summary'): cProfile this fraction of requests,
+# and keep the SQL of any request slower than PROFILER_SLOW_MS (0 disables either)
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0.0, cast=float)
+PROFILER_SLOW_MS = config('PROFILER_SLOW_MS', default=0, cast=int)
+PROFILER_DIR = config('PROFILER_DIR', default=str(BASE_DIR / '.cache' / 'profiles'))
+PROFILER_MAX_CAPTURES = config('PROFILER_MAX_CAPTURES', default=200, cast=int)
+
 # ==================================================
 # PASSWORD VALIDATION
 # ==================================================
@@ -142,6 +238,18 @@ STORAGES = {
 
 WHITENOISE_MANIFEST_STRICT = False
 
+# Dynamic responses (SwiftLogix.compression): minified HTML, Brotli/gzip above this size.
+# Pages that used a CSRF token are never compressed (BREACH); list other secret-bearing views here.
+HTML_MINIFY = config('HTML_MINIFY', default=True, cast=bool)
+COMPRESSION_MIN_BYTES = config('COMPRESSION_MIN_BYTES', default=1024, cast=int)
+COMPRESSION_EXCLUDE_VIEWS = config('COMPRESSION_EXCLUDE_VIEWS', default='', cast=Csv())
+
+# Offline tracking (SwiftLogix.offline): bump the version to make every browser drop its cached app shell.
+# Tracking results and map tiles kept on the device; the least recently used are dropped first.
+OFFLINE_CACHE_VERSION = config('OFFLINE_CACHE_VERSION', default='1')
+OFFLINE_TRACKING_ENTRIES = config('OFFLINE_TRACKING_ENTRIES', default=20, cast=int)
+OFFLINE_TILE_ENTRIES = config('OFFLINE_TILE_ENTRIES', default=200, cast=int)
+
 # ==================================================
 # DEFAULT PRIMARY KEY
 # ==================================================
@@ -152,6 +260,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # AUTHENTICATION
 # ==================================================
 
+# Logins go through ProfileBackend; ModelBackend stays for sessions recorded under it before
+AUTHENTICATION_BACKENDS = [
+    'SwiftLogix.auth.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# request.user (with its profile) is kept in each worker between saves; this cache only holds
+# the token that says a worker's copy is current. queryset.update() sends no signal, so a bulk
+# change (deactivating users) takes up to USER_CACHE_TIMEOUT to apply unless it calls
+# SwiftLogix.auth.invalidate_users
+USER_CACHE_ALIAS = config('USER_CACHE_ALIAS', default='shared')
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=60, cast=int)
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
@@ -175,10 +296,76 @@ CSRF_TRUSTED_ORIGINS = [
     "https://*.onrender.com",
 ]
 
+# ==================================================
+# TRACKING
+# ==================================================
+
+# Delivered shipments a lane needs before its transit times drive ETAs
+LANE_MIN_SAMPLES = config('LANE_MIN_SAMPLES', default=5, cast=int)
+
+# How often the worker recomputes distance progress for shipments in transit
+ROUTE_PROGRESS_INTERVAL_SECONDS = config('ROUTE_PROGRESS_INTERVAL_SECONDS', default=300, cast=int)
+
+# SLA job ('manage.py detect_sla_breaches'): active shipments more than SLA_GRACE_HOURS past their
+# expected delivery, or in transit with no tracking update for SLA_STALE_DAYS, are put on hold
+# (unless SLA_HOLD is off) and listed in a CSV report
+SLA_CHECK_INTERVAL_SECONDS = config('SLA_CHECK_INTERVAL_SECONDS', default=3600, cast=int)
+SLA_GRACE_HOURS = config('SLA_GRACE_HOURS', default=0, cast=int)
+SLA_STALE_DAYS = config('SLA_STALE_DAYS', default=3, cast=int)
+SLA_HOLD = config('SLA_HOLD', default=True, cast=bool)
+SLA_CHUNK_SIZE = config('SLA_CHUNK_SIZE', default=500, cast=int)
+SLA_REPORT_DIR = config('SLA_REPORT_DIR', default=str(BASE_DIR / '.cache' / 'sla'))
+SLA_MAX_REPORTS = config('SLA_MAX_REPORTS', default=90, cast=int)
+
+# Fleet map: tiles are cached this long; below FLEET_DETAIL_ZOOM shipments are clustered by geohash cell
+FLEET_TILE_TTL = config('FLEET_TILE_TTL', default=30, cast=int)
+FLEET_DETAIL_ZOOM = config('FLEET_DETAIL_ZOOM', default=13, cast=int)
+FLEET_TILE_MAX_MARKERS = config('FLEET_TILE_MAX_MARKERS', default=500, cast=int)
+FLEET_MAX_TILES = config('FLEET_MAX_TILES', default=64, cast=int)
+
+# ==================================================
+# BACKGROUND JOBS ('manage.py run_worker')
+# ==================================================
+
+JOB_WORKER_CONCURRENCY = config('JOB_WORKER_CONCURRENCY', default=4, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+JOB_BACKOFF_BASE = config('JOB_BACKOFF_BASE', default=10, cast=int)    # seconds, doubled per attempt
+JOB_BACKOFF_MAX = config('JOB_BACKOFF_MAX', default=3600, cast=int)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=600, cast=int)  # running jobs older than this are requeued
+
+# Status-change emails are coalesced per recipient over this window and sent in batches
+NOTIFICATION_WINDOW_SECONDS = config('NOTIFICATION_WINDOW_SECONDS', default=300, cast=int)
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=500, cast=int)
+
+# Longest date range the staff report ('/reports/') covers; longer requests are cut to the latest days
+REPORT_MAX_DAYS = config('REPORT_MAX_DAYS', default=366, cast=int)
+
+# Quote triage queue: a claimed request returns to the queue if not priced or renewed within this
+QUOTE_LEASE_SECONDS = config('QUOTE_LEASE_SECONDS', default=900, cast=int)
+
+# Shipping labels ('/labels/', 'manage.py print_labels'): drawn by LABEL_WORKERS processes (0: one per CPU),
+# LABEL_CHUNK_SIZE labels per task; the newest LABEL_MAX_BATCHES PDFs are kept
+LABELS_DIR = config('LABELS_DIR', default=str(BASE_DIR / '.cache' / 'labels'))
+LABEL_WORKERS = config('LABEL_WORKERS', default=0, cast=int)
+LABEL_CHUNK_SIZE = config('LABEL_CHUNK_SIZE', default=50, cast=int)
+LABEL_MAX_BATCHES = config('LABEL_MAX_BATCHES', default=50, cast=int)
+# Labels printed outside a request (the management command) link their QR codes to this site
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+
+# Outbound webhooks ('manage.py deliver_webhooks')
+WEBHOOK_THREADS = config('WEBHOOK_THREADS', default=8, cast=int)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=10, cast=int)
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_LEASE_SECONDS = config('WEBHOOK_LEASE_SECONDS', default=300, cast=int)
+
 # ==================================================
 # EMAIL (OPTIONAL – CONFIGURE LATER)
 # ==================================================
 
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='SwiftLogix <no-reply@swiftlogix.com>')
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / '.cache' / 'emails'))  # filebased backend
+
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 # EMAIL_HOST = config('EMAIL_HOST')
 # EMAIL_PORT = config('EMAIL_PORT', cast=int)